@@ -0,0 +1,99 @@
+import random
+import time
+import tracemalloc
+from config.configuration import Configuration
+from genetics.organism import Organism
+from genetics.population import Population
+from genetics.innovations import InnovationRegistry
+from nn.activations import ActivationFunction, ActivationFunctions
+
+# memory and throughput of gene and organism objects (python -m benchmarks.genes)
+
+n_organisms = 2000
+n_mutations = 50
+n_activations = 1000000
+repeats = 5 # throughput is the best of several runs (less sensitive to noise)
+
+config = Configuration("./config/pop1.yaml").get()
+
+# grow organisms through structural mutations (same genomes for the same seed)
+def grow_organisms(innovations: InnovationRegistry) -> list[Organism]:
+    organisms = [Organism(species_id=None, config=config, innovations=innovations) for _ in range(n_organisms)] # type: ignore
+    for organism in organisms:
+        for _ in range(n_mutations):
+            organism.mutate()
+    return organisms
+
+# bytes allocated by live organisms (and their genes) after growing them
+def measure_memory() -> tuple[float, float]:
+    random.seed(0)
+    innovations = InnovationRegistry()
+    tracemalloc.start()
+    organisms = grow_organisms(innovations)
+    (allocated, _) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    n_genes = sum(len(o.genome) + len(o.nodes) for o in organisms)
+    return (allocated / n_organisms, allocated / max(1, n_genes))
+
+# bytes allocated (peak) by reproduction, averaged over the generations of an evolving population
+def measure_reproduction(size: int = 1000, generations: int = 20) -> float:
+    random.seed(0)
+    population = Population({**config, 'carrying_capacity': size}, lambda organism: 1 + organism.genome_size(), innovations=InnovationRegistry())
+    peaks = []
+    for _ in range(generations):
+        # same steps as an evolution, only reproduction is traced
+        population.compute_population_fitness()
+        population.adjust_compatibility_threshold()
+        population.speciate()
+        population.compute_population_adjusted_fitness_sum()
+        tracemalloc.start()
+        population.reproduce()
+        (_, peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+        population.generation += 1
+    return sum(peaks) / generations
+
+# mutations per second
+def measure_mutation() -> float:
+    times = []
+    for _ in range(repeats):
+        random.seed(0)
+        start = time.perf_counter()
+        grow_organisms(InnovationRegistry())
+        times.append(time.perf_counter() - start)
+    return n_organisms * n_mutations / min(times)
+
+# scalar activation calls per second
+def measure_activation() -> float:
+    activation = ActivationFunction(ActivationFunctions.Sigmoid)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for index in range(n_activations):
+            activation(index * 1e-6)
+        times.append(time.perf_counter() - start)
+    return n_activations / min(times)
+
+# single input row propagations per second
+def measure_propagation() -> float:
+    random.seed(0)
+    networks = [organism.phenotype() for organism in grow_organisms(InnovationRegistry())]
+    inputs = [0.5, -0.25, 1.0]
+    for network in networks:
+        network.propagate(inputs)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for network in networks:
+            network.propagate(inputs)
+        times.append(time.perf_counter() - start)
+    return len(networks) / min(times)
+
+if __name__ == "__main__":
+    (organism_bytes, gene_bytes) = measure_memory()
+    print(f"memory: {organism_bytes:.0f} bytes/organism | {gene_bytes:.0f} bytes/gene")
+    print(f"mutation: {measure_mutation():.0f} mutations/s")
+    print(f"reproduction: {measure_reproduction():.0f} bytes allocated/generation")
+    print(f"activation: {measure_activation():.0f} calls/s")
+    print(f"propagation: {measure_propagation():.0f} propagations/s")
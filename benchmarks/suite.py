@@ -0,0 +1,221 @@
+import argparse
+import json
+import random
+import sys
+import time
+import numpy as np
+from typing import Callable, Optional, TypedDict
+from config.configuration import Configuration, PopulationConfig
+from genetics.organism import Organism
+from genetics.population import Population
+from genetics.innovations import InnovationRegistry
+from genetics.genes import ConnectionGene
+from genetics.metrics import Metrics
+from genetics.novelty import NoveltySearch
+from nn.batch import propagate_networks
+
+# evolution loop and inference benchmarks (python -m benchmarks.suite [--output results.json] [--compare baseline.json])
+
+genome_sizes = [10, 50, 200] # connections per benchmarked genome
+population_sizes = [50, 100, 200] # organisms per speciated / evolved population
+batch_rows = [4, 256] # input rows shared by every network of a batched evaluation
+novelty_sizes = [200, 1000] # behaviours scored against a full archive
+novelty_archive_size = 2000
+n_organisms = 200
+n_generations = 10
+repeats = 5 # every measurement is the best of several runs (less sensitive to noise)
+speciation_repeats = 50 # a single speciation takes about a millisecond
+tolerance = 0.2 # default relative slowdown that counts as a regression (timings of a few milliseconds are noisy)
+
+config = Configuration("./config/pop1.yaml").get()
+
+# a single measurement (higher is better for rates, lower for durations)
+class BenchmarkResult(TypedDict):
+    value: float
+    unit: str
+    higher_is_better: bool
+
+# deterministic fitness of the network outputs (no external work, so only the evolution loop is measured)
+def benchmark_fitness(organism: Organism) -> float:
+    outputs = organism.phenotype().propagate(inputs=[0.5, -0.25, 1.0])
+    return 1 + abs(sum(outputs))
+
+# population config with another carrying capacity
+def sized_config(carrying_capacity: int) -> PopulationConfig:
+    return PopulationConfig(**{**config, 'carrying_capacity': carrying_capacity}) # type: ignore
+
+# grow organisms through structural mutations until they have a number of connections (same genomes for the same seed)
+def grow_organisms(innovations: InnovationRegistry, n: int, genome_size: int) -> list[Organism]:
+    organisms = [Organism(species_id=None, config=config, innovations=innovations) for _ in range(n)] # type: ignore
+    for organism in organisms:
+        while len(organism.genome) < genome_size:
+            if random.random() < 0.7:
+                organism.structurally_mutate_connection()
+            else:
+                organism.structurally_mutate_node()
+    return organisms
+
+# best time of several runs (setup isn't timed)
+def best_time(run: Callable[[], None], setup: Optional[Callable[[], None]] = None, repeats: int = repeats) -> float:
+    times = []
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+# single input row propagations per second for each genome size
+def measure_propagation() -> dict[str, BenchmarkResult]:
+    results: dict[str, BenchmarkResult] = {}
+    inputs = [0.5, -0.25, 1.0]
+    for genome_size in genome_sizes:
+        random.seed(0)
+        networks = [organism.phenotype() for organism in grow_organisms(InnovationRegistry(), n_organisms, genome_size)]
+        for network in networks:
+            network.propagate(inputs)
+        def run():
+            for network in networks:
+                network.propagate(inputs)
+        results[f"propagate/{genome_size}"] = BenchmarkResult(value=len(networks) / best_time(run), unit="propagations/s", higher_is_better=True)
+    return results
+
+# network input rows per second when a generation's networks are propagated together (mid-sized genomes)
+def measure_batch_propagation() -> dict[str, BenchmarkResult]:
+    results: dict[str, BenchmarkResult] = {}
+    random.seed(0)
+    networks = [organism.phenotype() for organism in grow_organisms(InnovationRegistry(), n_organisms, genome_sizes[1])]
+    for rows in batch_rows:
+        inputs = np.random.default_rng(0).uniform(-1, 1, (rows, 3))
+        results[f"propagate_networks/{rows}"] = BenchmarkResult(value=len(networks) * rows / best_time(lambda: propagate_networks(networks, inputs)), unit="rows/s", higher_is_better=True)
+    return results
+
+# gene distributions and compatibility distances per second for each genome size
+def measure_distance() -> dict[str, BenchmarkResult]:
+    results: dict[str, BenchmarkResult] = {}
+    population = Population(config, benchmark_fitness, innovations=InnovationRegistry(), metrics=Metrics(enabled=False))
+    for genome_size in genome_sizes:
+        random.seed(0)
+        organisms = grow_organisms(population.innovations, n_organisms, genome_size)
+        pairs = list(zip(organisms, organisms[1:]))
+        def distribution():
+            for (o1, o2) in pairs:
+                o1.gene_distribution(o2)
+        def compatibility():
+            for (o1, o2) in pairs:
+                population.compatibility(o1, o2)
+        results[f"gene_distribution/{genome_size}"] = BenchmarkResult(value=len(pairs) / best_time(distribution), unit="pairs/s", higher_is_better=True)
+        results[f"compatibility/{genome_size}"] = BenchmarkResult(value=len(pairs) / best_time(compatibility), unit="pairs/s", higher_is_better=True)
+    return results
+
+# new connection genes (random end points, innovation lookup or assignment) per second
+def measure_connections() -> dict[str, BenchmarkResult]:
+    random.seed(0)
+    nodes = grow_organisms(InnovationRegistry(), 1, genome_sizes[-1])[0].nodes
+    n_connections = 20000
+    registry = [InnovationRegistry()]
+    def setup():
+        registry[0] = InnovationRegistry()
+    def run():
+        for _ in range(n_connections):
+            ConnectionGene(innovations=registry[0], nodes=nodes)
+    return {"connection_creation": BenchmarkResult(value=n_connections / best_time(run, setup), unit="connections/s", higher_is_better=True)}
+
+# seconds to speciate each population size
+def measure_speciation() -> dict[str, BenchmarkResult]:
+    results: dict[str, BenchmarkResult] = {}
+    for carrying_capacity in population_sizes:
+        random.seed(0)
+        population = Population(sized_config(carrying_capacity), benchmark_fitness, innovations=InnovationRegistry(), metrics=Metrics(enabled=False))
+        for _ in range(n_generations):
+            population.evolve()
+        state = random.getstate()
+        species = [(species, list(species.organisms), species.representative) for species in population.species]
+        def setup():
+            random.setstate(state)
+            population.species = [s for (s, _, _) in species]
+            for (s, organisms, representative) in species:
+                (s.organisms, s.representative) = (list(organisms), representative)
+        results[f"speciate/{carrying_capacity}"] = BenchmarkResult(value=best_time(population.speciate, setup, speciation_repeats), unit="s", higher_is_better=False)
+    return results
+
+# seconds per generation for each carrying capacity
+def measure_evolution() -> dict[str, BenchmarkResult]:
+    results: dict[str, BenchmarkResult] = {}
+    for carrying_capacity in population_sizes:
+        def run():
+            random.seed(0)
+            population = Population(sized_config(carrying_capacity), benchmark_fitness, innovations=InnovationRegistry(), metrics=Metrics(enabled=False))
+            for _ in range(n_generations):
+                population.evolve()
+        results[f"evolve/{carrying_capacity}"] = BenchmarkResult(value=best_time(run) / n_generations, unit="s/generation", higher_is_better=False)
+
+        # compact population with batch reproduction
+        def run_batch():
+            random.seed(0)
+            population = Population(sized_config(carrying_capacity), benchmark_fitness, innovations=InnovationRegistry(), metrics=Metrics(enabled=False), compact=True, batch_reproduction=True)
+            for _ in range(n_generations):
+                population.evolve()
+        results[f"evolve_batch/{carrying_capacity}"] = BenchmarkResult(value=best_time(run_batch) / n_generations, unit="s/generation", higher_is_better=False)
+    return results
+
+# novelty scoring of 2d behaviours (k nearest neighbours among the population and a full archive)
+def measure_novelty() -> dict[str, BenchmarkResult]:
+    results: dict[str, BenchmarkResult] = {}
+    rng = np.random.default_rng(0)
+    for size in novelty_sizes:
+        search = NoveltySearch(archive_size=novelty_archive_size)
+        search.archive = rng.random((novelty_archive_size, 2))
+        behaviours = rng.random((size, 2)).tolist()
+        results[f"novelty/{size}"] = BenchmarkResult(value=size / best_time(lambda: search.score(behaviours)), unit="behaviours/s", higher_is_better=True)
+    return results
+
+# run every benchmark
+def run_benchmarks() -> dict[str, BenchmarkResult]:
+    results: dict[str, BenchmarkResult] = {}
+    for measure in (measure_propagation, measure_batch_propagation, measure_distance, measure_connections, measure_speciation, measure_evolution, measure_novelty):
+        results.update(measure())
+    return results
+
+# relative slowdown of every benchmark present in both results (positive -> slower than the baseline)
+def slowdowns(results: dict[str, BenchmarkResult], baseline: dict[str, BenchmarkResult]) -> dict[str, float]:
+    changes: dict[str, float] = {}
+    for (name, result) in results.items():
+        if name not in baseline or baseline[name]['value'] <= 0 or result['value'] <= 0:
+            continue
+        ratio = result['value'] / baseline[name]['value']
+        changes[name] = 1 / ratio - 1 if result['higher_is_better'] else ratio - 1
+    return changes
+
+# benchmarks that are slower than the baseline by more than the tolerance
+def regressions(results: dict[str, BenchmarkResult], baseline: dict[str, BenchmarkResult], tolerance: float = tolerance) -> list[str]:
+    return [name for (name, slowdown) in slowdowns(results, baseline).items() if slowdown > tolerance]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the evolution loop and network inference")
+    parser.add_argument("--output", help="write results to this json file (e.g. to save a baseline)")
+    parser.add_argument("--compare", help="compare results against a baseline json file (exit code 1 on regressions)")
+    parser.add_argument("--tolerance", type=float, default=tolerance, help="relative slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks()
+    baseline: dict[str, BenchmarkResult] = {}
+    if args.compare:
+        with open(args.compare) as stream:
+            baseline = json.load(stream)
+    changes = slowdowns(results, baseline)
+    failed = regressions(results, baseline, args.tolerance)
+
+    for (name, result) in results.items():
+        line = f"{name}: {result['value']:.6g} {result['unit']}"
+        if name in changes:
+            line += f" | {changes[name]:+.1%} time vs baseline" + (" | REGRESSION" if name in failed else "")
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as stream:
+            json.dump(results, stream, indent=2)
+    if failed:
+        print(f"{len(failed)} regression(s) beyond {args.tolerance:.0%}: {', '.join(failed)}")
+        sys.exit(1)
@@ -1,4 +1,4 @@
-from typing import TypedDict, cast
+from typing import TypedDict, NotRequired, Optional, cast
 import yaml
 
 OrganismConfig = TypedDict("OrganismConfig", {
@@ -16,7 +16,8 @@ SpeciationConfig = TypedDict('SpeciationConfig', {
     "threshold_step": float,
     "excess_factor": float,
     "disjoint_factor": float,
-    "weight_factor": float
+    "weight_factor": float,
+    "max_compared_species": NotRequired[Optional[int]]
 })
 
 PopulationConfig = TypedDict('PopulationConfig', {
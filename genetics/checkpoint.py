@@ -0,0 +1,247 @@
+from typing import Optional, Any
+from uuid import UUID
+import json
+import os
+import numpy as np
+from config.configuration import PopulationConfig
+from genetics.genes import ConnectionGene, NodeGene, NodeType
+from genetics.organism import Organism
+from genetics.species import Species
+from genetics.innovations import InnovationRegistry
+from genetics.store import GenomeStore
+from genetics.novelty import NoveltySearch
+
+# checkpoint file layout: magic | format version (uint32) | header length (uint64) | json header | 64 byte aligned raw arrays
+# the header describes every array (dtype, shape, offset), so arrays can be memory mapped straight from the file
+CHECKPOINT_MAGIC = b'NEATCKPT'
+CHECKPOINT_VERSION = 1
+CHECKPOINT_ALIGNMENT = 64
+
+# genome store arrays saved for store views
+store_arrays = ('node_ids', 'node_types', 'node_activations', 'node_listed', 'node_offsets', 'innovations', 'starts', 'ends', 'weights', 'enabled', 'connection_offsets')
+
+# write a header and named arrays (written to a temporary file first, so an interrupted save never corrupts an existing checkpoint)
+def write_checkpoint(path: str, header: dict[str, Any], arrays: dict[str, np.ndarray]):
+    arrays = {name: np.ascontiguousarray(array) for (name, array) in arrays.items()}
+
+    # array offsets are relative to the end of the header
+    layout: dict[str, dict[str, Any]] = {}
+    offset = 0
+    for (name, array) in arrays.items():
+        offset += -offset % CHECKPOINT_ALIGNMENT
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+
+    encoded_header = json.dumps({**header, "arrays": layout}).encode()
+    data_start = len(CHECKPOINT_MAGIC) + 4 + 8 + len(encoded_header)
+    encoded_header += b' ' * (-data_start % CHECKPOINT_ALIGNMENT)
+    data_start += -data_start % CHECKPOINT_ALIGNMENT
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as stream:
+        stream.write(CHECKPOINT_MAGIC)
+        stream.write(np.uint32(CHECKPOINT_VERSION).tobytes())
+        stream.write(np.uint64(len(encoded_header)).tobytes())
+        stream.write(encoded_header)
+        for (name, array) in arrays.items():
+            stream.seek(data_start + layout[name]["offset"])
+            stream.write(array.tobytes())
+    os.replace(temporary_path, path)
+
+# read a checkpoint's header and arrays (mmap -> arrays are read-only memory maps of the file, otherwise read into memory)
+def read_checkpoint(path: str, mmap: bool = True) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    with open(path, 'rb') as stream:
+        if stream.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError(f"{path} is not a population checkpoint")
+        version = int(np.frombuffer(stream.read(4), dtype=np.uint32)[0])
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {version} (expected {CHECKPOINT_VERSION})")
+        header_length = int(np.frombuffer(stream.read(8), dtype=np.uint64)[0])
+        header = json.loads(stream.read(header_length))
+        data_start = stream.tell()
+
+        arrays: dict[str, np.ndarray] = {}
+        for (name, description) in header.pop("arrays").items():
+            dtype = np.dtype(description["dtype"])
+            shape = tuple(description["shape"])
+            count = int(np.prod(shape))
+            if mmap and count > 0:
+                arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=data_start + description["offset"], shape=shape)
+            else:
+                stream.seek(data_start + description["offset"])
+                arrays[name] = np.fromfile(stream, dtype=dtype, count=count).reshape(shape)
+
+    return (header, arrays)
+
+# flatten lists of indices into (offsets, items)
+def flatten(lists: list[list[int]]) -> tuple[np.ndarray, np.ndarray]:
+    offsets = np.concatenate(([0], np.cumsum([len(items) for items in lists], dtype=np.int64)))
+    items = np.array([item for items in lists for item in items], dtype=np.int64)
+    return (offsets, items)
+
+# uuids as a [n, 16] byte array
+def encode_uuids(uuids: list[UUID]) -> np.ndarray:
+    return np.frombuffer(b''.join(uuid.bytes for uuid in uuids), dtype=np.uint8).reshape(len(uuids), 16)
+
+def decode_uuids(array: np.ndarray) -> list[UUID]:
+    return [UUID(bytes=bytes(row)) for row in np.asarray(array)]
+
+# innovation registry as arrays (assignment order is kept, so new innovations continue the numbering)
+def encode_innovations(innovations: InnovationRegistry) -> tuple[dict[str, Any], dict[str, np.ndarray]]:
+    header = {"path": innovations.path, "persist_interval": innovations.persist_interval, "unpersisted": innovations.unpersisted}
+    arrays = {
+        "innovation_connections": np.array(list(innovations.innovations.keys()), dtype=np.int64).reshape(-1, 2),
+        "innovation_numbers": np.array(list(innovations.innovations.values()), dtype=np.int64)
+    }
+    return (header, arrays)
+
+def decode_innovations(header: dict[str, Any], arrays: dict[str, np.ndarray]) -> InnovationRegistry:
+    innovations = InnovationRegistry(path=header["path"], persist_interval=header["persist_interval"])
+    innovations.innovations = dict(zip(map(tuple, arrays["innovation_connections"].tolist()), arrays["innovation_numbers"].tolist()))
+    innovations.unpersisted = header["unpersisted"]
+    return innovations
+
+# novelty search archive and the scored behaviours waiting to be archived as arrays (the search's settings are given again on load, like the fitness function)
+def encode_novelty(novelty: NoveltySearch) -> dict[str, np.ndarray]:
+    return {
+        "novelty_archive": novelty.archive if novelty.archive is not None else np.zeros((0, 0)),
+        "novelty_archive_novelty": novelty.archive_novelty,
+        **({"novelty_behaviours": novelty.behaviours, "novelty_novelty": novelty.novelty} if novelty.behaviours is not None else {})
+    }
+
+def decode_novelty(novelty: NoveltySearch, arrays: dict[str, np.ndarray]):
+    archive = np.array(arrays["novelty_archive"]) # copied out of the checkpoint, the archive grows every generation
+    novelty.archive = archive if archive.size > 0 else None
+    novelty.archive_novelty = np.array(arrays["novelty_archive_novelty"])
+    if "novelty_behaviours" in arrays:
+        (novelty.behaviours, novelty.novelty) = (np.array(arrays["novelty_behaviours"]), np.array(arrays["novelty_novelty"]))
+
+# species, organisms and genes as arrays
+# gene objects and node/connection lists shared between organisms (crossover and clones share them) are stored once,
+# so a resumed population mutates exactly like the saved one. store views keep their packed records instead.
+def encode_species(species_list: list[Species]) -> dict[str, np.ndarray]:
+    organisms = [organism for species in species_list for organism in species.organisms]
+    organisms += [species.representative for species in species_list if species.representative is not None]
+    organisms = list({id(organism): organism for organism in organisms}.values())
+    organism_index = {id(organism): index for (index, organism) in enumerate(organisms)}
+
+    # views are saved with their store (repacked if they don't all belong to one store)
+    views = [organism for organism in organisms if organism.is_view()]
+    stores = {id(organism.store): organism.store for organism in views}
+    if len(stores) == 1:
+        store: Optional[GenomeStore] = next(iter(stores.values()))
+        view_indices = {id(organism): organism.index for organism in views}
+    else:
+        store = GenomeStore.from_organisms(views) if len(views) > 0 else None
+        view_indices = {id(organism): index for (index, organism) in enumerate(views)}
+
+    # unique genes and gene lists (by identity)
+    nodes: dict[int, tuple[int, NodeGene]] = {}
+    connections: dict[int, tuple[int, ConnectionGene]] = {}
+    node_lists: dict[int, tuple[int, list[int]]] = {}
+    connection_lists: dict[int, tuple[int, list[int]]] = {}
+
+    def node_index(node: NodeGene) -> int:
+        return nodes.setdefault(id(node), (len(nodes), node))[0]
+
+    organism_nodes: list[int] = []
+    organism_genomes: list[int] = []
+    for organism in organisms:
+        if organism.is_view():
+            organism_nodes.append(-1)
+            organism_genomes.append(-1)
+            continue
+        if id(organism.nodes) not in node_lists:
+            node_lists[id(organism.nodes)] = (len(node_lists), [node_index(node) for node in organism.nodes])
+        if id(organism.genome) not in connection_lists:
+            for connection in organism.genome:
+                if id(connection) not in connections:
+                    node_index(connection.start)
+                    node_index(connection.end)
+                    connections[id(connection)] = (len(connections), connection)
+            connection_lists[id(organism.genome)] = (len(connection_lists), [connections[id(connection)][0] for connection in organism.genome])
+        organism_nodes.append(node_lists[id(organism.nodes)][0])
+        organism_genomes.append(connection_lists[id(organism.genome)][0])
+
+    node_genes = [node for (_, node) in nodes.values()]
+    connection_genes = [connection for (_, connection) in connections.values()]
+    (node_list_offsets, node_list_items) = flatten([items for (_, items) in node_lists.values()])
+    (connection_list_offsets, connection_list_items) = flatten([items for (_, items) in connection_lists.values()])
+    (species_offsets, species_members) = flatten([[organism_index[id(organism)] for organism in species.organisms] for species in species_list])
+
+    arrays = {
+        # genes
+        "node_ids": np.array([node.id for node in node_genes], dtype=np.int64),
+        "node_types": np.array([node.type.value for node in node_genes], dtype=np.int8),
+        "node_activations": np.array([node.activation_code for node in node_genes], dtype=np.int8),
+        "connection_innovations": np.array([connection.innovation for connection in connection_genes], dtype=np.int64),
+        "connection_starts": np.array([nodes[id(connection.start)][0] for connection in connection_genes], dtype=np.int64),
+        "connection_ends": np.array([nodes[id(connection.end)][0] for connection in connection_genes], dtype=np.int64),
+        "connection_weights": np.array([connection.weight for connection in connection_genes], dtype=np.float64),
+        "connection_enabled": np.array([connection.enabled for connection in connection_genes], dtype=np.bool_),
+        "node_list_offsets": node_list_offsets,
+        "node_list_items": node_list_items,
+        "connection_list_offsets": connection_list_offsets,
+        "connection_list_items": connection_list_items,
+
+        # organisms (node list, genome list or store index is -1 if unused)
+        "organism_ids": encode_uuids([organism.id for organism in organisms]),
+        "organism_species_ids": encode_uuids([organism.species_id for organism in organisms]),
+        "organism_fitness": np.array([(organism.fitness, organism.adjusted_fitness) for organism in organisms], dtype=np.float64).reshape(-1, 2),
+        "organism_nodes": np.array(organism_nodes, dtype=np.int64),
+        "organism_genomes": np.array(organism_genomes, dtype=np.int64),
+        "organism_views": np.array([view_indices.get(id(organism), -1) for organism in organisms], dtype=np.int64),
+
+        # species (representative is -1 if none)
+        "species_ids": encode_uuids([species.id for species in species_list]),
+        "species_fitness": np.array([(species.average_fitness, species.total_adjusted_fitness, species.total_fitness, species.average_adjusted_fitness) for species in species_list], dtype=np.float64).reshape(-1, 4),
+        "species_representatives": np.array([organism_index[id(species.representative)] if species.representative is not None else -1 for species in species_list], dtype=np.int64),
+        "species_offsets": species_offsets,
+        "species_members": species_members
+    }
+    if store is not None:
+        arrays.update({f"store_{name}": getattr(store, name) for name in store_arrays})
+
+    return arrays
+
+# rebuild species, organisms and genes (views are attached to a store over the checkpoint's arrays)
+def decode_species(arrays: dict[str, np.ndarray], config: PopulationConfig, innovations: InnovationRegistry) -> tuple[list[Species], Optional[GenomeStore]]:
+    store = GenomeStore(**{name: arrays[f"store_{name}"] for name in store_arrays}) if "store_node_ids" in arrays else None
+
+    node_genes = [NodeGene(id, type=NodeType(type), activation_code=activation) for (id, type, activation) in zip(arrays["node_ids"].tolist(), arrays["node_types"].tolist(), arrays["node_activations"].tolist())]
+    connection_genes = [
+        ConnectionGene(innovations=innovations, start=node_genes[start], end=node_genes[end], weight=weight, enabled=enabled, innovation=innovation)
+        for (innovation, start, end, weight, enabled) in zip(arrays["connection_innovations"].tolist(), arrays["connection_starts"].tolist(), arrays["connection_ends"].tolist(), arrays["connection_weights"].tolist(), arrays["connection_enabled"].tolist())
+    ]
+
+    node_list_offsets = arrays["node_list_offsets"].tolist()
+    node_list_items = arrays["node_list_items"].tolist()
+    node_lists = [[node_genes[item] for item in node_list_items[start:end]] for (start, end) in zip(node_list_offsets, node_list_offsets[1:])]
+    connection_list_offsets = arrays["connection_list_offsets"].tolist()
+    connection_list_items = arrays["connection_list_items"].tolist()
+    connection_lists = [[connection_genes[item] for item in connection_list_items[start:end]] for (start, end) in zip(connection_list_offsets, connection_list_offsets[1:])]
+
+    organisms: list[Organism] = []
+    for (id, species_id, (fitness, adjusted_fitness), nodes, genome, view) in zip(decode_uuids(arrays["organism_ids"]), decode_uuids(arrays["organism_species_ids"]), arrays["organism_fitness"].tolist(), arrays["organism_nodes"].tolist(), arrays["organism_genomes"].tolist(), arrays["organism_views"].tolist()):
+        if view >= 0:
+            assert store is not None, "Checkpoint has store views but no genome store"
+            organism = store.organism(view, species_id, config, innovations)
+        else:
+            organism = Organism(species_id=species_id, config=config, innovations=innovations, genome=connection_lists[genome], nodes=node_lists[nodes])
+        organism.id = id
+        organism.fitness = fitness
+        organism.adjusted_fitness = adjusted_fitness
+        organisms.append(organism)
+
+    species_list: list[Species] = []
+    species_offsets = arrays["species_offsets"].tolist()
+    species_members = arrays["species_members"].tolist()
+    for (index, (id, fitness, representative)) in enumerate(zip(decode_uuids(arrays["species_ids"]), arrays["species_fitness"].tolist(), arrays["species_representatives"].tolist())):
+        species = Species(config=config, innovations=innovations)
+        species.id = id
+        (species.average_fitness, species.total_adjusted_fitness, species.total_fitness, species.average_adjusted_fitness) = fitness
+        species.organisms = [organisms[member] for member in species_members[species_offsets[index]:species_offsets[index + 1]]]
+        species.representative = organisms[representative] if representative >= 0 else None
+        species_list.append(species)
+
+    return (species_list, store)
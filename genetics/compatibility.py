@@ -0,0 +1,86 @@
+from typing import Iterator, Optional
+import numpy as np
+from config.configuration import SpeciationConfig
+from genetics.organism import Organism
+
+# sparse innovation-indexed encoding of a generation's genomes
+# each column is an (innovation, occurrence) pair, so duplicate genes are aligned in genome order like gene_distribution
+class InnovationMatrix:
+    def __init__(self, organisms: list[Organism]) -> None:
+        self.n_organisms = len(organisms)
+        genomes = [o.innovations_and_weights() for o in organisms] # (innovations, weights) per genome (store views aren't materialized)
+        self.sizes = np.array([len(innovations) for (innovations, _) in genomes], dtype=np.int64) # genome lengths
+        self.largest = np.array([max(innovations, default=0) for (innovations, _) in genomes], dtype=np.int64) # largest innovation per genome (0 if empty)
+
+        # column -> (rows that have the gene, their weights), rows are in ascending order
+        columns: dict[tuple[int, int], tuple[list[int], list[float]]] = {}
+        innovations: list[int] = []
+        owners: list[int] = []
+        for (row, (genome_innovations, genome_weights)) in enumerate(genomes):
+            occurrences: dict[int, int] = {}
+            for (innovation, weight) in zip(genome_innovations, genome_weights):
+                occurrence = occurrences.get(innovation, 0)
+                occurrences[innovation] = occurrence + 1
+                (rows, weights) = columns.setdefault((innovation, occurrence), ([], []))
+                rows.append(row)
+                weights.append(weight)
+                innovations.append(innovation)
+                owners.append(row)
+
+        self.column_rows = [np.array(rows, dtype=np.intp) for (rows, _) in columns.values()]
+        self.column_weights = [np.array(weights, dtype=np.float64) for (_, weights) in columns.values()]
+
+        # at_most[t, i] = number of genes of organism i with innovation <= thresholds[t] (thresholds are every genome's largest innovation)
+        self.thresholds, self.threshold_index = np.unique(self.largest, return_inverse=True)
+        counts = np.zeros((len(self.thresholds), self.n_organisms), dtype=np.int64)
+        if len(innovations) > 0:
+            np.add.at(counts, (np.searchsorted(self.thresholds, np.array(innovations), side='left'), np.array(owners)), 1)
+        self.at_most = np.cumsum(counts, axis=0)
+
+    # genetic distance of rows [start, end) against every organism (same terms as Population.compatibility)
+    def distance_block(self, config: SpeciationConfig, start: int, end: int) -> np.ndarray:
+        shared = np.zeros((end - start, self.n_organisms))
+        weight_differences = np.zeros((end - start, self.n_organisms))
+
+        # only organisms sharing a gene contribute to a column, so work per column is quadratic in its (small) row count
+        for (rows, weights) in zip(self.column_rows, self.column_weights):
+            (low, high) = np.searchsorted(rows, [start, end])
+            if low == high:
+                continue
+            block_rows = rows[low:high] - start
+            shared[np.ix_(block_rows, rows)] += 1
+            weight_differences[np.ix_(block_rows, rows)] += np.abs(weights[low:high, None] - weights[None, :])
+
+        sizes = self.sizes[start:end, None]
+        other_sizes = self.sizes[None, :]
+
+        # excess genes belong to the larger genome (ties -> second organism) and come after the smaller genome's largest innovation
+        larger = sizes > other_sizes
+        excess_from_row = sizes - self.at_most[self.threshold_index[None, :], np.arange(start, end)[:, None]]
+        excess_from_other = other_sizes - self.at_most[self.threshold_index[start:end, None], np.arange(self.n_organisms)[None, :]]
+        n_excess = np.where(larger, excess_from_row, excess_from_other)
+        n_disjoint = sizes + other_sizes - 2 * shared - n_excess
+
+        avg_weight = np.divide(weight_differences, shared, out=np.zeros_like(weight_differences), where=shared > 0)
+        max_genome_size = np.maximum(sizes, other_sizes)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distance = (n_excess * config.get('excess_factor')) / max_genome_size + (n_disjoint * config.get('disjoint_factor')) / max_genome_size + avg_weight * config.get('weight_factor')
+
+        # empty genomes -> distance = 0
+        return np.where(max_genome_size == 0, 0.0, distance)
+
+    # yield (first row, distances) blocks of at most block_size rows (bounds memory for very large populations)
+    def distance_blocks(self, config: SpeciationConfig, block_size: int) -> Iterator[tuple[int, np.ndarray]]:
+        for start in range(0, self.n_organisms, block_size):
+            yield (start, self.distance_block(config, start, min(start + block_size, self.n_organisms)))
+
+# full [organisms, organisms] genetic distance matrix (entry i, j -> compatibility(organisms[i], organisms[j]))
+def compatibility_matrix(organisms: list[Organism], config: SpeciationConfig, block_size: Optional[int] = None) -> np.ndarray:
+    matrix = InnovationMatrix(organisms)
+    distances = np.empty((len(organisms), len(organisms)))
+
+    for (start, block) in matrix.distance_blocks(config, block_size if block_size else max(1, len(organisms))):
+        distances[start:start + len(block)] = block
+
+    return distances
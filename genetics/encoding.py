@@ -0,0 +1,26 @@
+from typing import Optional
+from uuid import UUID
+from config.configuration import PopulationConfig
+from genetics.genes import EncodedNode, EncodedConnection, decode_node, decode_genome
+from genetics.organism import Organism
+from genetics.innovations import InnovationRegistry
+
+# compact, picklable genome representation (plain tuples, no gene objects or activation callables)
+EncodedOrganism = tuple[UUID, list[EncodedNode], list[EncodedNode], list[EncodedConnection], float, float] # (species id, nodes, connection only nodes, connections, fitness, adjusted fitness)
+
+# encode an organism (works on genome store views without materializing genes)
+def encode_organism(organism: Organism) -> EncodedOrganism:
+    (nodes, orphans, connections) = organism.records()
+    return (organism.species_id, nodes, orphans, connections, organism.fitness, organism.adjusted_fitness)
+
+# rebuild an organism from its encoding (no registry -> organism can be evaluated but not structurally mutated)
+def decode_organism(encoded: EncodedOrganism, config: PopulationConfig, innovations: Optional[InnovationRegistry] = None) -> Organism:
+    (species_id, encoded_nodes, encoded_orphans, encoded_connections, fitness, adjusted_fitness) = encoded
+
+    (nodes, genome) = decode_genome(encoded_nodes, encoded_orphans, encoded_connections, innovations)
+
+    organism = Organism(species_id=species_id, config=config, innovations=innovations, genome=genome, nodes=nodes)
+    organism.fitness = fitness
+    organism.adjusted_fitness = adjusted_fitness
+
+    return organism
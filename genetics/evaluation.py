@@ -0,0 +1,217 @@
+from typing import Any, Awaitable, Callable, Coroutine, Optional, Union
+from enum import Enum
+import asyncio
+import inspect
+import math
+import os
+import numpy as np
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from config.configuration import PopulationConfig
+from genetics.organism import Organism
+from genetics.encoding import EncodedOrganism, encode_organism, decode_organism
+from genetics.shared import SharedLayout, SharedGenomes
+from nn.batch import propagate_networks
+
+# where fitness functions are executed
+class EvaluationBackend(Enum):
+    SERIAL = 1
+    THREAD = 2
+    PROCESS = 3
+    SHARED_MEMORY = 4 # process pool reading a generation's packed genomes from one shared memory buffer
+
+# synchronous fitness function (or BatchFitness), or an async one (evaluated concurrently on an event loop, e.g. for simulators behind sockets)
+FitnessFunction = Union[Callable[[Organism], float], Callable[[Organism], Awaitable[float]]]
+
+# fitness of every organism from the outputs of its network for the same inputs (e.g. a fixed dataset)
+# a generation's networks are propagated together ([organisms, rows, outputs]) and scored by one vectorized function ([organisms, rows, outputs] -> [organisms])
+class BatchFitness:
+    def __init__(self, inputs: np.ndarray, fitness: Callable[[np.ndarray], np.ndarray]) -> None:
+        self.inputs = np.asarray(inputs, dtype=np.float64) # [rows, network inputs]
+        self.fitness = fitness
+
+    # fitness of a generation's organisms (in organism order)
+    def evaluate(self, organisms: list[Organism]) -> list[float]:
+        if len(organisms) == 0:
+            return []
+        outputs = propagate_networks([organism.phenotype() for organism in organisms], self.inputs)
+        return np.asarray(self.fitness(outputs), dtype=np.float64).reshape(len(organisms)).tolist()
+
+    # fitness of a single organism (usable wherever a plain fitness function is expected)
+    def __call__(self, organism: Organism) -> float:
+        return self.evaluate([organism])[0]
+
+# worker process state (assigned once by the pool initializer)
+worker_fitness_function: Optional[Callable[[Organism], float]] = None
+worker_config: Optional[PopulationConfig] = None
+worker_genomes: Optional[SharedGenomes] = None # current generation's shared buffer (attached once per generation)
+
+# store fitness function and config in a newly started worker process
+def initialize_worker(fitness_function: Callable[[Organism], float], config: PopulationConfig):
+    global worker_fitness_function, worker_config
+    worker_fitness_function = fitness_function
+    worker_config = config
+
+# rebuild and evaluate a chunk of encoded organisms inside a worker process
+def evaluate_encoded_chunk(chunk: list[EncodedOrganism]) -> list[float]:
+    assert worker_fitness_function is not None and worker_config is not None, "Worker process wasn't initialized"
+    return [worker_fitness_function(decode_organism(encoded, worker_config)) for encoded in chunk]
+
+# evaluate a range of the organisms published in a shared memory buffer inside a worker process
+def evaluate_shared_chunk(name: str, layout: SharedLayout, start: int, end: int) -> list[float]:
+    global worker_genomes
+    assert worker_fitness_function is not None and worker_config is not None, "Worker process wasn't initialized"
+    if worker_genomes is None or worker_genomes.name != name:
+        if worker_genomes is not None:
+            worker_genomes.close()
+        worker_genomes = SharedGenomes.attach(name, layout)
+    return [worker_fitness_function(worker_genomes.organism(index, worker_config)) for index in range(start, end)]
+
+# fitness values of previously evaluated genomes keyed by genome hash (oldest entries are evicted past max size)
+class FitnessCache:
+    def __init__(self, max_size: Optional[int] = None) -> None:
+        self.max_size = max_size
+        self.fitnesses: dict[int, float] = {}
+
+        # evaluations skipped and performed
+        self.hits = 0
+        self.misses = 0
+
+    # get the cached fitness of a genome hash (none if genome wasn't evaluated)
+    def get(self, key: int) -> Optional[float]:
+        return self.fitnesses.get(key)
+
+    # cache the fitness of a genome hash
+    def set(self, key: int, fitness: float):
+        self.fitnesses[key] = fitness
+        if self.max_size is not None and len(self.fitnesses) > self.max_size:
+            del self.fitnesses[next(iter(self.fitnesses))]
+
+    # remove all cached fitness values (counts are kept)
+    def clear(self):
+        self.fitnesses.clear()
+
+    def __contains__(self, key: int) -> bool:
+        return key in self.fitnesses
+
+    def __len__(self) -> int:
+        return len(self.fitnesses)
+
+    # string representation of cache usage
+    def __str__(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups > 0 else 0.0
+        return f"entries ({len(self.fitnesses)}) | hits: {self.hits} | misses: {self.misses} | hit rate: {hit_rate:.2%}"
+
+# run a coroutine to completion from synchronous code
+# a thread already running an event loop (e.g. evolve called from a coroutine or a notebook) can't start another one, so the coroutine runs on a worker thread's loop
+# (the calling loop is blocked until it's done, await Evaluator.evaluate_async directly to keep it running)
+def run_coroutine(coroutine: Coroutine[Any, Any, list[float]]) -> list[float]:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+# evaluates a generation's fitness serially, on a thread pool or on a process pool (results are always in organism order)
+# async fitness functions are always awaited on an event loop in this process and batch fitness functions evaluate the whole batch at once (the backend is ignored)
+class Evaluator:
+    def __init__(self, backend: EvaluationBackend = EvaluationBackend.SERIAL, workers: Optional[int] = None, chunk_size: Optional[int] = None, concurrency: Optional[int] = None, timeout: Optional[float] = None, fallback_fitness: float = 0.0) -> None:
+        self.backend = backend
+        self.workers = workers if workers else (os.cpu_count() or 1)
+        self.chunk_size = chunk_size # organisms per task (none -> about 4 tasks per worker)
+
+        # async evaluation: max concurrently awaited evaluations, seconds per evaluation (none -> no limit)
+        # and the fitness assigned to evaluations that timed out or raised
+        self.concurrency = concurrency if concurrency else 64
+        self.timeout = timeout
+        self.fallback_fitness = fallback_fitness
+
+        # failed async evaluations (totals, and indices in the last evaluated batch)
+        self.timeouts = 0
+        self.failures = 0
+        self.failed: list[int] = []
+
+        # pools are started lazily and reused across generations
+        self.executor: Optional[Executor] = None
+        self.executor_key: Optional[tuple[Callable[[Organism], float], PopulationConfig]] = None # what a process pool was initialized with
+
+    # compute the fitness of every organism
+    def evaluate(self, organisms: list[Organism], fitness_function: FitnessFunction, config: PopulationConfig) -> list[float]:
+        self.failed = []
+        if isinstance(fitness_function, BatchFitness):
+            return fitness_function.evaluate(organisms)
+        if inspect.iscoroutinefunction(fitness_function):
+            return run_coroutine(self.evaluate_async(organisms, fitness_function))
+        if self.backend == EvaluationBackend.SERIAL or len(organisms) == 0:
+            return [fitness_function(organism) for organism in organisms]
+
+        chunk_size = self.chunk_size if self.chunk_size else max(1, math.ceil(len(organisms) / (self.workers * 4)))
+        chunks = [organisms[i:i + chunk_size] for i in range(0, len(organisms), chunk_size)]
+
+        if self.backend == EvaluationBackend.THREAD:
+            executor = self.get_executor()
+            results = executor.map(lambda chunk: [fitness_function(organism) for organism in chunk], chunks)
+        elif self.backend == EvaluationBackend.SHARED_MEMORY:
+            # one buffer is published per generation, workers only receive its name and their index range
+            executor = self.get_executor(fitness_function, config)
+            genomes = SharedGenomes.publish(organisms)
+            try:
+                starts = range(0, len(organisms), chunk_size)
+                ends = [min(start + chunk_size, len(organisms)) for start in starts]
+                results = list(executor.map(evaluate_shared_chunk, [genomes.name] * len(ends), [genomes.layout] * len(ends), starts, ends))
+            finally:
+                genomes.close()
+        else:
+            # process workers receive compact genome encodings instead of gene object graphs
+            executor = self.get_executor(fitness_function, config)
+            results = executor.map(evaluate_encoded_chunk, [[encode_organism(organism) for organism in chunk] for chunk in chunks])
+
+        return [fitness for chunk_fitnesses in results for fitness in chunk_fitnesses]
+
+    # await an async fitness function for every organism (bounded concurrency, failed evaluations get the fallback fitness)
+    async def evaluate_async(self, organisms: list[Organism], fitness_function: Callable[[Organism], Awaitable[float]]) -> list[float]:
+        self.failed = []
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def evaluate_organism(index: int, organism: Organism) -> float:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(fitness_function(organism), self.timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                except Exception:
+                    self.failures += 1
+                self.failed.append(index)
+                return self.fallback_fitness
+
+        fitnesses = await asyncio.gather(*[evaluate_organism(index, organism) for (index, organism) in enumerate(organisms)])
+        self.failed.sort()
+        return fitnesses
+
+    # get (or start) the pool for this backend, process pools are restarted if the fitness function or config changed
+    def get_executor(self, fitness_function: Optional[Callable[[Organism], float]] = None, config: Optional[PopulationConfig] = None) -> Executor:
+        if self.backend in (EvaluationBackend.PROCESS, EvaluationBackend.SHARED_MEMORY):
+            assert fitness_function is not None and config is not None
+            if self.executor is not None and self.executor_key != (fitness_function, config):
+                self.close()
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=initialize_worker, initargs=(fitness_function, config))
+                self.executor_key = (fitness_function, config)
+        elif self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        return self.executor
+
+    # shut down worker pool (if one was started)
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+        self.executor = None
+        self.executor_key = None
+
+    def __enter__(self) -> 'Evaluator':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
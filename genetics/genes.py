@@ -1,8 +1,9 @@
 from typing import Optional, Self, Callable
 from enum import Enum
 import random
-from tinydb import TinyDB, Query
-from nn.activations import ActivationFunction, ActivationFunctions
+from nn.activations import ActivationFunction, ActivationFunctions, activation_codes, activation_instances, activation_table, random_activation
+from genetics.innovations import InnovationRegistry
+from utils import default_random
 
 # node type identifier
 class NodeType(Enum):
@@ -10,36 +11,56 @@ class NodeType(Enum):
     OUTPUT = 2
     HIDDEN = 3
 
+# plain records of genes (used by compact and packed genome representations)
+EncodedNode = tuple[int, int, int] # (id, node type, activation index)
+EncodedConnection = tuple[int, int, int, float, bool] # (innovation, start id, end id, weight, enabled)
+
+# owner of genes that may be referenced by several organisms (copied before they're changed, see Organism.token)
+SHARED_GENE = 0
+
 # node gene for organism (activation functions)
 class NodeGene:
-    def __init__(self, id: int, type: Optional[NodeType] = None, activation: Optional[ActivationFunction] = None) -> None:
+    __slots__ = ('type', 'id', 'activation_code', 'owner')
+
+    def __init__(self, id: int, type: Optional[NodeType] = None, activation: Optional[ActivationFunction] = None, activation_code: Optional[int] = None, rng: random.Random = default_random, owner: int = SHARED_GENE) -> None:
         self.type = type if type else NodeType.HIDDEN
         self.id = id
-        self.value: Optional[float] = None
+        self.owner = owner # token of the only organism allowed to change the node in place
 
-        # input node activation is always linear
+        # activation function is stored as its code (input node activation is always linear)
         if type == NodeType.INPUT:
-            self.activation = ActivationFunction(ActivationFunctions.Linear)
+            self.activation_code = activation_codes[ActivationFunctions.Linear]
         elif activation:
-            self.activation = activation
+            self.activation_code = activation.code
+        elif activation_code is not None:
+            self.activation_code = activation_code
         else:
-            self.roll_activation()
+            self.roll_activation(rng)
+
+    # shared activation function instance of the node's code
+    @property
+    def activation(self) -> ActivationFunction:
+        return activation_instances[self.activation_code]
+
+    @activation.setter
+    def activation(self, activation: ActivationFunction):
+        self.activation_code = activation.code
 
     # randomly choose a different activation function
-    def roll_activation(self):
-        self.activation = ActivationFunction()
+    def roll_activation(self, rng: random.Random = default_random):
+        self.activation_code = random_activation(rng)
 
-    # apply activation function to input value and assign to node
-    def activate(self, input: float):
-        self.value = self.activation(input)
+    # copy of node for an owner
+    def copy(self, owner: int) -> 'NodeGene':
+        return NodeGene(self.id, type=self.type, activation_code=self.activation_code, owner=owner)
 
-    # reset the nodes value
-    def clear(self):
-        self.value = None
+    # plain record of node
+    def record(self) -> EncodedNode:
+        return (self.id, self.type.value, self.activation_code)
 
     # directly call the activation function for this node
     def __call__(self, input: float) -> float:
-        return self.activation(input)
+        return activation_table[self.activation_code](input)
     
     # check if any two nodes are equal (compare unique id)
     def __eq__(self, node: Self) -> bool:
@@ -47,24 +68,26 @@ class NodeGene:
     
     # string representation of node
     def __str__(self) -> str:
-        return f"id: {self.id} | type: {self.type.name} | f: {self.activation} | Value: {self.value}"
+        return f"id: {self.id} | type: {self.type.name} | f: {self.activation.type.name}"
 
 # connection gene for organisms genomes (connections between nodes)
 class ConnectionGene:
-    def __init__(self, population_name: str, nodes: Optional[list[NodeGene]] = None, weight: Optional[float] = None, start: Optional[NodeGene] = None, end: Optional[NodeGene] = None, enabled: bool = True) -> None:
-        self.weight = weight if weight else random.uniform(-1, 1)
+    __slots__ = ('weight', 'enabled', 'start', 'end', 'innovation', 'owner')
+
+    def __init__(self, innovations: Optional[InnovationRegistry], nodes: Optional[list[NodeGene]] = None, weight: Optional[float] = None, start: Optional[NodeGene] = None, end: Optional[NodeGene] = None, enabled: bool = True, innovation: Optional[int] = None, rng: random.Random = default_random, owner: int = SHARED_GENE) -> None:
+        self.weight = weight if weight is not None else rng.uniform(-1, 1)
         self.enabled = enabled
-        self.innovation: int = 0
+        self.owner = owner # token of the only organism allowed to change the connection in place
 
         if start and end:
             self.start = start
             self.end = end
         elif nodes:
             temp_nodes = nodes.copy()
-            random.shuffle(temp_nodes)
+            rng.shuffle(temp_nodes)
 
             # randomly choose starting node
-            self.start = temp_nodes.pop(random.randint(0, len(nodes) - 1))
+            self.start = temp_nodes.pop(rng.randint(0, len(nodes) - 1))
 
             # choose node with different type (ensure they aren't in the same layer)
             for node in temp_nodes:
@@ -78,22 +101,13 @@ class ConnectionGene:
         # reorder nodes to properly identify connection
         self.reorder() #? could be initialized in order
         
-        #? I don't like receiving population name like this...
-        db = TinyDB(f"{population_name}-db.json")
-        Innovations = Query()
-
-        # check if connection exists
-        connection_query = db.search(Innovations.connection == f"{self.start.id}-{self.end.id}")
-
-        # if connection exists, fetch innovation number and assign it to connection
-        if len(connection_query) > 0:
-            self.innovation = connection_query[0]['innovation']
+        # known innovation number (decoded genomes) -> use it, otherwise fetch from registry (assigned if connection is new)
+        if innovation is not None:
+            self.innovation = innovation
+        elif innovations is not None:
+            self.innovation = innovations.get(self.start.id, self.end.id)
         else:
-            # if connection doesn't exist, assign new innovation number and insert it into db
-            connection_count = db.count(Innovations.connection.exists())
-            if connection_count > 0:
-                self.innovation = connection_count
-            db.insert({'innovation': self.innovation, 'connection': f"{self.start.id}-{self.end.id}"})
+            raise ValueError("New connection needs an innovation registry")
     
     # disable connection
     def disable(self):
@@ -104,13 +118,13 @@ class ConnectionGene:
         self.enabled = True
 
     # nudge weight in random direction (doesn't completely override weight)
-    def nudge_weight(self, factor: Optional[float] = None): #todo: unused
-        direction = -1 if random.randint(0, 1) == 0 else 1
+    def nudge_weight(self, factor: Optional[float] = None, rng: random.Random = default_random): #todo: unused
+        direction = -1 if rng.randint(0, 1) == 0 else 1
         self.weight += direction * (factor if factor else 1)
 
     # randomize value of weight, optionally scale uniform value
-    def randomize_weight(self, factor: Optional[float] = None):
-        self.weight =  random.uniform(-1, 1) * (factor if factor else 1)
+    def randomize_weight(self, factor: Optional[float] = None, rng: random.Random = default_random):
+        self.weight =  rng.uniform(-1, 1) * (factor if factor else 1)
     
     # reorder nodes, if start node is greater than end node, swap them
     def reorder(self):
@@ -124,6 +138,14 @@ class ConnectionGene:
         elif self.start.type == NodeType.HIDDEN and self.end.type == NodeType.HIDDEN and self.start.id > self.end.id:
             self.start, self.end = self.end, self.start
 
+    # copy of connection for an owner (end points are shared, nodes are never changed through connections)
+    def copy(self, owner: int) -> 'ConnectionGene':
+        return ConnectionGene(innovations=None, start=self.start, end=self.end, weight=self.weight, enabled=self.enabled, innovation=self.innovation, owner=owner)
+
+    # plain record of connection
+    def record(self) -> EncodedConnection:
+        return (self.innovation, self.start.id, self.end.id, self.weight, self.enabled)
+
     # check if connection is connected to node
     def is_connected_to(self, node: 'NodeGene'):
         return self.start == node or self.end == node
@@ -137,4 +159,19 @@ class ConnectionGene:
     def __str__(self) -> str:
         return f"inv: {self.innovation} | enabled: {self.enabled} | {self.start.id} -> {self.end.id} | W: {self.weight}"
 
-    
\ No newline at end of file
+# decode a single node gene
+def decode_node(encoded: EncodedNode, owner: int = SHARED_GENE) -> NodeGene:
+    (id, type, activation) = encoded
+    return NodeGene(id, type=NodeType(type), activation_code=activation, owner=owner)
+
+# rebuild node and connection genes from encoded records (connections resolve end points by id, same resolution as the network)
+# owner -> token of the organism the genes are decoded for
+def decode_genome(encoded_nodes: list[EncodedNode], encoded_orphans: list[EncodedNode], encoded_connections: list[EncodedConnection], innovations: Optional[InnovationRegistry] = None, owner: int = SHARED_GENE) -> tuple[list[NodeGene], list[ConnectionGene]]:
+    nodes = [decode_node(node, owner) for node in encoded_nodes]
+
+    nodes_by_id = {node.id: node for node in (decode_node(orphan, owner) for orphan in encoded_orphans)}
+    nodes_by_id.update({node.id: node for node in nodes})
+
+    genome = [ConnectionGene(innovations=innovations, start=nodes_by_id[start], end=nodes_by_id[end], weight=weight, enabled=enabled, innovation=innovation, owner=owner) for (innovation, start, end, weight, enabled) in encoded_connections]
+
+    return (nodes, genome)
@@ -0,0 +1,59 @@
+from typing import Optional
+from tinydb import TinyDB
+
+# in-memory registry of connection innovations (connection -> innovation number) owned by a population
+class InnovationRegistry:
+    def __init__(self, path: Optional[str] = None, persist_interval: Optional[int] = None) -> None:
+        self.path = path # where the registry is persisted (no path -> memory only)
+        self.persist_interval = persist_interval # persist every n new innovations (none -> only when persist is called)
+        self.innovations: dict[tuple[int, int], int] = {} # (start id, end id) -> innovation number
+        self.unpersisted = 0 # innovations created since the last persist
+
+    # fetch the innovation number of a connection, assign the next number if the connection is new
+    def get(self, start: int, end: int) -> int:
+        key = (start, end)
+        innovation = self.innovations.get(key)
+
+        if innovation is None:
+            innovation = len(self.innovations)
+            self.innovations[key] = innovation
+            self.unpersisted += 1
+
+            # periodic bulk persistence
+            if self.persist_interval and self.unpersisted >= self.persist_interval:
+                self.persist()
+
+        return innovation
+
+    # write the whole registry to disk in a single bulk insert (skip if nothing changed)
+    def persist(self):
+        if self.path is None or self.unpersisted == 0:
+            return
+
+        db = TinyDB(self.path)
+        db.truncate()
+        db.insert_multiple([{'innovation': innovation, 'connection': f"{start}-{end}"} for ((start, end), innovation) in self.innovations.items()])
+        db.close()
+
+        self.unpersisted = 0
+
+    # reload a persisted registry (used to resume a population)
+    @classmethod
+    def load(cls, path: str, persist_interval: Optional[int] = None) -> 'InnovationRegistry':
+        registry = cls(path=path, persist_interval=persist_interval)
+
+        db = TinyDB(path)
+        for record in db.all():
+            start, end = record['connection'].split('-')
+            registry.innovations[(int(start), int(end))] = record['innovation']
+        db.close()
+
+        return registry
+
+    # number of known innovations
+    def __len__(self) -> int:
+        return len(self.innovations)
+
+    # check if a connection (start id, end id) already has an innovation number
+    def __contains__(self, key: tuple[int, int]) -> bool:
+        return key in self.innovations
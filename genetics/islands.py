@@ -0,0 +1,196 @@
+from typing import Callable, Optional, Any
+from enum import Enum
+import multiprocessing
+from multiprocessing.connection import Connection
+import random
+from config.configuration import PopulationConfig
+from genetics.organism import Organism
+from genetics.genes import ConnectionGene
+from genetics.population import Population
+from genetics.innovations import InnovationRegistry
+from genetics.encoding import EncodedOrganism, encode_organism, decode_organism
+from genetics.metrics import GenerationRecord
+
+# which islands receive each island's migrants
+class MigrationTopology(Enum):
+    RING = 1 # island i -> island i + 1
+    FULLY_CONNECTED = 2 # island i -> every other island
+
+# connection innovations created since the last synchronization, in creation order
+InnovationAdditions = list[tuple[tuple[int, int], int]] # ((start id, end id), innovation number)
+
+# a single population of the island model (runs inside a worker process or in the runner's process)
+class Island:
+    def __init__(self, config: PopulationConfig, fitness_function: Callable[[Organism], float], seed: Optional[int] = None, compact: bool = False) -> None:
+        if seed is not None:
+            random.seed(seed) # for anything outside the population (e.g. the fitness function)
+
+        # innovations are numbered locally between synchronizations, everything up to base is globally agreed on
+        # seeded islands evolve from their own random streams, so islands sharing a process don't disturb each other
+        self.innovations = InnovationRegistry()
+        self.population = Population(config, fitness_function, innovations=self.innovations, compact=compact, seed=seed)
+        self.base = 0
+
+    # evolve some generations, return the new (local) innovations and the generations' metrics
+    def evolve(self, generations: int) -> tuple[InnovationAdditions, list[GenerationRecord]]:
+        records: list[GenerationRecord] = []
+        for _ in range(generations):
+            self.population.evolve()
+            record = self.population.metrics.last()
+            if record is not None:
+                records.append(record)
+        additions = list(self.innovations.innovations.items())[self.base:]
+        return (additions, records)
+
+    # renumber local innovations to the global numbering and adopt the global registry
+    def synchronize(self, mapping: dict[int, int], additions: InnovationAdditions):
+        organisms = [organism for species in self.population.species for organism in species.organisms]
+        organisms += [species.representative for species in self.population.species if species.representative is not None]
+        stores = {id(self.population.store): self.population.store} if self.population.store is not None else {}
+        connections: dict[int, ConnectionGene] = {}
+        for organism in organisms:
+            if organism.is_view():
+                stores.setdefault(id(organism.store), organism.store)
+                continue
+            connections.update((id(connection), connection) for connection in organism.genome)
+
+        # genes shared by several organisms are renumbered once
+        for connection in connections.values():
+            connection.innovation = mapping.get(connection.innovation, connection.innovation)
+
+        # views may belong to other stores than the population's (e.g. batch reproduction children)
+        for store in stores.values():
+            store.remap_innovations(mapping)
+
+        # registry is replaced in place (organisms reference it)
+        innovations = list(self.innovations.innovations.items())[:self.base] + additions
+        self.innovations.innovations = dict(innovations)
+        self.base = len(self.innovations)
+
+    # encode the best organisms of the current generation (evaluated by top if it hasn't been yet)
+    def emigrants(self, n: int) -> list[EncodedOrganism]:
+        return [encode_organism(organism) for organism in self.population.top(n)]
+
+    # replace the worst organisms by migrants from other islands
+    def immigrate(self, encoded: list[EncodedOrganism]):
+        self.population.immigrate([decode_organism(organism, self.population.config, self.innovations) for organism in encoded])
+
+    # encoded best organism of the current generation
+    def best(self) -> EncodedOrganism:
+        return self.emigrants(1)[0]
+
+# worker process loop (executes island methods sent by the runner)
+def island_worker(connection: Connection, config: PopulationConfig, fitness_function: Callable[[Organism], float], seed: Optional[int], compact: bool):
+    island = Island(config, fitness_function, seed=seed, compact=compact)
+    while True:
+        (method, args) = connection.recv()
+        if method == 'stop':
+            break
+        connection.send(getattr(island, method)(*args))
+    connection.close()
+
+# island model evolution: one population per island (optionally in its own process), best organisms migrate every few generations
+# innovation numbers are reconciled at every migration, so the same connection has the same number on every island
+class IslandRunner:
+    def __init__(self, configs: list[PopulationConfig], fitness_function: Callable[[Organism], float], migration_interval: int = 5, migrants: int = 2, topology: MigrationTopology = MigrationTopology.RING, seed: Optional[int] = None, processes: bool = True, compact: bool = False) -> None:
+        # migrants must fit every island's networks
+        shapes = {(config.get('organism').get('inputs'), config.get('organism').get('outputs')) for config in configs}
+        if len(shapes) > 1:
+            raise ValueError("Islands must have the same number of inputs and outputs to exchange organisms")
+
+        self.configs = configs
+        self.migration_interval = migration_interval # generations between migrations
+        self.migrants = migrants # best organisms each island sends to each of its neighbours
+        self.topology = topology
+        self.processes = processes # false -> islands run one after another in this process
+        self.generation = 0
+
+        # global innovation registry (reconciled from every island's new innovations)
+        self.innovations = InnovationRegistry()
+
+        # per-island generation records
+        self.metrics: list[list[GenerationRecord]] = [[] for _ in configs]
+        self.migrations = 0
+
+        seeds = [seed + index if seed is not None else None for index in range(len(configs))]
+        self.islands: list[Island] = []
+        self.workers: list[multiprocessing.Process] = []
+        self.connections: list[Connection] = []
+        if processes:
+            for (config, island_seed) in zip(configs, seeds):
+                (connection, worker_connection) = multiprocessing.Pipe()
+                worker = multiprocessing.Process(target=island_worker, args=(worker_connection, config, fitness_function, island_seed, compact), daemon=True)
+                worker.start()
+                self.workers.append(worker)
+                self.connections.append(connection)
+        else:
+            self.islands = [Island(config, fitness_function, seed=island_seed, compact=compact) for (config, island_seed) in zip(configs, seeds)]
+
+    # call a method on every island (in parallel for worker processes), results are in island order
+    def call(self, method: str, args: list[tuple]) -> list[Any]:
+        if not self.processes:
+            return [getattr(island, method)(*island_args) for (island, island_args) in zip(self.islands, args)]
+        for (connection, island_args) in zip(self.connections, args):
+            connection.send((method, island_args))
+        return [connection.recv() for connection in self.connections]
+
+    # evolve every island for some generations (migrating every migration_interval generations)
+    def run(self, generations: int):
+        while generations > 0:
+            epoch = min(generations, self.migration_interval - self.generation % self.migration_interval)
+            results = self.call('evolve', [(epoch,)] * len(self.configs))
+            self.generation += epoch
+            generations -= epoch
+
+            for (island_metrics, (_, records)) in zip(self.metrics, results):
+                island_metrics.extend(records)
+            self.synchronize([additions for (additions, _) in results])
+
+            if self.generation % self.migration_interval == 0:
+                self.migrate()
+
+    # assign global numbers to every island's new innovations (islands are processed in order, so numbering is deterministic)
+    def synchronize(self, island_additions: list[InnovationAdditions]):
+        base = len(self.innovations)
+        mappings: list[dict[int, int]] = []
+        for additions in island_additions:
+            mappings.append({local: self.innovations.get(start, end) for ((start, end), local) in additions})
+        additions = list(self.innovations.innovations.items())[base:]
+        self.call('synchronize', [(mapping, additions) for mapping in mappings])
+
+    # send every island's best organisms to its neighbours
+    def migrate(self):
+        emigrants = self.call('emigrants', [(self.migrants,)] * len(self.configs))
+        immigrants: list[list[EncodedOrganism]] = [[] for _ in self.configs]
+        for (index, organisms) in enumerate(emigrants):
+            for neighbour in self.neighbours(index):
+                immigrants[neighbour] += organisms
+        self.call('immigrate', [(organisms,) for organisms in immigrants])
+        self.migrations += 1
+
+    # islands receiving an island's migrants
+    def neighbours(self, index: int) -> list[int]:
+        if len(self.configs) < 2:
+            return []
+        if self.topology == MigrationTopology.RING:
+            return [(index + 1) % len(self.configs)]
+        return [neighbour for neighbour in range(len(self.configs)) if neighbour != index]
+
+    # best organism over all islands (decoded against the global registry)
+    def best(self) -> Organism:
+        encoded = max(self.call('best', [()] * len(self.configs)), key=lambda organism: organism[4])
+        return decode_organism(encoded, self.configs[0], self.innovations)
+
+    # stop worker processes
+    def close(self):
+        for (connection, worker) in zip(self.connections, self.workers):
+            connection.send(('stop', ()))
+            worker.join()
+        self.connections = []
+        self.workers = []
+
+    def __enter__(self) -> 'IslandRunner':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,107 @@
+from typing import Optional, TypedDict
+from contextlib import nullcontext
+import json
+import time
+
+# structured per-generation record
+GenerationRecord = TypedDict('GenerationRecord', {
+    "generation": int,
+    "time": float, # wall time of the whole generation (seconds)
+    "phases": dict[str, float], # wall time per evolution phase (seconds)
+    "counts": dict[str, int], # fitness calls, distance computations, innovations, compiled networks...
+    "species": int,
+    "organisms": int,
+    "genome_size": dict[str, float], # min, mean and max number of connection genes
+    "fitness": dict[str, float] # best and mean fitness of the evaluated generation
+})
+
+# times a single phase and adds the elapsed time to the generation's phase total
+class PhaseTimer:
+    def __init__(self, phases: dict[str, float], name: str) -> None:
+        self.phases = phases
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *_):
+        self.phases[self.name] = self.phases.get(self.name, 0.0) + time.perf_counter() - self.start
+
+# shared no-op phase used when metrics are disabled
+disabled_phase = nullcontext()
+
+# generation instrumentation (phase timings, counters and population statistics), optionally streamed to a jsonl file
+class Metrics:
+    def __init__(self, enabled: bool = True, path: Optional[str] = None, window: Optional[int] = None) -> None:
+        self.enabled = enabled
+        self.path = path # jsonl file every finished record is appended to (none -> keep in memory only)
+
+        # most recent records kept in memory (none -> every record, or only the last one if records are streamed to a file)
+        self.window = window if window is not None else (1 if path is not None else None)
+        self.records: list[GenerationRecord] = []
+
+        # current generation
+        self.phases: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+        self.statistics: dict = {}
+        self.generation_start = 0.0
+
+    # start recording a new generation
+    def start(self):
+        if not self.enabled:
+            return
+        self.phases = {}
+        self.counts = {}
+        self.statistics = {"species": 0, "organisms": 0, "genome_size": {}, "fitness": {}}
+        self.generation_start = time.perf_counter()
+
+    # context manager timing a phase of the generation
+    def phase(self, name: str):
+        return PhaseTimer(self.phases, name) if self.enabled else disabled_phase
+
+    # add to a counter of the current generation
+    def count(self, name: str, n: int = 1):
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    # record population statistics of the evaluated generation
+    def observe(self, n_species: int, genome_sizes: list[int], fitnesses: list[float]):
+        if not self.enabled or len(genome_sizes) == 0:
+            return
+        self.statistics = {
+            "species": n_species,
+            "organisms": len(genome_sizes),
+            "genome_size": {"min": min(genome_sizes), "mean": sum(genome_sizes) / len(genome_sizes), "max": max(genome_sizes)},
+            "fitness": {"best": max(fitnesses), "mean": sum(fitnesses) / len(fitnesses)}
+        }
+
+    # finish the current generation's record (and stream it)
+    def finish(self, generation: int) -> Optional[GenerationRecord]:
+        if not self.enabled:
+            return None
+
+        record: GenerationRecord = {
+            "generation": generation,
+            "time": time.perf_counter() - self.generation_start,
+            "phases": self.phases,
+            "counts": self.counts,
+            **self.statistics # type: ignore
+        }
+        self.records.append(record)
+        if self.window is not None and len(self.records) > self.window:
+            del self.records[:-self.window]
+
+        # anything counted between generations doesn't modify the finished record
+        self.phases = {}
+        self.counts = {}
+
+        if self.path is not None:
+            with open(self.path, 'a') as stream:
+                stream.write(json.dumps(record) + "\n")
+
+        return record
+
+    # most recent generation record
+    def last(self) -> Optional[GenerationRecord]:
+        return self.records[-1] if len(self.records) > 0 else None
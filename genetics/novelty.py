@@ -0,0 +1,175 @@
+from typing import Optional, Sequence, Union
+from enum import Enum
+import numpy as np
+from genetics.reproduction import ranges
+
+# what an organism's fitness is in a novelty search
+class NoveltyMode(Enum):
+    NOVELTY = 1 # fitness function returns a behaviour vector, fitness is its novelty
+    HYBRID = 2 # fitness function returns (objective fitness, behaviour vector), fitness mixes both
+
+# which archived behaviours are removed once the archive is full
+class ArchiveEviction(Enum):
+    OLDEST = 1 # first archived
+    LEAST_NOVEL = 2 # lowest novelty when archived
+
+# result of a fitness function in a novelty search
+Behaviour = Sequence[float]
+NoveltyResult = Union[Behaviour, tuple[float, Behaviour]]
+
+# share of all query and point pairs above which a query measures every point instead of the candidate leaves' points
+dense_fraction = 0.25
+dense_chunk_size = 1 << 22 # differences measured at once
+
+# k-d tree over behaviour points: points are split at the median of their widest dimension into leaves of at most leaf_size points
+# a batch of queries is answered with a few numpy calls: every query only measures the points of leaves whose bounding box can hold one of its k nearest neighbours
+class BehaviourIndex:
+    def __init__(self, points: np.ndarray, leaf_size: int = 32) -> None:
+        self.points = np.asarray(points, dtype=np.float64) # [points, dimensions]
+        order = np.arange(len(self.points))
+        starts: list[int] = []
+        counts: list[int] = []
+
+        # split ranges of order until they're small enough (points of a leaf are contiguous in order)
+        pending = [(0, len(order))] if len(order) > 0 else []
+        while len(pending) > 0:
+            (start, end) = pending.pop()
+            if end - start <= leaf_size:
+                starts.append(start)
+                counts.append(end - start)
+                continue
+            leaf = self.points[order[start:end]]
+            dimension = int(np.argmax(leaf.max(axis=0) - leaf.min(axis=0)))
+            middle = (end - start) // 2
+            order[start:end] = order[start:end][np.argpartition(leaf[:, dimension], middle)]
+            pending += [(start, start + middle), (start + middle, end)]
+
+        # leaf points and bounding boxes
+        self.order = order
+        self.sorted_points = self.points[order]
+        leaves = np.argsort(starts)
+        self.leaf_starts = np.array(starts, dtype=np.int64)[leaves]
+        self.leaf_counts = np.array(counts, dtype=np.int64)[leaves]
+        self.mins = np.minimum.reduceat(self.sorted_points, self.leaf_starts, axis=0) if len(starts) > 0 else np.zeros((0, self.points.shape[1]))
+        self.maxs = np.maximum.reduceat(self.sorted_points, self.leaf_starts, axis=0) if len(starts) > 0 else np.zeros((0, self.points.shape[1]))
+
+    # distances (ascending) and point indices of the k nearest points of every query ([queries, dimensions] -> [queries, k], k is capped at the number of points)
+    def query(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        queries = np.asarray(queries, dtype=np.float64)
+        k = min(k, len(self.points))
+        if k == 0 or len(queries) == 0:
+            return (np.zeros((len(queries), k)), np.zeros((len(queries), k), dtype=np.int64))
+
+        # nearest possible distance between every query and every leaf box
+        gaps = np.maximum(self.mins[None] - queries[:, None], 0) + np.maximum(queries[:, None] - self.maxs[None], 0)
+        lower = np.sqrt(np.square(gaps).sum(axis=2))
+
+        # the k-th neighbour among the nearest leaves holding k points bounds the k-th neighbour distance
+        by_lower = np.argsort(lower, axis=1)
+        nearest_leaves = np.cumsum(self.leaf_counts[by_lower], axis=1) - self.leaf_counts[by_lower] < k
+        candidates = np.zeros(lower.shape, dtype=np.bool_)
+        np.put_along_axis(candidates, by_lower, nearest_leaves, axis=1)
+        (bounds, _) = self.nearest(queries, candidates, k)
+
+        # only leaves closer than the bound may hold a neighbour
+        candidates = lower <= bounds[:, -1:]
+        if (candidates @ self.leaf_counts).sum() > dense_fraction * len(queries) * len(self.points):
+            return self.nearest_dense(queries, k)
+        return self.nearest(queries, candidates, k)
+
+    # distances and point indices of the k nearest points of every query measured against every point
+    # (used if leaves don't separate the points, e.g. uniformly spread behaviours with many dimensions)
+    def nearest_dense(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        # queries are measured in chunks of bounded size (differences are exact, unlike the expanded square)
+        chunk = max(1, dense_chunk_size // max(1, self.points.size))
+        distances = np.concatenate([np.sqrt(np.square(queries[start:start + chunk, None] - self.points[None]).sum(axis=2)) for start in range(0, len(queries), chunk)])
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k] if distances.shape[1] > k else np.argsort(distances, axis=1)[:, :k]
+        nearest = np.take_along_axis(nearest, np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1), axis=1)
+        return (np.take_along_axis(distances, nearest, axis=1), nearest)
+
+    # distances and point indices of the k nearest points of every query among the points of its candidate leaves ([queries, leaves] mask, at least k points per query)
+    def nearest(self, queries: np.ndarray, candidates: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        (candidate_queries, candidate_leaves) = np.nonzero(candidates)
+        points = ranges(self.leaf_starts[candidate_leaves], self.leaf_counts[candidate_leaves])
+        point_queries = np.repeat(candidate_queries, self.leaf_counts[candidate_leaves])
+        distances = np.sqrt(np.square(self.sorted_points[points] - queries[point_queries]).sum(axis=1))
+
+        # a row of candidate distances per query (candidates of a query are contiguous)
+        candidate_counts = np.bincount(point_queries, minlength=len(queries))
+        columns = np.arange(len(point_queries)) - np.repeat(np.cumsum(candidate_counts) - candidate_counts, candidate_counts)
+        rows = np.full((len(queries), int(candidate_counts.max())), np.inf)
+        rows[point_queries, columns] = distances
+        row_points = np.zeros(rows.shape, dtype=np.int64)
+        row_points[point_queries, columns] = points
+
+        nearest = np.argpartition(rows, k - 1, axis=1)[:, :k] if rows.shape[1] > k else np.argsort(rows, axis=1)[:, :k]
+        nearest = np.take_along_axis(nearest, np.argsort(np.take_along_axis(rows, nearest, axis=1), axis=1), axis=1)
+        return (np.take_along_axis(rows, nearest, axis=1), self.order[np.take_along_axis(row_points, nearest, axis=1)])
+
+    # number of indexed points
+    def __len__(self) -> int:
+        return len(self.points)
+
+# novelty search: an organism's novelty is the mean distance of its behaviour to the k nearest behaviours of the evaluated population and the archive
+# the most novel behaviours of every generation are archived (up to archive_size, then behaviours are evicted)
+class NoveltySearch:
+    def __init__(self, mode: NoveltyMode = NoveltyMode.NOVELTY, k: int = 15, archive_size: int = 1000, archive_additions: int = 5, eviction: ArchiveEviction = ArchiveEviction.OLDEST, novelty_weight: float = 0.5, leaf_size: int = 32) -> None:
+        self.mode = mode
+        self.k = k
+        self.archive_size = archive_size
+        self.archive_additions = archive_additions # most novel behaviours archived per generation
+        self.eviction = eviction
+        self.novelty_weight = novelty_weight # hybrid fitness: (1 - novelty weight) * objective fitness + novelty weight * novelty
+        self.leaf_size = leaf_size
+
+        # archived behaviours (in archive order) and their novelty when archived
+        self.archive: Optional[np.ndarray] = None
+        self.archive_novelty = np.zeros(0)
+
+        # behaviours and novelty of the last scored batch (archived by update_archive)
+        self.behaviours: Optional[np.ndarray] = None
+        self.novelty = np.zeros(0)
+
+    # fitness of every organism from the fitness function's results
+    # record -> the batch's behaviours are kept for update_archive (not recorded e.g. for a single organism scored outside of a generation)
+    def score(self, results: list[NoveltyResult], record: bool = True) -> list[float]:
+        if len(results) == 0:
+            return []
+        if self.mode == NoveltyMode.HYBRID:
+            objectives = np.array([objective for (objective, _) in results], dtype=np.float64) # type: ignore
+            behaviours = np.array([behaviour for (_, behaviour) in results], dtype=np.float64) # type: ignore
+        else:
+            behaviours = np.array(results, dtype=np.float64)
+        behaviours = behaviours.reshape(len(results), -1)
+
+        # population behaviours are indexed as well, so every organism finds itself first (skipped)
+        points = np.concatenate([behaviours, self.archive]) if self.archive is not None else behaviours
+        (distances, _) = BehaviourIndex(points, self.leaf_size).query(behaviours, self.k + 1)
+        novelty = distances[:, 1:].mean(axis=1) if distances.shape[1] > 1 else np.zeros(len(behaviours))
+        if record:
+            (self.behaviours, self.novelty) = (behaviours, novelty)
+
+        # no behaviour differs from the others (e.g. an initial population) -> all organisms are equally novel
+        fitness = novelty if novelty.any() else np.ones(len(novelty))
+        if self.mode == NoveltyMode.HYBRID:
+            fitness = (1 - self.novelty_weight) * objectives + self.novelty_weight * fitness
+        return fitness.tolist()
+
+    # archive the most novel behaviours of the last scored batch (behaviours with no novelty aren't archived), evict behaviours beyond the archive size
+    def update_archive(self):
+        if self.behaviours is None or len(self.behaviours) == 0:
+            return
+        most_novel = np.argsort(-self.novelty, kind='stable')[:self.archive_additions]
+        most_novel = most_novel[self.novelty[most_novel] > 0]
+        self.archive = np.concatenate([self.archive, self.behaviours[most_novel]]) if self.archive is not None else self.behaviours[most_novel]
+        self.archive_novelty = np.concatenate([self.archive_novelty, self.novelty[most_novel]])
+        self.behaviours = None
+
+        excess = len(self.archive) - self.archive_size
+        if excess > 0:
+            keep = np.arange(excess, len(self.archive)) if self.eviction == ArchiveEviction.OLDEST else np.sort(np.argsort(self.archive_novelty, kind='stable')[excess:])
+            (self.archive, self.archive_novelty) = (self.archive[keep], self.archive_novelty[keep])
+
+    # number of archived behaviours
+    def __len__(self) -> int:
+        return len(self.archive) if self.archive is not None else 0
@@ -1,67 +1,266 @@
-from typing import Optional, Callable
+from typing import Optional, Callable, TYPE_CHECKING
+from enum import IntEnum
+from itertools import count
+import copy
 import random
 from uuid import UUID, uuid4
 from config.configuration import PopulationConfig
-from genetics.genes import ConnectionGene, NodeGene, NodeType
+from genetics.genes import ConnectionGene, NodeGene, NodeType, EncodedNode, EncodedConnection, SHARED_GENE
+from genetics.innovations import InnovationRegistry
 from nn.network import FeedForwardNetwork
-from utils import chance
+from utils import chance, default_random
+
+if TYPE_CHECKING:
+    from genetics.store import GenomeStore
+
+# mutation applied to an offspring (pre-drawn mutations have the same meaning as the random choice in Organism.mutate)
+class Mutation(IntEnum):
+    NONE = 0
+    ADD_CONNECTION = 1
+    REMOVE_CONNECTION = 2
+    ADD_NODE = 3
+    REMOVE_NODE = 4
+    ACTIVATION = 5
+    WEIGHT = 6
+
+# gene owner tokens of organisms (SHARED_GENE is never handed out)
+tokens = count(SHARED_GENE + 1)
 
 # Organism class (essentially genome)
 class Organism:
-    def __init__(self, species_id: UUID, config: PopulationConfig, genome: Optional[list[ConnectionGene]] = None, nodes: Optional[list[NodeGene]] = None) -> None:
-        self.population_name = config.get('name')
+    __slots__ = ('innovations', 'species_id', 'id', 'token', 'config', 'n_inputs', 'n_outputs', 'structural_mutation_chance', 'structural_connection_mutation_chance', 'structural_connection_addition_chance', 'structural_node_addition_chance', 'activation_function_mutation_chance', '_genome', '_nodes', 'store', 'index', 'fitness', 'adjusted_fitness', 'version', 'topology_version', 'network', 'network_version', 'network_topology_version')
+
+    def __init__(self, species_id: UUID, config: PopulationConfig, innovations: Optional[InnovationRegistry], genome: Optional[list[ConnectionGene]] = None, nodes: Optional[list[NodeGene]] = None, id: Optional[UUID] = None, rng: random.Random = default_random) -> None:
+        self.innovations = innovations # population's innovation registry (used for new connections)
         self.species_id = species_id
-        self.id = uuid4()
+        self.id = id if id is not None else uuid4() # populations assign ids from a counter
+        self.token = next(tokens) # genes owned by this token are only referenced by this organism, other genes are copied before they're changed
         self.config = config.get('organism')
 
-        # list of genes 
-        self.genome: list[ConnectionGene] = []
-        self.nodes: list[NodeGene] = []
+        # config values used in hot paths are read once
+        self.n_inputs = self.config.get('inputs')
+        self.n_outputs = self.config.get('outputs')
+        self.structural_mutation_chance = self.config.get('structural_mutation_chance')
+        self.structural_connection_mutation_chance = self.config.get('structural_connection_mutation_chance')
+        self.structural_connection_addition_chance = self.config.get('structural_connection_addition_chance')
+        self.structural_node_addition_chance = self.config.get('structural_node_addition_chance')
+        self.activation_function_mutation_chance = self.config.get('activation_function_mutation_chance')
+
+        # list of genes (none -> organism is a view of a genome store, genes are materialized on first access)
+        self._genome: Optional[list[ConnectionGene]] = []
+        self._nodes: Optional[list[NodeGene]] = []
+        self.store: Optional['GenomeStore'] = None
+        self.index = 0 # position in genome store
+
+        # genome versions (bumped by every mutation, topology version only by structural and activation changes)
+        self.version = 0
+        self.topology_version = 0
+
+        # cached phenotype and the genome versions it was built from
+        self.network: Optional[FeedForwardNetwork] = None
+        self.network_version = 0
+        self.network_topology_version = 0
 
         # organisms fitness and adjusted (relative) fitness
         self.fitness = 0.0
         self.adjusted_fitness = 0.0
 
-        # given genome and nodes -> just use those
-        if genome and nodes:
-            self.genome = genome
-            self.nodes = nodes
+        # given genome and nodes -> use those genes (e.g. crossover parents' genes, shared until either organism changes them)
+        if genome is not None and nodes is not None:
+            self.genome = list(genome)
+            self.nodes = list(nodes)
+            self.share_genes()
+            self.resolve_end_points()
         # not given -> create basic organism with standard inputs and outputs (no connections)
         else:
             # create default genome with n_inputs and n_outputs
-            for _ in range(self.config.get('inputs')):
-                node = NodeGene(len(self.nodes), type=NodeType.INPUT)
+            for _ in range(self.n_inputs):
+                node = NodeGene(len(self.nodes), type=NodeType.INPUT, owner=self.token)
                 self.nodes.append(node)
 
-            for _ in range(self.config.get('outputs')):
-                node = NodeGene(len(self.nodes), type=NodeType.OUTPUT)
+            for _ in range(self.n_outputs):
+                node = NodeGene(len(self.nodes), type=NodeType.OUTPUT, rng=rng, owner=self.token)
                 self.nodes.append(node)
 
-    # randomly mutate the organism's structure or connection weights
-    def mutate(self):
-        if chance(self.config.get('structural_mutation_chance')):
+    # connection genes
+    @property
+    def genome(self) -> list[ConnectionGene]:
+        if self._genome is None:
+            self.materialize()
+        assert self._genome is not None
+        return self._genome
+
+    @genome.setter
+    def genome(self, genome: list[ConnectionGene]):
+        if self._genome is None:
+            self.materialize()
+        self._genome = genome
+        self.changed(topology=True)
+
+    # node genes
+    @property
+    def nodes(self) -> list[NodeGene]:
+        if self._nodes is None:
+            self.materialize()
+        assert self._nodes is not None
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, nodes: list[NodeGene]):
+        if self._nodes is None:
+            self.materialize()
+        self._nodes = nodes
+        self.changed(topology=True)
+
+    # bump the genome version (topology -> cached phenotype is recompiled, otherwise only its weights are updated)
+    def changed(self, topology: bool = False):
+        self.version += 1
+        if topology:
+            self.topology_version += 1
+
+    # point connections at the listed node gene of their end points' ids (parents' connections may end at the other parent's version of a node),
+    # end points missing from the node list are resolved to the first gene of their id, connections are only copied if an end point changes
+    def resolve_end_points(self):
+        resolved = {node.id: node for node in self.nodes}
+        for (index, connection) in enumerate(self.genome):
+            start = resolved.setdefault(connection.start.id, connection.start)
+            end = resolved.setdefault(connection.end.id, connection.end)
+            if start is not connection.start or end is not connection.end:
+                connection = self.own_connection(index)
+                (connection.start, connection.end) = (start, end)
+
+    # mark genes (and connection end points) as referenced by several organisms, any organism copies them before changing them
+    def share_genes(self):
+        for connection in self.genome:
+            connection.owner = connection.start.owner = connection.end.owner = SHARED_GENE
+        for node in self.nodes:
+            node.owner = SHARED_GENE
+
+    # connection gene at a genome position that can be changed in place (a shared gene is replaced by a private copy)
+    def own_connection(self, position: int) -> ConnectionGene:
+        connection = self.genome[position]
+        if connection.owner != self.token:
+            connection = connection.copy(self.token)
+            self.genome[position] = connection
+        return connection
+
+    # node gene at a node list position that can be changed in place (a shared gene is replaced by a private copy,
+    # connections ending at the shared gene are re-pointed to the copy so orphan end points of offspring stay in sync)
+    def own_node(self, position: int) -> NodeGene:
+        node = self.nodes[position]
+        if node.owner != self.token:
+            shared = node
+            node = shared.copy(self.token)
+            self.nodes[position] = node
+            for (index, connection) in enumerate(self.genome):
+                if connection.start is shared or connection.end is shared:
+                    connection = self.own_connection(index)
+                    if connection.start is shared:
+                        connection.start = node
+                    if connection.end is shared:
+                        connection.end = node
+        return node
+
+    # offspring with the same genome (genes are shared until either organism changes them, views stay views of the same record)
+    def clone(self, id: Optional[UUID] = None) -> 'Organism':
+        clone = copy.copy(self)
+        clone.id = id if id is not None else uuid4()
+        clone.token = next(tokens)
+        clone.fitness = 0.0
+        clone.adjusted_fitness = 0.0
+        clone.network = None # cached networks are patched in place, so they aren't shared
+        if not self.is_view():
+            clone._genome = list(self.genome)
+            clone._nodes = list(self.nodes)
+            self.share_genes()
+        return clone
+
+    # make organism a light view of its records in a genome store (drops gene objects)
+    def attach(self, store: 'GenomeStore', index: int):
+        self.store = store
+        self.index = index
+        self._genome = None
+        self._nodes = None
+
+    # build gene objects from the genome store (organism is independent of the store afterwards)
+    def materialize(self):
+        assert self.store is not None, "Organism has no genes or genome store"
+        (self._nodes, self._genome) = self.store.genes(self.index, self.innovations, owner=self.token)
+        self.store = None
+
+    # check if organism is a view of a genome store
+    def is_view(self) -> bool:
+        return self._genome is None
+
+    # plain (nodes, orphan nodes, connections) records of the genome (read straight from the store for views)
+    def records(self) -> tuple[list[EncodedNode], list[EncodedNode], list[EncodedConnection]]:
+        if self.store is not None and self._genome is None:
+            return self.store.records(self.index)
+
+        # connection end points missing from the node list are kept separately
+        node_ids = {node.id for node in self.nodes}
+        orphans: dict[int, NodeGene] = {}
+        for connection in self.genome:
+            for node in (connection.start, connection.end):
+                if node.id not in node_ids:
+                    orphans.setdefault(node.id, node)
+
+        return ([node.record() for node in self.nodes], [node.record() for node in orphans.values()], [connection.record() for connection in self.genome])
+
+    # weights of enabled connections in genome order (read straight from the store for views)
+    def enabled_weights(self) -> list[float]:
+        if self.store is not None and self._genome is None:
+            return self.store.enabled_weights(self.index)
+        return [c.weight for c in self.genome if c.enabled]
+
+    # connection innovation numbers and weights in genome order (read straight from the store for views)
+    def innovations_and_weights(self) -> tuple[list[int], list[float]]:
+        if self.store is not None and self._genome is None:
+            return self.store.innovations_and_weights(self.index)
+        return ([c.innovation for c in self.genome], [c.weight for c in self.genome])
+
+    # number of connection genes (without materializing store views)
+    def genome_size(self) -> int:
+        if self.store is not None and self._genome is None:
+            return self.store.genome_size(self.index)
+        return len(self.genome)
+
+    # randomly mutate the organism's structure or connection weights (rng -> random stream to draw from)
+    def mutate(self, rng: random.Random = default_random):
+        if chance(self.structural_mutation_chance, rng):
             # add or remove connection
-            if chance(self.config.get('structural_connection_mutation_chance')):
-                self.structurally_mutate_connection()
+            if chance(self.structural_connection_mutation_chance, rng):
+                self.structurally_mutate_connection(rng=rng)
             else: # add or remove node
-                self.structurally_mutate_node()
+                self.structurally_mutate_node(rng=rng)
         
         # normal mutation (not structural)
         else:
             # if chance hits (and there are hidden nodes) -> update random nodes activation function
-            if chance(self.config.get('activation_function_mutation_chance')) and self.has_hidden_nodes(): 
-               self.mutate_node()
+            if chance(self.activation_function_mutation_chance, rng) and self.has_hidden_nodes(): 
+               self.mutate_node(rng)
             elif self.has_connections():
                 # chance doesn't hit -> mutate the weight of a random connection (if there are any connections)
-                self.mutate_connection()
+                self.mutate_connection(rng)
 
             # just skip if everything misses...
 
-    # add or remove connection based on config chance (add if no connections, skip if trying to add duplicate connection)
-    def structurally_mutate_connection(self):
+    # apply a pre-drawn mutation (same fallbacks as mutate: e.g. a connection is added if there are none to remove)
+    def apply_mutation(self, mutation: Mutation, rng: random.Random = default_random):
+        if mutation in (Mutation.ADD_CONNECTION, Mutation.REMOVE_CONNECTION):
+            self.structurally_mutate_connection(add=mutation == Mutation.ADD_CONNECTION, rng=rng)
+        elif mutation in (Mutation.ADD_NODE, Mutation.REMOVE_NODE):
+            self.structurally_mutate_node(add=mutation == Mutation.ADD_NODE, rng=rng)
+        elif mutation == Mutation.ACTIVATION and self.has_hidden_nodes():
+            self.mutate_node(rng)
+        elif mutation != Mutation.NONE and self.has_connections():
+            self.mutate_connection(rng)
+
+    # add or remove connection based on config chance or given choice (add if no connections, skip if trying to add duplicate connection)
+    def structurally_mutate_connection(self, add: Optional[bool] = None, rng: random.Random = default_random):
         # add random connection if chance hits
-        if chance(self.config.get('structural_connection_addition_chance')) or len(self.genome) == 0:
-            new_connection = ConnectionGene(population_name=self.population_name, nodes=self.nodes)
+        if (chance(self.structural_connection_addition_chance, rng) if add is None else add) or len(self.genome) == 0:
+            new_connection = ConnectionGene(innovations=self.innovations, nodes=self.nodes, rng=rng, owner=self.token)
             # check for existing connections
             for connection in self.genome:
                 # if connection already exists, just skip mutation...
@@ -71,37 +270,39 @@ class Organism:
             self.genome.append(new_connection)
         else:
             # remove random connection
-            random_connection = self.genome[random.randint(0, len(self.genome) - 1)]
+            random_connection = self.genome[rng.randint(0, len(self.genome) - 1)]
             self.genome.remove(random_connection)
+        self.changed(topology=True)
 
-    # add or remove a node based on config chance
-    def structurally_mutate_node(self):
+    # add or remove a node based on config chance or given choice
+    def structurally_mutate_node(self, add: Optional[bool] = None, rng: random.Random = default_random):
         # chance hits or no hidden nodes -> add node
-        if chance(self.config.get('structural_node_addition_chance')) or not self.has_hidden_nodes():
+        if (chance(self.structural_node_addition_chance, rng) if add is None else add) or not self.has_hidden_nodes():
             # create a new node
-            new_node = NodeGene(id=len(self.nodes))
+            new_node = NodeGene(id=len(self.nodes), rng=rng, owner=self.token)
             self.nodes.append(new_node)
 
             # if connections exist -> randomly choose connection and place node in-between
             if len(self.genome) > 0:
                 # select a random connection and disable it
-                random_connection = random.choice(self.genome)
+                random_connection = self.own_connection(rng.randrange(len(self.genome)))
                 random_connection.disable()
 
                 # connect the left side of the node back and assign decent weight
-                left_connection = ConnectionGene(population_name=self.population_name, start=random_connection.start, end=new_node, weight=1)
+                left_connection = ConnectionGene(innovations=self.innovations, start=random_connection.start, end=new_node, weight=1, owner=self.token)
 
                 # connect the right side of the node forward and use previous weight
-                right_connection = ConnectionGene(population_name=self.population_name, start=new_node, end=random_connection.end, weight=random_connection.weight)
+                right_connection = ConnectionGene(innovations=self.innovations, start=new_node, end=random_connection.end, weight=random_connection.weight, owner=self.token)
 
                 # add new connections to genome
                 self.genome.append(left_connection)
                 self.genome.append(right_connection)
+            self.changed(topology=True)
 
         # chance fails -> remove node (if there are hidden nodes)
         elif self.has_hidden_nodes():
             hidden_nodes = self.get_hidden_nodes()
-            (node, index) = hidden_nodes[random.randint(0, len(hidden_nodes) - 1)]
+            (node, index) = hidden_nodes[rng.randint(0, len(hidden_nodes) - 1)]
 
             # remove node from list of nodes
             self.nodes.pop(index)
@@ -110,28 +311,48 @@ class Organism:
             for connection in self.genome:
                 if connection.is_connected_to(node):
                     self.genome.remove(connection)
+            self.changed(topology=True)
         
     # randomize or nudge weight of random connection (if any exists)
-    def mutate_connection(self):
+    def mutate_connection(self, rng: random.Random = default_random):
         #? should have chance to enable connection too
         # check if at least 1 connection
         if len(self.genome) > 0:
-            random_connection = random.choice(self.genome)
-            random_connection.randomize_weight(factor=0.2)
+            random_connection = self.own_connection(rng.randrange(len(self.genome)))
+            random_connection.randomize_weight(factor=0.2, rng=rng)
             # random_connection.nudge_weight() # could revert to this if more beneficial...
+            self.changed()
 
     # mutate a node by re-rolling it's activation function (assuming there is at least 1 node)
-    def mutate_node(self):
+    def mutate_node(self, rng: random.Random = default_random):
         hidden_nodes = self.get_hidden_nodes()
-        (node, index) = hidden_nodes[random.randint(0, len(hidden_nodes) - 1)]
-        node.roll_activation()
-
-        self.nodes[index] = node
+        (_, index) = hidden_nodes[rng.randint(0, len(hidden_nodes) - 1)]
+        self.own_node(index).roll_activation(rng)
+        self.changed(topology=True)
 
-    # return feed forward neural network as phenotype
+    # return feed forward neural network as phenotype (pruned to the structure that can affect the outputs, see network.pruning)
+    # cached against the genome version, weight-only mutations patch the cached network instead of recompiling it
     def phenotype(self) -> FeedForwardNetwork:
-        return FeedForwardNetwork(n_inputs=self.config.get('inputs'), nodes=self.nodes, connections=self.genome)
+        if self.network is not None and self.network_topology_version == self.topology_version:
+            if self.network_version != self.version:
+                self.network.update_weights(self.enabled_weights())
+                self.network_version = self.version
+            return self.network
+
+        # store views build their network straight from packed arrays
+        if self.store is not None and self._genome is None:
+            self.network = self.store.phenotype(self.index, n_inputs=self.n_inputs)
+        else:
+            self.network = FeedForwardNetwork(n_inputs=self.n_inputs, nodes=self.nodes, connections=self.genome, prune=True)
+        self.network_version = self.version
+        self.network_topology_version = self.topology_version
+        return self.network
     
+    # hash of the genome's structure, activations and weights (identical genomes -> identical hash, orphan end points' activations change outputs too)
+    def genome_hash(self) -> int:
+        (nodes, orphans, connections) = self.records()
+        return hash((tuple(nodes), tuple(orphans), tuple(connections)))
+
     # return shared nodes and shared, disjoint, excess connections between organisms
     def gene_distribution(self, other_organism: 'Organism'):
         nodes = [] # collect larger organism's nodes
@@ -147,20 +368,22 @@ class Organism:
         # add nodes from larger organism
         nodes = higher_node_organism.nodes
 
-        mutable_smaller_organism_genome = smaller_organism.genome.copy()
+        # index smaller genome by innovation number (shared genes are found with a dict join instead of a search)
+        smaller_organism_index = smaller_organism.innovation_index()
+        matched = [False] * len(smaller_organism.genome)
 
         # find largest innovation number in genes
-        smaller_organism_innovations = [c.innovation for c in smaller_organism.genome]
-        largest_smaller_genome_innovation = max(smaller_organism_innovations) if len(smaller_organism_innovations) > 0 else 0
+        largest_smaller_genome_innovation = max(smaller_organism_index) if len(smaller_organism_index) > 0 else 0
 
         # find shared, excess, and disjoint genes
         for c1 in larger_organism.genome: 
             # check if both genomes contain same connection (shared)
-            c2 = next((c for c in mutable_smaller_organism_genome if c1 == c), None)
-            if isinstance(c2, ConnectionGene): 
-                shared_connections.append((c1, c2))
-                # remove connection from smaller genome (smaller search space & leftovers -> disjoint)
-                mutable_smaller_organism_genome.remove(c1) 
+            positions = smaller_organism_index.get(c1.innovation)
+            if positions:
+                # take first unmatched occurrence (leftovers -> disjoint)
+                position = positions.pop(0)
+                matched[position] = True
+                shared_connections.append((c1, smaller_organism.genome[position]))
             # check if excess gene
             elif c1.innovation > largest_smaller_genome_innovation:
                 excess_connections.append(c1)
@@ -169,10 +392,17 @@ class Organism:
                 disjoint_connections.append(c1)
 
         # disjoint connections are combination of leftover genes from smaller genome and disjoints from larger genome
-        disjoint_connections = disjoint_connections + mutable_smaller_organism_genome
+        disjoint_connections = disjoint_connections + [c for (c, is_matched) in zip(smaller_organism.genome, matched) if not is_matched]
 
         return (nodes, shared_connections, disjoint_connections, excess_connections)
     
+    # positions of connection genes by innovation number (innovation -> positions in genome order)
+    def innovation_index(self, innovations: Optional[list[int]] = None) -> dict[int, list[int]]:
+        index: dict[int, list[int]] = {}
+        for (position, innovation) in enumerate(innovations if innovations is not None else [c.innovation for c in self.genome]):
+            index.setdefault(innovation, []).append(position)
+        return index
+
     # get list of all hidden nodes
     def get_hidden_nodes(self):
         pairs: list[tuple[NodeGene, int]] = []
@@ -186,7 +416,7 @@ class Organism:
     
     # check if there are hidden nodes in genome
     def has_hidden_nodes(self):
-        return len(self.nodes) > (self.config.get('inputs') + self.config.get('outputs'))
+        return len(self.nodes) > (self.n_inputs + self.n_outputs)
     
     # check if there are connections in genome
     def has_connections(self):
@@ -1,20 +1,53 @@
-from typing import Callable
+from typing import Optional
 import random
-from tinydb import TinyDB
+from uuid import UUID
+import numpy as np
 from genetics.species import Species
-from genetics.organism import Organism
-from utils import random_exclude, chance
+from genetics.organism import Organism, Mutation
+from genetics.innovations import InnovationRegistry
+from genetics.evaluation import Evaluator, EvaluationBackend, FitnessCache, FitnessFunction
+from genetics.novelty import NoveltySearch
+from genetics.compatibility import compatibility_matrix
+from genetics.metrics import Metrics
+from genetics.store import GenomeStore
+from genetics.reproduction import draw_tournaments, draw_mutations, crossover_genomes
+from genetics.streams import RandomStreams, ChildStreams, INITIAL_STREAM, SPECIATION_STREAM, REPRODUCTION_STREAM
+from genetics.checkpoint import write_checkpoint, read_checkpoint, encode_innovations, decode_innovations, encode_species, decode_species, encode_novelty, decode_novelty
+from nn.network import FeedForwardNetwork
+from utils import random_exclude, chance, default_random
 from config.configuration import PopulationConfig
 
 # population controller for continued evolution of organisms through speciation and crossover
 class Population:
-    def __init__(self, config: 'PopulationConfig', fitness_function: Callable[[Organism], float]):
+    def __init__(self, config: 'PopulationConfig', fitness_function: FitnessFunction, innovations: Optional[InnovationRegistry] = None, evaluator: Optional[Evaluator] = None, fitness_cache: Optional[FitnessCache] = None, metrics: Optional[Metrics] = None, compact: bool = False, species: Optional[list[Species]] = None, batch_reproduction: bool = False, seed: Optional[int] = None, novelty: Optional[NoveltySearch] = None):
         self.config = config
         self.name = config.get('name')
         self.carrying_capacity = config.get('carrying_capacity')
-        self.db = TinyDB(f"{self.name}-db.json")
         self.species: list[Species] = []
         self.fitness_function = fitness_function
+        self.evaluator = evaluator if evaluator else Evaluator() # serial evaluation by default
+        self.fitness_cache = fitness_cache # skip evaluation of previously seen genomes (only for deterministic fitness functions)
+        self.novelty = novelty # novelty search -> fitness function returns behaviours, fitness is their novelty (see NoveltySearch)
+        assert novelty is None or self.evaluator.backend != EvaluationBackend.SHARED_MEMORY, "Shared memory evaluation only returns scalar fitness (no behaviours for novelty search)"
+        self.metrics = metrics if metrics else Metrics() # per-generation instrumentation (Metrics(enabled=False) to switch off)
+        self.generation = 0 # number of completed generations
+
+        # compact -> organisms between generations are light views of a struct-of-arrays genome store
+        self.compact = compact
+        self.store: Optional[GenomeStore] = None
+
+        # batch reproduction -> a generation's selection, crossover and mutation decisions are drawn as arrays and crossover runs on genome records
+        self.batch_reproduction = batch_reproduction
+
+        # seed -> every random decision is drawn from a stream keyed by its generation, species and organism (results don't depend on the global random state)
+        # no seed -> the global random module is used (reproducible with random.seed)
+        self.streams = RandomStreams(seed) if seed is not None else None
+
+        # species and organism ids are assigned from a counter
+        self.last_id = 0
+
+        # current generation's organisms have a fitness (offspring are evaluated by the next evolve or on demand by best and top)
+        self.evaluated = False
 
         self.total_fitness = 0 # calculated on init and every evolution
         self.total_adjusted_fitness = 0
@@ -24,78 +57,141 @@ class Population:
         self.compatibility_threshold_step = config.get('speciation').get('threshold_step')
         self.target_species = config.get('speciation').get('target_species')
 
-        # clear database (for need connections)
-        self.db.drop_tables()
+        # speciation metrics (number of genetic distance computations in the last speciation)
+        self.distance_evaluations = 0
+        self.distance_early_exits = 0
+
+        # innovation registry shared by all organisms (given -> resume from existing registry)
+        self.innovations = innovations if innovations is not None else InnovationRegistry(path=f"{self.name}-db.json")
+
+        # given species -> resume with existing organisms (e.g. from a checkpoint)
+        if species is not None:
+            self.species = species
+            return
 
         # create a new species, and add it to the population
         # evolve the population and redistribute the organisms into species
-        initial_species = Species(config=self.config)
+        initial_species = Species(config=self.config, innovations=self.innovations, id=self.new_id())
 
         # create initial population
-        for _ in range(self.config.get('carrying_capacity')):
-            initial_species.add(Organism(species_id=initial_species.id, config=self.config))
+        (_, organism_rngs) = self.children(self.config.get('carrying_capacity'), INITIAL_STREAM)
+        for rng in organism_rngs:
+            initial_species.add(Organism(species_id=initial_species.id, config=self.config, innovations=self.innovations, id=self.new_id(), rng=rng))
+        initial_species.representative = initial_species.get(0)
 
         self.species.append(initial_species)
 
+        if self.compact:
+            self.pack()
+
     # tournament selection -> crossover -> mutation -> speciation
     def evolve(self):
-
-        # compute population fitness for this generation 
-        self.compute_population_fitness()
+        self.metrics.start()
+        innovations_before = len(self.innovations)
+        compilations_before = FeedForwardNetwork.compilations
+        weight_updates_before = FeedForwardNetwork.weight_updates
+        cache_before = (self.fitness_cache.hits, self.fitness_cache.misses) if self.fitness_cache is not None else (0, 0)
+        failures_before = (self.evaluator.timeouts, self.evaluator.failures)
+
+        # compute population fitness for this generation (unless best or top already did)
+        with self.metrics.phase('fitness'):
+            if not self.evaluated:
+                self.compute_population_fitness()
+
+        # archive this generation's most novel behaviours
+        if self.novelty is not None:
+            with self.metrics.phase('novelty_archive'):
+                self.novelty.update_archive()
+            self.metrics.count('novelty_archive_size', len(self.novelty))
 
         # adjust compatibility threshold to normalize # of species to target
-        self.adjust_compatibility_threshold()
+        with self.metrics.phase('threshold'):
+            self.adjust_compatibility_threshold()
 
         # -------------------------------- speciation -------------------------------- #
-        population: list[Organism] = []
-    
-        # put all members of population in a single list and calculate fitness
-        for species in self.species:
-            for organism in species.organisms:
-                population.append(organism)
-
-        # todo: don't replace species entirely, maintain them...
-        updated_species: list[Species] = []
-
-        # while there are still organisms that haven't been assigned to a species...
-        while len(population) > 0:
-            # get random "representative" organism and remove it from the population
-            representative_organism_index = random.randint(0, len(population)) - 1
-            representative_organism = population.pop(representative_organism_index)
-            species = Species(config=self.config)
-            species.add(representative_organism)
-
-            # check genetic distance between representative and all remaining organisms in population
-            for organism in population:
-                genetic_distance = self.compatibility(representative_organism, organism)
+        with self.metrics.phase('speciation'):
+            self.speciate()
+        self.metrics.count('distance_evaluations', self.distance_evaluations)
+        self.metrics.count('distance_early_exits', self.distance_early_exits)
 
-                # if genetic distance between organisms is below threshold -> add to representative species
-                if genetic_distance < self.compatibility_threshold:
-                    species.add(organism)
-                    population.remove(organism)
-
-            # add representative species to list
-            updated_species.append(species)
-
-        self.species = updated_species
+        # statistics of the evaluated generation
+        if self.metrics.enabled:
+            organisms = [organism for species in self.species for organism in species.organisms]
+            self.metrics.observe(len(self.species), [o.genome_size() for o in organisms], [o.fitness for o in organisms])
 
         # ------------------------- intermediate calculations ------------------------ #
         # calculate this generations total adjusted fitness (used to determine # of offspring)
-        self.compute_population_adjusted_fitness_sum()
+        with self.metrics.phase('adjusted_fitness'):
+            self.compute_population_adjusted_fitness_sum()
             
         # ----------------- tournament and crossover for each species ---------------- #
+        if self.batch_reproduction:
+            self.reproduce_batch()
+        else:
+            self.reproduce()
+        self.evaluated = False
+
+        # bulk persist this generation's new innovations
+        with self.metrics.phase('persistence'):
+            self.innovations.persist()
+
+        # pack the next generation's genomes into a single store
+        if self.compact:
+            with self.metrics.phase('packing'):
+                self.pack()
+            self.metrics.count('store_bytes', self.store.nbytes if self.store is not None else 0)
+
+        self.metrics.count('innovations', len(self.innovations) - innovations_before)
+        self.metrics.count('networks_compiled', FeedForwardNetwork.compilations - compilations_before)
+        self.metrics.count('network_weight_updates', FeedForwardNetwork.weight_updates - weight_updates_before)
+        self.metrics.count('fitness_timeouts', self.evaluator.timeouts - failures_before[0])
+        self.metrics.count('fitness_failures', self.evaluator.failures - failures_before[1])
+        if self.fitness_cache is not None:
+            self.metrics.count('fitness_cache_hits', self.fitness_cache.hits - cache_before[0])
+            self.metrics.count('fitness_cache_misses', self.fitness_cache.misses - cache_before[1])
+
+        self.metrics.finish(self.generation)
+        self.generation += 1
+
+    # next organism or species id
+    def new_id(self) -> UUID:
+        self.last_id += 1
+        return UUID(int=self.last_id)
+
+    # random stream of a key (the global random module's generator if the population isn't seeded)
+    def stream(self, *key: int) -> random.Random:
+        return self.streams.stream(*key) if self.streams is not None else default_random
+
+    # stream of a key and of its first n children (all the global random module's generator if the population isn't seeded)
+    def children(self, n: int, *key: int) -> tuple[random.Random, 'ChildStreams | list[random.Random]']:
+        if self.streams is None:
+            return (default_random, [default_random] * n)
+        children = self.streams.children(n, *key)
+        return (children.stream, children)
+
+    # numpy generator of a key (seeded from the global random module if the population isn't seeded)
+    def generator(self, *key: int) -> np.random.Generator:
+        return self.streams.generator(*key) if self.streams is not None else np.random.default_rng(random.getrandbits(64))
+
+    # tournament selection, crossover and mutation of every species' offspring (one organism at a time)
+    # species draw tournaments from their own stream, every offspring draws crossover and mutation from its own stream
+    def reproduce(self):
+        mutation_chance = self.config.get('organism').get('mutation_chance')
         for (index, species) in enumerate(self.species):
             allowed_offspring = species.allowed_offspring(pop_total_adjusted_fitness=self.total_adjusted_fitness, population_size=self.config.get('carrying_capacity'))
+            (species_rng, offspring_rngs) = self.children(allowed_offspring, REPRODUCTION_STREAM, self.generation, index)
 
             new_organisms: list[Organism] = []
 
-            # if only 1 organism in species, copy it n times with possible mutation
+            # if only 1 organism in species, clone it n times with possible mutation (clones share genes until they mutate)
             if len(species) < 2:
-                for _ in range(allowed_offspring):
-                    new_organism = species.get(0)
+                for offspring_index in range(allowed_offspring):
+                    new_organism = species.get(0).clone(id=self.new_id())
+                    rng = offspring_rngs[offspring_index]
 
-                    if chance(self.config.get('organism').get('mutation_chance')):
-                        new_organism.mutate()
+                    if chance(mutation_chance, rng):
+                        with self.metrics.phase('mutation'):
+                            new_organism.mutate(rng)
 
                     new_organisms.append(new_organism)
                 species.organisms = new_organisms
@@ -104,62 +200,254 @@ class Population:
 
             # tournament selection for crossover candidates
             candidates: list[Organism] = []
-            for _ in range(2 * allowed_offspring):
-                p1_index = random.randint(0, len(species) - 1)
-                participant1 = species.get(p1_index)
-                p2_index = random_exclude(0, len(species) - 1, p1_index)
-                participant2 = species.get(p2_index)
-
-                # whoever has better fitness is added to candidate pool, loser is removed from species
-                if(participant1.fitness > participant2.fitness):
-                    candidates.append(participant1)
-                else:
-                    candidates.append(participant2)
+            with self.metrics.phase('selection'):
+                for _ in range(2 * allowed_offspring):
+                    p1_index = species_rng.randint(0, len(species) - 1)
+                    participant1 = species.get(p1_index)
+                    p2_index = random_exclude(0, len(species) - 1, p1_index, rng=species_rng)
+                    participant2 = species.get(p2_index)
+
+                    # whoever has better fitness is added to candidate pool, loser is removed from species
+                    if(participant1.fitness > participant2.fitness):
+                        candidates.append(participant1)
+                    else:
+                        candidates.append(participant2)
 
             candidate_middle_index = int(len(candidates) / 2)
 
-            # crossover for all pairs of candidates
-            for (parent1, parent2) in zip(candidates[:candidate_middle_index], candidates[candidate_middle_index:]):
-                organism = species.crossover(parent1, parent2)
-                organism.fitness = self.fitness(organism) # in-efficient - calculating fitness on birth...
+            # crossover for all pairs of candidates (mutation is timed separately)
+            for (offspring_index, (parent1, parent2)) in enumerate(zip(candidates[:candidate_middle_index], candidates[candidate_middle_index:])):
+                rng = offspring_rngs[offspring_index]
+                with self.metrics.phase('crossover'):
+                    organism = species.crossover(parent1, parent2, mutate=False, rng=rng, id=self.new_id())
+
+                if chance(mutation_chance, rng):
+                    with self.metrics.phase('mutation'):
+                        organism.mutate(rng)
+
                 new_organisms.append(organism)
 
             # todo: should check if there are no organisms
             species.organisms = new_organisms
             self.species[index] = species
 
+    # tournament selection, crossover and mutation of the whole generation from decisions drawn as arrays at once
+    # children are views of a store built by crossing over parent records, only mutated children get gene objects
+    def reproduce_batch(self):
+        mutation_chance = self.config.get('organism').get('mutation_chance')
+        rng = self.generator(REPRODUCTION_STREAM, self.generation)
+        offspring = np.array([species.allowed_offspring(pop_total_adjusted_fitness=self.total_adjusted_fitness, population_size=self.config.get('carrying_capacity')) for species in self.species], dtype=np.int64)
+        sizes = np.array([len(species) for species in self.species], dtype=np.int64)
+        mutations = draw_mutations(rng, int(offspring.sum()), mutation_chance, self.config.get('organism'))
+        no_mutation = int(Mutation.NONE)
+
+        # parents are read from a store (the population's store if every organism is a view of it)
+        with self.metrics.phase('selection'):
+            organisms = [organism for species in self.species for organism in species.organisms]
+            if self.store is not None and all(organism.is_view() and organism.store is self.store for organism in organisms):
+                store = self.store
+                indices = np.array([organism.index for organism in organisms], dtype=np.int64)
+            else:
+                store = GenomeStore.from_organisms(organisms)
+                indices = np.arange(len(organisms), dtype=np.int64)
+
+            # species with a single organism clone it instead
+            crossed = sizes >= 2
+            fitnesses = np.array([organism.fitness for organism in organisms], dtype=np.float64)
+            offsets = np.cumsum(sizes) - sizes
+            (parents1, parents2) = draw_tournaments(rng, fitnesses, offsets[crossed], sizes[crossed], offspring[crossed])
+
+        with self.metrics.phase('crossover'):
+            children = crossover_genomes(store, indices[parents1], indices[parents2], rng)
+
+        with self.metrics.phase('mutation'):
+            pending_mutations = iter(mutations.tolist())
+            child_index = 0
+            for (index, (species, species_offspring, is_crossed)) in enumerate(zip(self.species, offspring.tolist(), crossed.tolist())):
+                new_organisms: list[Organism] = []
+                (_, offspring_rngs) = self.children(species_offspring, REPRODUCTION_STREAM, self.generation, index)
+                for offspring_index in range(species_offspring):
+                    if is_crossed:
+                        organism = children.organism(child_index, species.id, self.config, self.innovations, id=self.new_id())
+                        child_index += 1
+                    else:
+                        organism = species.get(0).clone(id=self.new_id())
+                    mutation = next(pending_mutations)
+                    if mutation != no_mutation:
+                        organism.apply_mutation(Mutation(mutation), offspring_rngs[offspring_index])
+                    new_organisms.append(organism)
+                species.organisms = new_organisms
 
-    # calculate genetic distance between two organisms
-    def compatibility(self, o1: 'Organism', o2: 'Organism') -> float:
-        # empty genome -> distance = 0 
-        if len(o1.genome) == 0 and len(o2.genome) == 0:
-            return 0
+    # save the whole population state (species, organisms, genes, innovations, threshold and random state) as a binary checkpoint
+    def save(self, path: str):
+        (innovations_header, innovations_arrays) = encode_innovations(self.innovations)
+        (random_version, random_internal_state, random_gauss_next) = random.getstate()
+
+        header = {
+            "config": self.config,
+            "compact": self.compact,
+            "batch_reproduction": self.batch_reproduction,
+            "generation": self.generation,
+            "compatibility_threshold": self.compatibility_threshold,
+            "total_fitness": self.total_fitness,
+            "total_adjusted_fitness": self.total_adjusted_fitness,
+            "innovations": innovations_header,
+            "random": {"version": random_version, "gauss_next": random_gauss_next},
+            "seed": self.streams.seed if self.streams is not None else None,
+            "last_id": self.last_id,
+            "novelty": self.novelty is not None,
+            "evaluated": self.evaluated
+        }
+        arrays = {
+            **encode_species(self.species),
+            **innovations_arrays,
+            **(encode_novelty(self.novelty) if self.novelty is not None else {}),
+            "random_state": np.array(random_internal_state, dtype=np.int64)
+        }
+        write_checkpoint(path, header, arrays)
+
+    # resume a saved population (restores the global random state and random streams, so the run continues exactly like an uninterrupted one)
+    # mmap -> large arrays (e.g. a compact population's genome store) are memory mapped instead of read
+    # batch reproduction -> overrides the saved reproduction mode (none -> mode of the saved population)
+    # novelty -> search of a novelty search population (its archive is restored from the checkpoint)
+    @classmethod
+    def load(cls, path: str, fitness_function: FitnessFunction, evaluator: Optional[Evaluator] = None, fitness_cache: Optional[FitnessCache] = None, metrics: Optional[Metrics] = None, mmap: bool = True, batch_reproduction: Optional[bool] = None, novelty: Optional[NoveltySearch] = None) -> 'Population':
+        (header, arrays) = read_checkpoint(path, mmap=mmap)
+        config: PopulationConfig = header["config"]
+        if header.get("novelty", False) != (novelty is not None):
+            raise ValueError(f"{path} was saved {'with' if header.get('novelty', False) else 'without'} novelty search")
+        if novelty is not None:
+            decode_novelty(novelty, arrays)
+
+        innovations = decode_innovations(header["innovations"], arrays)
+        (species, store) = decode_species(arrays, config, innovations)
+
+        population = cls(config, fitness_function, innovations=innovations, evaluator=evaluator, fitness_cache=fitness_cache, metrics=metrics, compact=header["compact"], species=species, batch_reproduction=batch_reproduction if batch_reproduction is not None else header.get("batch_reproduction", False), seed=header.get("seed"), novelty=novelty)
+        population.store = store
+        population.last_id = header.get("last_id", 0)
+        population.evaluated = header.get("evaluated", False) # saved organisms keep their fitness, an evaluated generation isn't evaluated again
+        population.generation = header["generation"]
+        population.compatibility_threshold = header["compatibility_threshold"]
+        population.total_fitness = header["total_fitness"]
+        population.total_adjusted_fitness = header["total_adjusted_fitness"]
+
+        random.setstate((header["random"]["version"], tuple(arrays["random_state"].tolist()), header["random"]["gauss_next"]))
+
+        return population
+
+    # pack every organism and species representative into a new genome store (organisms become views of it)
+    def pack(self):
+        organisms = [organism for species in self.species for organism in species.organisms]
+        organisms += [species.representative for species in self.species if species.representative is not None]
+
+        # clones and representatives are listed more than once, but stored once
+        unique_organisms = list({id(organism): organism for organism in organisms}.values())
+        self.store = GenomeStore.from_organisms(unique_organisms)
+        for (index, organism) in enumerate(unique_organisms):
+            organism.attach(self.store, index)
+
+    # assign every organism to the first persistent species whose representative is compatible (or found a new species)
+    def speciate(self):
+        population = [organism for species in self.species for organism in species.organisms]
+        max_compared_species = self.config.get('speciation').get('max_compared_species')
+
+        # per-generation speciation metrics
+        self.distance_evaluations = 0
+        self.distance_early_exits = 0
+
+        # species persist across generations through their representatives (largest species are compared first)
+        candidates = [(species, species.representative) for species in sorted(self.species, key=len, reverse=True) if species.representative is not None]
+        for (species, _) in candidates:
+            species.organisms = []
+
+        for organism in population:
+            n_compared = len(candidates) if max_compared_species is None else min(max_compared_species, len(candidates))
+            match_index = next((index for index in range(n_compared) if self.compatibility(candidates[index][1], organism, limit=self.compatibility_threshold) < self.compatibility_threshold), None)
+
+            # no compatible species -> organism becomes the representative of a new species
+            if match_index is None:
+                candidate = (Species(config=self.config, innovations=self.innovations, id=self.new_id()), organism)
+                candidate[0].representative = organism
+            else:
+                candidate = candidates.pop(match_index)
+
+            # most recently matched species are compared first (members of a species are listed together)
+            candidates.insert(0, candidate)
+            organism.species_id = candidate[0].id
+            candidate[0].add(organism)
+
+        # remove extinct species and choose next generation's representatives from current members
+        self.species = [species for (species, _) in candidates if len(species) > 0]
+        rng = self.stream(SPECIATION_STREAM, self.generation)
+        for species in self.species:
+            species.representative = species.get(rng.randint(0, len(species) - 1))
 
-        _, shared_connections, disjoint_connections, excess_connections = o1.gene_distribution(o2)
-        n_excess = len(excess_connections) # number of excess genes
-        n_disjoint = len(disjoint_connections) # number of disjoint genes
-        avg_weight = 0 # average weight differences of shared_connections
+    # calculate genetic distance between two organisms (given limit -> stop once the distance can't be below it)
+    def compatibility(self, o1: 'Organism', o2: 'Organism', limit: Optional[float] = None) -> float:
+        self.distance_evaluations += 1
 
-        # check if there is at least 1 shared connection
-        # todo: only enabled connections for weights!
-        if len(shared_connections) != 0:
-            # compute average weight differences of shared connections (i don't know if this is correct)
-            for (c1, c2) in shared_connections:
-                avg_weight += abs(c1.weight - c2.weight)
+        # innovation numbers and weights only (genome store views are compared without materializing genes)
+        (innovations1, weights1) = o1.innovations_and_weights()
+        (innovations2, weights2) = o2.innovations_and_weights()
 
-            avg_weight /= len(shared_connections)
-        else:
-            avg_weight = 0
+        # empty genome -> distance = 0 
+        if len(innovations1) == 0 and len(innovations2) == 0:
+            return 0
+
+        (larger_innovations, larger_weights) = (innovations1, weights1) if len(innovations1) > len(innovations2) else (innovations2, weights2)
+        (smaller_innovations, smaller_weights) = (innovations2, weights2) if len(innovations1) > len(innovations2) else (innovations1, weights1)
 
-        max_genome_size = max(len(o1.genome), len(o2.genome)) # larger genome length
+        max_genome_size = max(len(innovations1), len(innovations2)) # larger genome length
         excess_factor = self.config.get('speciation').get('excess_factor') # excess factor
         disjoint_factor = self.config.get('speciation').get('disjoint_factor') # disjoint factor
         weight_factor = self.config.get('speciation').get('weight_factor') # weight factor
+
+        # align genomes by innovation number (same shared, disjoint and excess genes as gene_distribution)
+        smaller_organism_index = o1.innovation_index(smaller_innovations)
+        largest_smaller_genome_innovation = max(smaller_organism_index) if len(smaller_organism_index) > 0 else 0
+
+        n_excess = 0 # number of excess genes
+        n_disjoint = 0 # number of disjoint genes
+        n_shared = 0 # number of shared genes
+        avg_weight = 0.0 # average weight differences of shared_connections
+
+        for (innovation, weight) in zip(larger_innovations, larger_weights):
+            positions = smaller_organism_index.get(innovation)
+            if positions:
+                # todo: only enabled connections for weights!
+                avg_weight += abs(weight - smaller_weights[positions.pop(0)])
+                n_shared += 1
+                continue
+
+            if innovation > largest_smaller_genome_innovation:
+                n_excess += 1
+            else:
+                n_disjoint += 1
+
+            # structural distance only grows -> stop early once it reaches the limit
+            if limit is not None:
+                structural_distance = (n_excess * excess_factor) / max_genome_size + (n_disjoint * disjoint_factor) / max_genome_size
+                if structural_distance >= limit:
+                    self.distance_early_exits += 1
+                    return structural_distance
+
+        # leftover genes from smaller genome are disjoint
+        n_disjoint += len(smaller_innovations) - n_shared
+
+        # compute average weight differences of shared connections (i don't know if this is correct)
+        if n_shared != 0:
+            avg_weight /= n_shared
  
         distance = (n_excess * excess_factor) / max_genome_size  + (n_disjoint * disjoint_factor) / max_genome_size + avg_weight * weight_factor
 
         return distance
 
+    # genetic distance between every pair of organisms (defaults to whole population), computed in bulk with numpy
+    def compatibility_matrix(self, organisms: Optional[list['Organism']] = None, block_size: Optional[int] = None):
+        if organisms is None:
+            organisms = [organism for species in self.species for organism in species.organisms]
+        return compatibility_matrix(organisms, self.config.get('speciation'), block_size=block_size)
+
     # compute direction step and new compatibility threshold (if target is perfect -> skip)
     def adjust_compatibility_threshold(self):
 
@@ -173,18 +461,39 @@ class Population:
         else:
             self.compatibility_threshold -= self.compatibility_threshold_step
     
-    # get the best preforming organism in population
-    def best(self):
-        best: Organism = self.species[0].get(0)
-        for species in self.species:
-            for organism in species.organisms:
-                if organism.fitness > best.fitness:
-                    best = organism
-        return best
+    # get the best preforming organism in population (an unevaluated generation is evaluated first)
+    def best(self) -> 'Organism':
+        if not self.evaluated:
+            self.compute_population_fitness()
+        return max((organism for species in self.species for organism in species.organisms), key=lambda organism: organism.fitness)
+
+    # get the n best performing (distinct) organisms in population (an unevaluated generation is evaluated first)
+    def top(self, n: int) -> list['Organism']:
+        if not self.evaluated:
+            self.compute_population_fitness()
+        organisms = list({id(organism): organism for species in self.species for organism in species.organisms}.values())
+        return sorted(organisms, key=lambda organism: organism.fitness, reverse=True)[:n]
+
+    # replace the worst performing organisms by immigrants (e.g. migrants from other populations), population size is unchanged
+    def immigrate(self, immigrants: list['Organism']):
+        if not self.evaluated:
+            self.compute_population_fitness()
+        positions = sorted(((species, index) for species in self.species for index in range(len(species))), key=lambda position: position[0].get(position[1]).fitness)
+        for (immigrant, (species, index)) in zip(immigrants, positions):
+            immigrant.species_id = species.id
+            species.organisms[index] = immigrant
+
+        # immigrants are evaluated by this population's fitness function (novelty depends on the whole generation, so it's evaluated again)
+        if self.novelty is not None:
+            self.evaluated = False
+        else:
+            self.evaluate(immigrants[:len(positions)])
 
-    # user defined fitness function
+    # user defined fitness function (evaluated like a generation, so async fitness functions work too)
+    # novelty search -> novelty of the organism's behaviour against the archive (the archive and the generation's behaviours are unchanged)
     def fitness(self, organism: 'Organism'):
-        return self.fitness_function(organism)
+        result = self.evaluator.evaluate([organism], self.fitness_function, self.config)[0]
+        return self.novelty.score([result], record=False)[0] if self.novelty is not None else result
     
     # compute the populations average adjusted fitness (per generation)
     def compute_population_adjusted_fitness_sum(self):
@@ -193,16 +502,57 @@ class Population:
             species.apply_adjusted_fitness()
             self.total_adjusted_fitness += species.total_adjusted_fitness
 
-    # compute the fitness for every organism in the population
+    # compute the fitness for every organism in the population (offspring are evaluated here, once per generation)
     def compute_population_fitness(self):
-        for species in self.species:
-            for organism in species.organisms:
-                organism.fitness = self.fitness(organism)
+        self.evaluate([organism for species in self.species for organism in species.organisms])
+        self.evaluated = True
+
+    # compute and assign the fitness of organisms in a single batch with the population's evaluator
+    # novelty search -> the fitness function's results (behaviours, also what the fitness cache holds) are scored against each other and the archive
+    def evaluate(self, organisms: list['Organism']):
+        # organisms listed more than once (clones) are only evaluated once
+        unique_organisms = list({id(organism): organism for organism in organisms}.values())
+
+        if self.fitness_cache is None:
+            self.metrics.count('fitness_evaluations', len(unique_organisms))
+            results = self.evaluator.evaluate(unique_organisms, self.fitness_function, self.config)
+            for (organism, fitness) in zip(unique_organisms, self.novelty.score(results) if self.novelty is not None else results):
+                organism.fitness = fitness
+            return
+
+        # cache hits (previous generations or identical genomes in this batch) skip evaluation
+        keys = [organism.genome_hash() for organism in unique_organisms]
+        fitnesses: dict[int, float] = {}
+        pending: dict[int, Organism] = {}
+        for (key, organism) in zip(keys, unique_organisms):
+            cached_fitness = self.fitness_cache.get(key)
+            if cached_fitness is not None:
+                fitnesses[key] = cached_fitness
+                self.fitness_cache.hits += 1
+            elif key in pending:
+                self.fitness_cache.hits += 1
+            else:
+                pending[key] = organism
+                self.fitness_cache.misses += 1
+
+        self.metrics.count('fitness_evaluations', len(pending))
+        fitnesses_pending = self.evaluator.evaluate(list(pending.values()), self.fitness_function, self.config)
+        failed = set(self.evaluator.failed) # fallback fitness isn't cached (failures may be transient)
+        for (index, (key, fitness)) in enumerate(zip(pending.keys(), fitnesses_pending)):
+            fitnesses[key] = fitness
+            if index not in failed:
+                self.fitness_cache.set(key, fitness)
+
+        results = [fitnesses[key] for key in keys]
+        for (organism, fitness) in zip(unique_organisms, self.novelty.score(results) if self.novelty is not None else results):
+            organism.fitness = fitness
 
     # string representation of population
     def __str__(self, show_organisms = True) -> str:
         population_str = f"Population ({self.config.get('name')}):"
         population_str += f"\n  Total Organisms: {sum([len(s) for s in self.species])}"
+        if self.fitness_cache is not None:
+            population_str += f"\n  Fitness Cache: {self.fitness_cache}"
         population_str += f"\n  Species ({len(self.species)})"
         for (index, species) in enumerate(self.species):
             population_str += f'\n    ({index}) {species.__str__(show_organisms=show_organisms)}'
@@ -0,0 +1,140 @@
+import numpy as np
+from config.configuration import OrganismConfig
+from genetics.organism import Mutation
+from genetics.store import GenomeStore
+
+# batch reproduction: tournaments, crossover masks and mutations of a whole generation are drawn as arrays at once
+# and crossover is computed on genome store records (children are store views, no genes are built unless a child is mutated)
+
+# concatenated index ranges starts[i]:starts[i] + counts[i]
+def ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    return np.arange(counts.sum(), dtype=np.int64) + np.repeat(starts - (np.cumsum(counts) - counts), counts)
+
+# tournament selection for every species (sizes >= 2): each offspring's parents win one tournament each between two distinct random members
+# the fitter member wins (ties go to the second, like the per-species loop), returns positions into the species-ordered fitness array
+def draw_tournaments(rng: np.random.Generator, fitnesses: np.ndarray, offsets: np.ndarray, sizes: np.ndarray, offspring: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    species = np.repeat(np.arange(len(sizes)), 2 * offspring)
+    (species_offsets, species_sizes) = (offsets[species], sizes[species])
+
+    first = (rng.random(len(species)) * species_sizes).astype(np.int64)
+    second = (rng.random(len(species)) * (species_sizes - 1)).astype(np.int64)
+    second += second >= first # uniform over the other members
+    (first, second) = (first + species_offsets, second + species_offsets)
+    winners = np.where(fitnesses[first] > fitnesses[second], first, second)
+
+    # a species' winners are paired first half with second half
+    blocks = np.cumsum(2 * offspring) - 2 * offspring
+    return (winners[ranges(blocks, offspring)], winners[ranges(blocks + offspring, offspring)])
+
+# mutation of every offspring (none if the mutation chance misses), drawn with the same probabilities as Organism.mutate
+def draw_mutations(rng: np.random.Generator, n: int, mutation_chance: float, config: OrganismConfig) -> np.ndarray:
+    draws = rng.random((4, n))
+    mutate = draws[0] < mutation_chance
+    structural = draws[1] < config.get('structural_mutation_chance')
+    connection = draws[2] < config.get('structural_connection_mutation_chance')
+    activation = draws[2] < config.get('activation_function_mutation_chance')
+    add_connection = draws[3] < config.get('structural_connection_addition_chance')
+    add_node = draws[3] < config.get('structural_node_addition_chance')
+
+    conditions = [~mutate, structural & connection & add_connection, structural & connection, structural & add_node, structural, activation]
+    mutations = [Mutation.NONE, Mutation.ADD_CONNECTION, Mutation.REMOVE_CONNECTION, Mutation.ADD_NODE, Mutation.REMOVE_NODE, Mutation.ACTIVATION]
+    return np.select(conditions, mutations, default=Mutation.WEIGHT).astype(np.int8)
+
+# crossover of stored genome pairs into a new store (same gene distribution as Species.crossover)
+# child genome: disjoint genes of the larger parent, unmatched genes of the smaller one, excess genes, then shared genes taken from either parent with even chance
+# child nodes: listed nodes of the parent with more nodes, then end points of the child's connections that aren't listed (from the connection's parent)
+def crossover_genomes(store: GenomeStore, parents1: np.ndarray, parents2: np.ndarray, rng: np.random.Generator) -> GenomeStore:
+    n_children = len(parents1)
+    connection_counts = np.diff(store.connection_offsets)
+    listed_counts = np.bincount(store.node_owners[store.node_listed], minlength=len(store))
+
+    # ties go to the second parent (like gene_distribution)
+    larger = np.where(connection_counts[parents1] > connection_counts[parents2], parents1, parents2)
+    smaller = np.where(connection_counts[parents1] > connection_counts[parents2], parents2, parents1)
+    node_parents = np.where(listed_counts[parents1] > listed_counts[parents2], parents1, parents2)
+
+    # connection records of both parents of every child: (child, parent side (0 larger, 1 smaller), position in parent genome, record)
+    records = [ranges(store.connection_offsets[parents], connection_counts[parents]) for parents in (larger, smaller)]
+    children = np.concatenate([np.repeat(np.arange(n_children), connection_counts[parents]) for parents in (larger, smaller)])
+    sides = np.concatenate([np.zeros(len(records[0]), dtype=np.int8), np.ones(len(records[1]), dtype=np.int8)])
+    positions = np.concatenate([record - np.repeat(store.connection_offsets[parents], connection_counts[parents]) for (record, parents) in zip(records, (larger, smaller))])
+    records = np.concatenate(records)
+    innovations = store.innovations[records]
+
+    # group equal innovations of a child, the larger parent's occurrences first (in genome order)
+    order = np.lexsort((positions, sides, innovations, children))
+    (children, sides, positions, records, innovations) = (children[order], sides[order], positions[order], records[order], innovations[order])
+    n = len(order)
+    group_start = np.ones(n, dtype=np.bool_)
+    group_start[1:] = (children[1:] != children[:-1]) | (innovations[1:] != innovations[:-1])
+    run_start = group_start.copy()
+    run_start[1:] |= sides[1:] != sides[:-1]
+    group_starts = np.maximum.accumulate(np.where(group_start, np.arange(n), 0))
+    run_starts = np.maximum.accumulate(np.where(run_start, np.arange(n), 0))
+    ranks = np.arange(n) - run_starts # occurrence of the innovation within its parent
+    group_ids = np.cumsum(group_start) - 1
+    larger_counts = np.bincount(group_ids, weights=sides == 0).astype(np.int64)[group_ids]
+    smaller_counts = np.bincount(group_ids, weights=sides == 1).astype(np.int64)[group_ids]
+
+    # k-th occurrence in the larger parent is matched with the k-th occurrence in the smaller parent
+    shared = np.where(sides == 0, ranks < smaller_counts, ranks < larger_counts)
+    max_smaller = np.zeros(n_children, dtype=np.int64)
+    np.maximum.at(max_smaller, children[sides == 1], innovations[sides == 1])
+    excess = (sides == 0) & ~shared & (innovations > max_smaller[children])
+
+    # shared genes come from the smaller parent where the mask misses
+    take_smaller = (sides == 0) & shared
+    take_smaller[take_smaller] = rng.random(int(take_smaller.sum())) >= 0.5
+    chosen = np.where(take_smaller, records[np.minimum(group_starts + larger_counts + ranks, n - 1)], records)
+
+    # categories in child genome order: 0 larger disjoint, 1 smaller unmatched, 2 excess, 3 shared
+    keep = ~shared | (sides == 0)
+    categories = np.where(shared, 3, np.where(excess, 2, sides))
+    (children, categories, positions, chosen) = (children[keep], categories[keep], positions[keep], chosen[keep])
+    order = np.lexsort((positions, categories, children))
+    (children, chosen) = (children[order], chosen[order])
+    child_connection_counts = np.bincount(children, minlength=n_children)
+
+    # listed nodes of the node parents
+    parent_node_records = ranges(store.node_offsets[node_parents], np.diff(store.node_offsets)[node_parents])
+    parent_node_children = np.repeat(np.arange(n_children), np.diff(store.node_offsets)[node_parents])
+    listed = store.node_listed[parent_node_records]
+    (listed_records, listed_children) = (parent_node_records[listed], parent_node_children[listed])
+
+    # connection end points (in genome order) that aren't listed become orphan nodes, resolved in the connection's parent
+    key_base = int(max(store.node_ids.max(initial=0), store.starts.max(initial=0), store.ends.max(initial=0))) + 1
+    endpoint_ids = np.stack([store.starts[chosen], store.ends[chosen]], axis=1).ravel()
+    endpoint_children = np.repeat(children, 2)
+    endpoint_owners = np.repeat(store.connection_owners[chosen], 2)
+    endpoint_keys = endpoint_children * key_base + endpoint_ids
+    orphan = ~np.isin(endpoint_keys, listed_children * key_base + store.node_ids[listed_records])
+    (_, first) = np.unique(endpoint_keys[orphan], return_index=True)
+    first = np.sort(first)
+    orphan_children = endpoint_children[orphan][first]
+    orphan_lookup = (endpoint_owners[orphan] * key_base + endpoint_ids[orphan])[first]
+
+    # first node record of an id in its organism (listed records come first)
+    parent_keys = store.node_owners.astype(np.int64) * key_base + store.node_ids
+    parent_order = np.lexsort((~store.node_listed, parent_keys))
+    orphan_records = parent_order[np.searchsorted(parent_keys[parent_order], orphan_lookup)]
+
+    # child node records: listed nodes then orphans
+    node_children = np.concatenate([listed_children, orphan_children])
+    node_records = np.concatenate([listed_records, orphan_records])
+    node_listed = np.concatenate([np.ones(len(listed_records), dtype=np.bool_), np.zeros(len(orphan_records), dtype=np.bool_)])
+    order = np.argsort(node_children, kind='stable')
+    (node_children, node_records, node_listed) = (node_children[order], node_records[order], node_listed[order])
+
+    return GenomeStore(
+        node_ids=store.node_ids[node_records],
+        node_types=store.node_types[node_records],
+        node_activations=store.node_activations[node_records],
+        node_listed=node_listed,
+        node_offsets=np.concatenate(([0], np.cumsum(np.bincount(node_children, minlength=n_children), dtype=np.int64))),
+        innovations=store.innovations[chosen],
+        starts=store.starts[chosen],
+        ends=store.ends[chosen],
+        weights=store.weights[chosen],
+        enabled=store.enabled[chosen],
+        connection_offsets=np.concatenate(([0], np.cumsum(child_connection_counts, dtype=np.int64)))
+    )
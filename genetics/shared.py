@@ -0,0 +1,81 @@
+from multiprocessing import shared_memory
+from uuid import UUID
+import numpy as np
+from config.configuration import PopulationConfig
+from genetics.organism import Organism
+from genetics.store import GenomeStore
+
+# array name -> (dtype, shape, byte offset) inside a shared memory buffer
+SharedLayout = dict[str, tuple[str, tuple[int, ...], int]]
+
+# genome store arrays published to workers
+shared_store_arrays = ('node_ids', 'node_types', 'node_activations', 'node_listed', 'node_offsets', 'innovations', 'starts', 'ends', 'weights', 'enabled', 'connection_offsets')
+
+# a generation's packed genomes (plus species ids and fitness) published in a single shared memory buffer
+# workers attach by name and build networks straight from the buffer, nothing is pickled per organism
+class SharedGenomes:
+    alignment = 64
+
+    def __init__(self, memory: shared_memory.SharedMemory, layout: SharedLayout, owner: bool) -> None:
+        self.memory = memory
+        self.layout = layout
+        self.owner = owner # owner unlinks the buffer on close
+
+        arrays = {name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf, offset=offset) for (name, (dtype, shape, offset)) in layout.items()}
+        self.store = GenomeStore(**{name: arrays[name] for name in shared_store_arrays})
+        self.species_ids = arrays['species_ids']
+        self.fitness = arrays['fitness']
+
+    # pack organisms into a new shared memory buffer
+    @classmethod
+    def publish(cls, organisms: list[Organism]) -> 'SharedGenomes':
+        store = GenomeStore.from_organisms(organisms)
+        arrays = {name: getattr(store, name) for name in shared_store_arrays}
+        arrays['species_ids'] = np.array([list(organism.species_id.bytes) if organism.species_id is not None else [0] * 16 for organism in organisms], dtype=np.uint8).reshape(-1, 16)
+        arrays['fitness'] = np.array([(organism.fitness, organism.adjusted_fitness) for organism in organisms], dtype=np.float64).reshape(-1, 2)
+
+        layout: SharedLayout = {}
+        size = 0
+        for (name, array) in arrays.items():
+            size += -size % cls.alignment
+            layout[name] = (array.dtype.str, array.shape, size)
+            size += array.nbytes
+
+        memory = shared_memory.SharedMemory(create=True, size=max(1, size))
+        for (name, array) in arrays.items():
+            (_, shape, offset) = layout[name]
+            np.ndarray(shape, dtype=array.dtype, buffer=memory.buf, offset=offset)[...] = array
+
+        return cls(memory, layout, owner=True)
+
+    # attach to a buffer published by another process
+    @classmethod
+    def attach(cls, name: str, layout: SharedLayout) -> 'SharedGenomes':
+        # worker processes share the publisher's resource tracker, so attaching re-registers the same name (the publisher unlinks it)
+        memory = shared_memory.SharedMemory(name=name)
+        return cls(memory, layout, owner=False)
+
+    # name of the shared memory buffer
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    # organism view of a published genome (fitness and species are restored, genes are only built if accessed)
+    def organism(self, index: int, config: PopulationConfig) -> Organism:
+        species_id = self.species_ids[index].tobytes()
+        organism = self.store.organism(index, UUID(bytes=species_id) if any(species_id) else None, config) # type: ignore
+        (organism.fitness, organism.adjusted_fitness) = self.fitness[index].tolist()
+        return organism
+
+    # number of published genomes
+    def __len__(self) -> int:
+        return len(self.store)
+
+    # release the buffer (arrays of this object mustn't be used afterwards)
+    def close(self):
+        self.store = None # type: ignore
+        self.species_ids = None # type: ignore
+        self.fitness = None # type: ignore
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
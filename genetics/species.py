@@ -1,14 +1,22 @@
-from uuid import uuid4
+from typing import Optional
+import random
+from uuid import UUID, uuid4
 from genetics.organism import Organism
-from utils import chance, random_exclude
+from utils import chance, random_exclude, default_random
 from config.configuration import PopulationConfig
+from genetics.innovations import InnovationRegistry
 
 # collection of organisms for greater genetic diversity
 class Species:
-    def __init__(self, config: 'PopulationConfig'):
-        self.id = uuid4() # could just increment id...
+    __slots__ = ('id', 'config', 'mutation_chance', 'innovations', 'organisms', 'representative', 'average_fitness', 'total_adjusted_fitness', 'total_fitness', 'average_adjusted_fitness')
+
+    def __init__(self, config: 'PopulationConfig', innovations: InnovationRegistry, id: Optional[UUID] = None):
+        self.id = id if id is not None else uuid4() # populations assign ids from a counter
         self.config = config
+        self.mutation_chance = config.get('organism').get('mutation_chance')
+        self.innovations = innovations
         self.organisms: list[Organism] = [] # members of species
+        self.representative: Optional[Organism] = None # organism new members are compared against (kept across generations)
 
         # fitness for species
         self.average_fitness = 0.0
@@ -18,24 +26,26 @@ class Species:
 
         # self.generations_since_improvement = 0 # todo: implement penalization (prevent bloat)
 
-    # crossover 2 organisms and produce a single organism
-    def crossover(self, o1: 'Organism', o2: 'Organism') -> 'Organism':
+    # crossover 2 organisms and produce a single organism (optionally without the chance of mutation)
+    # rng -> random stream of the child, id -> child's id (random if not given)
+    def crossover(self, o1: 'Organism', o2: 'Organism', mutate: bool = True, rng: random.Random = default_random, id: Optional[UUID] = None) -> 'Organism':
         nodes, shared_connections, disjoint_connections, excess_connections = o1.gene_distribution(o2)
 
         child_genome = disjoint_connections + excess_connections
 
         # randomly assign shared connections to each child
         for (c1, c2) in shared_connections:
-            if chance(0.5):
+            if chance(0.5, rng):
                 child_genome.append(c1)
             else:
                 child_genome.append(c2)
 
-        child = Organism(species_id=self.id, config=self.config, genome=child_genome, nodes=nodes)
+        # parents' genes are shared with the child (copy-on-write), mutations copy only the genes they change
+        child = Organism(species_id=self.id, config=self.config, innovations=self.innovations, genome=child_genome, nodes=nodes, id=id)
 
         # random chance of mutation 
-        if chance(self.config.get('organism').get('mutation_chance')):
-            child.mutate()
+        if mutate and chance(self.mutation_chance, rng):
+            child.mutate(rng)
 
         return child
 
@@ -0,0 +1,144 @@
+from typing import Optional
+from uuid import UUID
+import numpy as np
+from config.configuration import PopulationConfig
+from genetics.genes import ConnectionGene, NodeGene, NodeType, EncodedNode, EncodedConnection, SHARED_GENE, decode_genome
+from genetics.organism import Organism
+from genetics.innovations import InnovationRegistry
+from nn.network import FeedForwardNetwork
+
+# struct-of-arrays store of many genomes (contiguous node and connection records, organism i owns slice offsets[i]:offsets[i + 1])
+class GenomeStore:
+    def __init__(self, node_ids: np.ndarray, node_types: np.ndarray, node_activations: np.ndarray, node_listed: np.ndarray, node_offsets: np.ndarray, innovations: np.ndarray, starts: np.ndarray, ends: np.ndarray, weights: np.ndarray, enabled: np.ndarray, connection_offsets: np.ndarray) -> None:
+        # node records (listed -> in organism's node list, otherwise only a connection end point)
+        self.node_ids = node_ids
+        self.node_types = node_types
+        self.node_activations = node_activations
+        self.node_listed = node_listed
+        self.node_offsets = node_offsets
+
+        # connection records
+        self.innovations = innovations
+        self.starts = starts
+        self.ends = ends
+        self.weights = weights
+        self.enabled = enabled
+        self.connection_offsets = connection_offsets
+
+        # owning organism of every record
+        self.node_owners = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(node_offsets))
+        self.connection_owners = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(connection_offsets))
+
+    # pack the genomes of organisms (views of other stores are copied without materializing genes)
+    @classmethod
+    def from_organisms(cls, organisms: list[Organism]) -> 'GenomeStore':
+        nodes: list[EncodedNode] = []
+        listed: list[bool] = []
+        connections: list[EncodedConnection] = []
+        node_counts: list[int] = []
+        connection_counts: list[int] = []
+
+        for organism in organisms:
+            (organism_nodes, organism_orphans, organism_connections) = organism.records()
+            nodes += organism_nodes
+            nodes += organism_orphans
+            listed += [True] * len(organism_nodes) + [False] * len(organism_orphans)
+            connections += organism_connections
+            node_counts.append(len(organism_nodes) + len(organism_orphans))
+            connection_counts.append(len(organism_connections))
+
+        node_columns = list(zip(*nodes)) if len(nodes) > 0 else [(), (), ()]
+        connection_columns = list(zip(*connections)) if len(connections) > 0 else [(), (), (), (), ()]
+
+        return cls(
+            node_ids=np.array(node_columns[0], dtype=np.int64),
+            node_types=np.array(node_columns[1], dtype=np.int8),
+            node_activations=np.array(node_columns[2], dtype=np.int8),
+            node_listed=np.array(listed, dtype=np.bool_),
+            node_offsets=np.concatenate(([0], np.cumsum(node_counts, dtype=np.int64))),
+            innovations=np.array(connection_columns[0], dtype=np.int64),
+            starts=np.array(connection_columns[1], dtype=np.int64),
+            ends=np.array(connection_columns[2], dtype=np.int64),
+            weights=np.array(connection_columns[3], dtype=np.float64),
+            enabled=np.array(connection_columns[4], dtype=np.bool_),
+            connection_offsets=np.concatenate(([0], np.cumsum(connection_counts, dtype=np.int64)))
+        )
+
+    # node record slice of an organism
+    def node_slice(self, index: int) -> slice:
+        return slice(int(self.node_offsets[index]), int(self.node_offsets[index + 1]))
+
+    # connection record slice of an organism
+    def connection_slice(self, index: int) -> slice:
+        return slice(int(self.connection_offsets[index]), int(self.connection_offsets[index + 1]))
+
+    # number of connection records of an organism
+    def genome_size(self, index: int) -> int:
+        return int(self.connection_offsets[index + 1] - self.connection_offsets[index])
+
+    # plain (nodes, orphan nodes, connections) records of an organism
+    def records(self, index: int) -> tuple[list[EncodedNode], list[EncodedNode], list[EncodedConnection]]:
+        nodes = self.node_slice(index)
+        connections = self.connection_slice(index)
+
+        node_records = list(zip(self.node_ids[nodes].tolist(), self.node_types[nodes].tolist(), self.node_activations[nodes].tolist()))
+        listed = self.node_listed[nodes].tolist()
+        connection_records = list(zip(self.innovations[connections].tolist(), self.starts[connections].tolist(), self.ends[connections].tolist(), self.weights[connections].tolist(), self.enabled[connections].tolist()))
+
+        return ([r for (r, l) in zip(node_records, listed) if l], [r for (r, l) in zip(node_records, listed) if not l], connection_records)
+
+    # connection innovation numbers and weights of an organism in genome order
+    def innovations_and_weights(self, index: int) -> tuple[list[int], list[float]]:
+        connections = self.connection_slice(index)
+        return (self.innovations[connections].tolist(), self.weights[connections].tolist())
+
+    # weights of an organism's enabled connections in genome order
+    def enabled_weights(self, index: int) -> list[float]:
+        connections = self.connection_slice(index)
+        return self.weights[connections][self.enabled[connections]].tolist()
+
+    # build gene objects of an organism (owner -> token of the organism the genes are built for)
+    def genes(self, index: int, innovations: Optional[InnovationRegistry] = None, owner: int = SHARED_GENE) -> tuple[list[NodeGene], list[ConnectionGene]]:
+        return decode_genome(*self.records(index), innovations=innovations, owner=owner)
+
+    # build an organism's network straight from its records (no gene objects)
+    def phenotype(self, index: int, n_inputs: int) -> FeedForwardNetwork:
+        nodes = self.node_slice(index)
+        connections = self.connection_slice(index)
+
+        ids = self.node_ids[nodes].tolist()
+        listed = self.node_listed[nodes]
+
+        # listed nodes take priority over connection end points (same resolution as a network built from genes)
+        activations = dict(zip(self.node_ids[nodes][~listed].tolist(), self.node_activations[nodes][~listed].tolist()))
+        activations.update(zip(self.node_ids[nodes][listed].tolist(), self.node_activations[nodes][listed].tolist()))
+        output_ids = [id for (id, type, is_listed) in zip(ids, self.node_types[nodes].tolist(), listed.tolist()) if is_listed and type == NodeType.OUTPUT.value]
+
+        enabled = self.enabled[connections]
+        edges = list(zip(self.starts[connections][enabled].tolist(), self.ends[connections][enabled].tolist(), self.weights[connections][enabled].tolist()))
+
+        return FeedForwardNetwork(n_inputs=n_inputs, graph=(activations, output_ids, edges), prune=True, disabled_connections=len(enabled) - len(edges))
+
+    # renumber connection innovations (innovations missing from the mapping are kept)
+    def remap_innovations(self, mapping: dict[int, int]):
+        if len(mapping) == 0 or len(self.innovations) == 0:
+            return
+        lookup = np.arange(max(int(self.innovations.max()), max(mapping)) + 1, dtype=np.int64)
+        lookup[list(mapping.keys())] = list(mapping.values())
+        self.innovations = lookup[self.innovations]
+
+    # create an organism that is a view of a stored genome
+    def organism(self, index: int, species_id: UUID, config: PopulationConfig, innovations: Optional[InnovationRegistry] = None, id: Optional[UUID] = None) -> Organism:
+        organism = Organism(species_id=species_id, config=config, innovations=innovations, genome=[], nodes=[], id=id)
+        organism.attach(self, index)
+        return organism
+
+    # bytes used by all record arrays
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.node_ids, self.node_types, self.node_activations, self.node_listed, self.node_offsets, self.node_owners, self.innovations, self.starts, self.ends, self.weights, self.enabled, self.connection_offsets, self.connection_owners)
+        return sum(array.nbytes for array in arrays)
+
+    # number of stored genomes
+    def __len__(self) -> int:
+        return len(self.node_offsets) - 1
@@ -0,0 +1,49 @@
+from typing import Optional
+import random
+import numpy as np
+
+# python generator seeded from 4 words of a seed sequence
+def seeded_stream(words: np.ndarray) -> random.Random:
+    return random.Random(int.from_bytes(words.tobytes(), 'little'))
+
+# first spawn key of every stream (what the stream is used for)
+INITIAL_STREAM = 0 # initial organisms are children of (INITIAL_STREAM)
+SPECIATION_STREAM = 1 # representative choice: (SPECIATION_STREAM, generation)
+REPRODUCTION_STREAM = 2 # selection, crossover and mutation: (REPRODUCTION_STREAM, generation[, species]), offspring are children of their species' key
+
+# stream of a key and lazily created streams of its children (words 0:4 of the key's sequence seed the key's own stream, words 4(i + 1):4(i + 2) seed child i)
+# one seed sequence per key instead of one per child, a child's stream is only built when it's used
+class ChildStreams:
+    def __init__(self, sequence: np.random.SeedSequence, n: int) -> None:
+        self.words = sequence.generate_state(4 * (n + 1)).reshape(n + 1, 4)
+        self.stream = seeded_stream(self.words[0]) # same as RandomStreams.stream of the key
+
+    # stream of child index
+    def __getitem__(self, index: int) -> random.Random:
+        return seeded_stream(self.words[index + 1])
+
+    # number of children
+    def __len__(self) -> int:
+        return len(self.words) - 1
+
+# seeded hierarchy of independent random streams (numpy SeedSequence spawn keys below one root seed)
+# the numbers an operation draws only depend on the seed and on its generation, species and organism, never on execution order
+class RandomStreams:
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().entropy) # type: ignore
+
+    # seed sequence of a stream key
+    def sequence(self, *key: int) -> np.random.SeedSequence:
+        return np.random.SeedSequence(self.seed, spawn_key=key)
+
+    # python generator of a stream key (used by gene, organism and species operations)
+    def stream(self, *key: int) -> random.Random:
+        return seeded_stream(self.sequence(*key).generate_state(4))
+
+    # stream of a key and of its first n children
+    def children(self, n: int, *key: int) -> ChildStreams:
+        return ChildStreams(self.sequence(*key), n)
+
+    # numpy generator of a stream key (used by batched operations)
+    def generator(self, *key: int) -> np.random.Generator:
+        return np.random.default_rng(self.sequence(*key))
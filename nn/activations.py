@@ -1,25 +1,80 @@
-from typing import Optional
+from typing import Optional, Callable
 from enum import Enum
 import math
 import random
 from functools import partial
+import numpy as np
+from utils import default_random
 
-# all possible activation function with their implementations 
+# numerically stable sigmoid (never overflows for large negative inputs)
+def sigmoid(x: float) -> float:
+    if x >= 0:
+        return 1 / (1 + math.exp(-x))
+    z = math.exp(x)
+    return z / (1 + z)
+
+def linear(x: float) -> float:
+    return x
+
+def relu(x: float) -> float:
+    return max(0, x)
+
+# all possible activation function with their implementations
 class ActivationFunctions(Enum):
-    Linear = partial(lambda x: x)
-    Sigmoid = partial(lambda x: 1 / (1 + math.exp(-x)))
-    Tanh = partial(lambda x: math.tanh(x))
-    ReLu = partial(lambda x: max(0, x))
+    Linear = partial(linear)
+    Sigmoid = partial(sigmoid)
+    Tanh = partial(math.tanh)
+    ReLu = partial(relu)
+
+# small integer code of every activation function (index in this list, used by genes and packed genome representations)
+activation_functions = list(ActivationFunctions)
+activation_codes = {function: code for (code, function) in enumerate(activation_functions)}
+
+# scalar implementations by code (called directly, without the enum and partial wrappers)
+activation_table: list[Callable[[float], float]] = [function.value.func for function in activation_functions]
+
+# array implementations of every activation function (elementwise, same results as the scalar versions)
+def vectorized_sigmoid(x: np.ndarray) -> np.ndarray:
+    z = np.exp(-np.abs(x))
+    return np.where(x >= 0, 1 / (1 + z), z / (1 + z))
+
+VectorizedActivationFunctions: dict[ActivationFunctions, Callable[[np.ndarray], np.ndarray]] = {
+    ActivationFunctions.Linear: lambda x: x,
+    ActivationFunctions.Sigmoid: vectorized_sigmoid,
+    ActivationFunctions.Tanh: np.tanh,
+    ActivationFunctions.ReLu: lambda x: np.maximum(x, 0),
+}
+
+# array implementations by code
+vectorized_activation_table = [VectorizedActivationFunctions[function] for function in activation_functions]
+
+# randomly choose an activation function code
+def random_activation(rng: random.Random = default_random) -> int:
+    return rng.randrange(len(activation_functions))
 
 # Over-arching activation function used in genes
 class ActivationFunction:
+    __slots__ = ('code', 'type', 'function')
+
     def __init__(self, function: Optional[ActivationFunctions] = None) -> None:
-        # given a function -> just use that 
-        if function is not None:
-            self.function = function.value
-        # no function -> randomly select one
-        else:
-            self.function = random.choice(list(ActivationFunctions)).value
-    
+        # given a function -> just use that, no function -> randomly select one
+        self.code = activation_codes[function] if function is not None else random_activation()
+        self.type = activation_functions[self.code]
+        self.function = activation_table[self.code]
+
     def __call__(self, x: float) -> float:
-        return self.function(x)
\ No newline at end of file
+        return self.function(x)
+
+    # apply the activation function elementwise to an array
+    def vectorized(self, x: np.ndarray) -> np.ndarray:
+        return vectorized_activation_table[self.code](x)
+
+    # activation functions are immutable values
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, ActivationFunction) and self.code == other.code
+
+    def __hash__(self) -> int:
+        return self.code
+
+# one shared (immutable) instance per activation function code
+activation_instances = [ActivationFunction(function) for function in activation_functions]
@@ -0,0 +1,109 @@
+from typing import NamedTuple
+import numpy as np
+from nn.activations import vectorized_activation_table
+from nn.network import FeedForwardNetwork
+
+# compiled nodes of a depth over all packed networks: (value slots, sources per node start in edge arrays, edge source slots, edge weights, activation groups (activation code, node positions))
+PackedDepth = tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, list[tuple[int, np.ndarray]]]
+
+# many networks packed into one value space (every network's slots are offset past the previous network's)
+class PackedNetworks(NamedTuple):
+    n_slots: int
+    input_slots: np.ndarray # [networks * inputs]
+    constant_slots: np.ndarray
+    constant_values: np.ndarray
+    output_slots: np.ndarray # [networks * outputs]
+    depths: list[PackedDepth] # evaluated in order, a node only depends on nodes of earlier depths
+
+# pack the compiled plans of networks with the same number of inputs and outputs, nodes are ordered by depth (block-sparse layers)
+def pack_networks(networks: list[FeedForwardNetwork]) -> PackedNetworks:
+    plans = [network.plan if network.plan is not None else network.compile() for network in networks]
+    n_inputs = networks[0].n_inputs if len(networks) > 0 else 0
+    n_outputs = len(networks[0].output_slots) if len(networks) > 0 else 0
+
+    input_slots: list[int] = []
+    constants: list[tuple[int, float]] = []
+    output_slots: list[int] = []
+    step_depths: list[int] = []
+    step_slots: list[int] = []
+    step_activations: list[int] = []
+    step_edges: list[int] = []
+    edge_sources: list[int] = []
+    edge_weights: list[float] = []
+
+    offset = 0
+    for (network, plan) in zip(networks, plans):
+        assert network.n_inputs == n_inputs and len(network.output_slots) == n_outputs, "Networks must have the same number of inputs and outputs"
+
+        # depth of a node is one more than its deepest source (inputs and constants have depth 0)
+        depths = [0] * network.n_slots
+        for (slot, activation, sources, weights) in plan:
+            depth = 1 + max(depths[source] for source in sources) # folded plans never have steps without sources
+            depths[slot] = depth
+            step_depths.append(depth)
+            step_slots.append(offset + slot)
+            step_activations.append(activation)
+            step_edges.append(len(sources))
+            edge_sources += [offset + source for source in sources]
+            edge_weights += weights
+
+        input_slots += range(offset, offset + n_inputs)
+        constants += [(offset + slot, value) for (slot, value) in network.constants]
+        output_slots += [offset + slot for slot in network.output_slots]
+        offset += network.n_slots
+
+    # order nodes (and their edge segments) by depth
+    depths_array = np.array(step_depths, dtype=np.intp)
+    order = np.argsort(depths_array, kind='stable')
+    edge_counts = np.array(step_edges, dtype=np.intp)
+    edge_starts = np.cumsum(edge_counts) - edge_counts
+    counts = edge_counts[order]
+    sorted_starts = np.cumsum(counts) - counts
+    edge_order = np.arange(counts.sum()) + np.repeat(edge_starts[order] - sorted_starts, counts)
+
+    slots = np.array(step_slots, dtype=np.intp)[order]
+    activations = np.array(step_activations, dtype=np.intp)[order]
+    sources = np.array(edge_sources, dtype=np.intp)[edge_order]
+    weights = np.array(edge_weights, dtype=np.float64)[edge_order]
+    sorted_depths = depths_array[order]
+
+    packed_depths: list[PackedDepth] = []
+    node_bounds = np.searchsorted(sorted_depths, np.arange(1, sorted_depths[-1] + 2)) if len(order) > 0 else np.zeros(1, dtype=np.intp)
+    edge_bounds = np.append(sorted_starts, counts.sum())
+    for (start, end) in zip(node_bounds[:-1], node_bounds[1:]):
+        depth_activations = activations[start:end]
+        groups = [(int(activation), np.flatnonzero(depth_activations == activation)) for activation in np.unique(depth_activations)]
+        (edges_start, edges_end) = (edge_bounds[start], edge_bounds[end])
+        packed_depths.append((slots[start:end], edge_bounds[start:end] - edges_start, sources[edges_start:edges_end], weights[edges_start:edges_end], groups))
+
+    return PackedNetworks(
+        n_slots=offset,
+        input_slots=np.array(input_slots, dtype=np.intp),
+        constant_slots=np.array([slot for (slot, _) in constants], dtype=np.intp),
+        constant_values=np.array([value for (_, value) in constants], dtype=np.float64),
+        output_slots=np.array(output_slots, dtype=np.intp),
+        depths=packed_depths,
+    )
+
+# outputs of every network for the same input rows ([batch, inputs] -> [networks, batch, outputs])
+# a generation is evaluated with a few numpy calls per node depth instead of one propagation per network and row
+def propagate_networks(networks: list[FeedForwardNetwork], inputs: np.ndarray) -> np.ndarray:
+    inputs = np.asarray(inputs, dtype=np.float64)
+    assert inputs.ndim == 2, "Given inputs must have shape [batch, number of input nodes]"
+    if len(networks) == 0:
+        return np.zeros((0, inputs.shape[0], 0))
+    assert inputs.shape[1] == networks[0].n_inputs, "Given inputs must have shape [batch, number of input nodes]"
+
+    packed = pack_networks(networks)
+    # slot major values (gathering a slot reads one contiguous row of batch values)
+    values = np.empty((packed.n_slots, inputs.shape[0]))
+    values[packed.input_slots] = np.tile(inputs.T, (len(networks), 1))
+    values[packed.constant_slots] = packed.constant_values[:, None]
+
+    # weighted sums of a depth's incoming edges are reduced per node segment
+    for (slots, starts, sources, weights, groups) in packed.depths:
+        branches_sums = np.add.reduceat(values[sources] * weights[:, None], starts, axis=0)
+        for (activation, positions) in groups:
+            values[slots[positions]] = vectorized_activation_table[activation](branches_sums[positions])
+
+    return values[packed.output_slots].reshape(len(networks), len(networks[0].output_slots), inputs.shape[0]).transpose(0, 2, 1)
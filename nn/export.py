@@ -0,0 +1,98 @@
+from typing import Callable
+import math
+from nn.activations import ActivationFunctions, activation_functions
+from nn.network import FeedForwardNetwork
+
+# inlined activation expressions per activation function code (scalar and numpy batched)
+scalar_expressions = {
+    ActivationFunctions.Linear: "{}",
+    ActivationFunctions.Sigmoid: "sigmoid({})",
+    ActivationFunctions.Tanh: "tanh({})",
+    ActivationFunctions.ReLu: "max(0, {})",
+}
+batch_expressions = {
+    ActivationFunctions.Linear: "{}",
+    ActivationFunctions.Sigmoid: "sigmoid_batch({})",
+    ActivationFunctions.Tanh: "np.tanh({})",
+    ActivationFunctions.ReLu: "np.maximum({}, 0)",
+}
+
+# helpers the generated code depends on (same formulations as nn.activations)
+scalar_helpers = '''from math import exp, tanh
+
+def sigmoid(x):
+    if x >= 0:
+        return 1 / (1 + exp(-x))
+    z = exp(x)
+    return z / (1 + z)
+'''
+batch_helpers = '''import numpy as np
+
+def sigmoid_batch(x):
+    z = np.exp(-np.abs(x))
+    return np.where(x >= 0, 1 / (1 + z), z / (1 + z))
+'''
+
+# python literal of a float (non-finite values have no literal)
+def literal(value: float) -> str:
+    return repr(float(value)) if math.isfinite(value) else f"float('{value}')"
+
+# weighted sum of incoming values in plan order (same summation order as FeedForwardNetwork.propagate)
+def weighted_sum(sources: list[int], weights: list[float]) -> str:
+    return " + ".join(["0.0"] + [f"{literal(weight)} * v{source}" for (source, weight) in zip(sources, weights)])
+
+# straight-line source of a scalar inference function (inputs list -> outputs list)
+def scalar_source(network: FeedForwardNetwork, name: str = "propagate") -> str:
+    plan = network.plan if network.plan is not None else network.compile()
+
+    lines = [f"def {name}(inputs):"]
+    lines.append(f"    assert len(inputs) == {network.n_inputs}, \"Given inputs must match number of input nodes\"")
+    if network.n_inputs > 0:
+        lines.append(f"    ({', '.join(f'v{slot}' for slot in range(network.n_inputs))},) = inputs")
+    for (slot, value) in network.constants:
+        lines.append(f"    v{slot} = {literal(value)}")
+    for (slot, activation, sources, weights) in plan:
+        lines.append(f"    v{slot} = {scalar_expressions[activation_functions[activation]].format(weighted_sum(sources, weights))}")
+    lines.append(f"    return [{', '.join(f'v{slot}' for slot in network.output_slots)}]")
+    return "\n".join(lines) + "\n"
+
+# straight-line source of a numpy batched inference function ([batch, inputs] -> [batch, outputs])
+def batch_source(network: FeedForwardNetwork, name: str = "propagate_batch") -> str:
+    plan = network.plan if network.plan is not None else network.compile()
+
+    lines = [f"def {name}(inputs):"]
+    lines.append("    inputs = np.asarray(inputs, dtype=np.float64)")
+    lines.append(f"    assert inputs.ndim == 2 and inputs.shape[1] == {network.n_inputs}, \"Given inputs must have shape [batch, number of input nodes]\"")
+    lines.append("    zeros = np.zeros(inputs.shape[0])")
+    for slot in range(network.n_inputs):
+        lines.append(f"    v{slot} = inputs[:, {slot}]")
+    for (slot, value) in network.constants:
+        lines.append(f"    v{slot} = zeros + {literal(value)}")
+    for (slot, activation, sources, weights) in plan:
+        lines.append(f"    v{slot} = {batch_expressions[activation_functions[activation]].format('zeros + ' + weighted_sum(sources, weights))}")
+    if len(network.output_slots) > 0:
+        lines.append(f"    return np.stack([{', '.join(f'v{slot}' for slot in network.output_slots)}], axis=1)")
+    else:
+        lines.append("    return np.zeros((inputs.shape[0], 0))")
+    return "\n".join(lines) + "\n"
+
+# standalone module source (only imports math, and numpy if batched) with propagate and optionally propagate_batch
+def export_source(network: FeedForwardNetwork, batch: bool = True) -> str:
+    sections = ["# generated inference module for an evolved network (standalone, don't edit)\n", scalar_helpers]
+    if batch:
+        sections.append(batch_helpers)
+    sections.append(scalar_source(network))
+    if batch:
+        sections.append(batch_source(network))
+    return "\n".join(sections)
+
+# compile the generated module and return its inference function (batch -> numpy batched variant)
+def export_function(network: FeedForwardNetwork, batch: bool = False) -> Callable:
+    namespace: dict = {}
+    exec(compile(export_source(network, batch=batch), f"<exported network {id(network)}>", "exec"), namespace)
+    return namespace["propagate_batch" if batch else "propagate"]
+
+# write the generated module to a file (importable without this package)
+def export_module(network: FeedForwardNetwork, path: str, batch: bool = True):
+    with open(path, 'w') as stream:
+        stream.write(export_source(network, batch=batch))
@@ -1,69 +1,327 @@
+from typing import Optional, TypedDict
+import threading
+import numpy as np
 from genetics.genes import NodeGene, ConnectionGene, NodeType
+from nn.activations import activation_table, vectorized_activation_table
+
+# network graph by node id: (activation code per node id, output node ids, enabled edges (start id, end id, weight))
+NetworkGraph = tuple[dict[int, int], list[int], list[tuple[int, int, float]]]
+
+# compiled evaluation step: (value slot, activation code, incoming value slots, incoming weights)
+PlanStep = tuple[int, int, list[int], list[float]]
+
+# compiled batch layer: (source value slots, weights [sources, layer nodes], activation groups (activation code, layer columns, value slots))
+PlanLayer = tuple[np.ndarray, np.ndarray, list[tuple[int, np.ndarray, np.ndarray]]]
+
+# structure removed from a network by pruning
+PruningStats = TypedDict('PruningStats', {
+    "nodes": int, # nodes in the unpruned graph (genome nodes and connection end points)
+    "connections": int, # enabled connections in the unpruned graph
+    "disabled_connections": int, # connection genes that were never part of the graph
+    "pruned_nodes": int, # nodes without a path to an output
+    "pruned_connections": int # enabled connections without a path to an output
+})
+
+# graph of nodes and their enabled connections (nodes are identified by id, listed nodes take priority over connection end points)
+def build_graph(nodes: list[NodeGene], connections: list[ConnectionGene]) -> NetworkGraph:
+    enabled_connections = [c for c in connections if c.enabled]
+
+    activations: dict[int, int] = {}
+    for connection in enabled_connections:
+        activations.setdefault(connection.start.id, connection.start.activation_code)
+        activations.setdefault(connection.end.id, connection.end.activation_code)
+    activations.update({node.id: node.activation_code for node in nodes})
+
+    output_ids = [node.id for node in nodes if node.type == NodeType.OUTPUT]
+    edges = [(c.start.id, c.end.id, c.weight) for c in enabled_connections]
+
+    return (activations, output_ids, edges)
 
 # organism phenotype
 class FeedForwardNetwork:
-    # store nodes and connections for propagation
-    def __init__(self, n_inputs: int, nodes: list[NodeGene], connections: list[ConnectionGene]) -> None:
+    compilations = 0 # number of execution plans compiled in this process (for metrics)
+    weight_updates = 0 # number of compiled plans patched with new weights instead of recompiled (for metrics)
+
+    # build the graph of nodes and connections for propagation (or use a prebuilt graph, e.g. from packed genome arrays)
+    # prune -> drop structure that can't affect the outputs before compiling
+    def __init__(self, n_inputs: int, nodes: Optional[list[NodeGene]] = None, connections: Optional[list[ConnectionGene]] = None, graph: Optional[NetworkGraph] = None, prune: bool = False, disabled_connections: int = 0) -> None:
         self.n_inputs = n_inputs
-        self.nodes = nodes
-        self.enabled_connections = [c for c in connections if c.enabled]
-    
-    # recursively compute output values
+        self.graph = graph if graph is not None else build_graph(nodes if nodes is not None else [], connections if connections is not None else [])
+        self.disabled_connections = len(connections) - len(self.graph[2]) if connections is not None else disabled_connections
+
+        # position of every graph edge in the unpruned edge list (weights are updated by unpruned position)
+        self.edge_indices = list(range(len(self.graph[2])))
+
+        # execution plan (compiled on first propagation and cached)
+        self.plan: Optional[list[PlanStep]] = None
+        self.layers: Optional[list[PlanLayer]] = None
+        self.output_slots: list[int] = []
+        self.n_slots = n_inputs
+
+        # nodes that don't depend on the inputs are evaluated once while compiling, their slots are filled before every propagation
+        self.constants: list[tuple[int, float]] = [] # (value slot, value)
+        self.initial_values: list[float] = [0.0] * n_inputs
+
+        # where each edge's weight lives in the compiled plan and layers (edges feeding constant nodes need a recompile)
+        self.edge_steps: dict[int, tuple[int, int]] = {} # edge -> (plan step, position)
+        self.constant_edges: set[int] = set()
+        self.edge_cells: dict[int, tuple[int, int, int]] = {} # edge -> (layer, row, column)
+        self.cell_edges: dict[tuple[int, int, int], list[int]] = {} # (layer, row, column) -> edges summed into the cell
+
+        self.pruning: Optional[PruningStats] = self.prune() if prune else None
+
+        # per-thread scratch buffer for node values (genes never hold evaluation state)
+        self.scratch = threading.local()
+
+    # evaluate the compiled plan (inputs occupy the first slots, every other node is computed in topological order)
     def propagate(self, inputs: list[float]) -> list[float]:
 
         # check if correct number of given inputs
         assert len(inputs) == self.n_inputs, "Given inputs must match number of input nodes"
 
-        # clear all node values before computation
-        self.__clear_nodes()
+        plan = self.plan if self.plan is not None else self.compile()
+
+        # every slot is written before it is read (constant slots are never overwritten), so the buffer is reused without clearing
+        values: Optional[list[float]] = getattr(self.scratch, 'values', None)
+        if values is None or getattr(self.scratch, 'initial_values', None) is not self.initial_values:
+            values = self.initial_values.copy()
+            self.scratch.values = values
+            self.scratch.initial_values = self.initial_values
+        values[:self.n_inputs] = inputs
+
+        # compute weighted sum of incoming values and activate (sources are always computed before their targets)
+        table = activation_table
+        for (slot, activation, sources, weights) in plan:
+            branches_sum = 0.0
+            for (source, weight) in zip(sources, weights):
+                branches_sum += weight * values[source]
+            values[slot] = table[activation](branches_sum)
+
+        return [values[slot] for slot in self.output_slots]
+
+    # evaluate many input rows at once ([batch, inputs] -> [batch, outputs]), one vectorized weighted sum per layer
+    def propagate_batch(self, inputs: np.ndarray) -> np.ndarray:
+        inputs = np.asarray(inputs, dtype=np.float64)
+
+        # check if correct shape of given inputs
+        assert inputs.ndim == 2 and inputs.shape[1] == self.n_inputs, "Given inputs must have shape [batch, number of input nodes]"
+
+        layers = self.layers if self.layers is not None else self.compile_batch()
+
+        values = np.empty((inputs.shape[0], self.n_slots))
+        values[:, :self.n_inputs] = inputs
+        for (slot, value) in self.constants:
+            values[:, slot] = value
+
+        # every node in a layer only depends on earlier layers
+        for (sources, weights, groups) in layers:
+            branches_sums = values[:, sources] @ weights
+            for (activation, columns, slots) in groups:
+                values[:, slots] = vectorized_activation_table[activation](branches_sums[:, columns])
+
+        return values[:, self.output_slots]
+
+    # restrict the graph to nodes and connections with a path to an output (inputs and outputs are always kept)
+    def prune(self) -> PruningStats:
+        (activations, output_ids, edges) = self.graph
 
-        # assign given values to input nodes
-        for (index, input) in enumerate(inputs):
-            for node in self.nodes:
-                if node.id == index:
-                    node.activate(input)
+        incoming: dict[int, list[int]] = {}
+        for (start, end, _) in edges:
+            incoming.setdefault(end, []).append(start)
 
-        outputs = []
- 
-        # compute the value of each output node
-        for node in self.nodes:
-            if node.type == NodeType.OUTPUT:
-                self.__compute_root(node=node)
-                outputs.append(node.value)
+        # nodes an output can be reached from
+        live = set(output_ids)
+        stack = list(output_ids)
+        while stack:
+            for start in incoming.get(stack.pop(), []):
+                if start not in live:
+                    live.add(start)
+                    stack.append(start)
+        live.update(node_id for node_id in activations if node_id < self.n_inputs)
 
-        return outputs
+        self.edge_indices = [index for (index, edge) in zip(self.edge_indices, edges) if edge[1] in live]
+        live_edges = [edge for edge in edges if edge[1] in live]
+        self.graph = ({node_id: activation for (node_id, activation) in activations.items() if node_id in live}, output_ids, live_edges)
 
-    # compute the activated value of a root (node)
-    def __compute_root(self, node: NodeGene):
+        return {
+            "nodes": len(activations),
+            "connections": len(edges),
+            "disabled_connections": self.disabled_connections,
+            "pruned_nodes": len(activations) - len(self.graph[0]),
+            "pruned_connections": len(edges) - len(live_edges)
+        }
 
-        # if the node has a value -> terminate recursion
-        if node.value is not None:
+    # topologically sort the enabled graph reachable from the outputs and build per-node incoming adjacency
+    def compile(self) -> list[PlanStep]:
+        (activations, output_ids, edges) = self.graph
+
+        # incoming edges (by index) of every node
+        incoming: dict[int, list[int]] = {}
+        for (edge, (_, end, _)) in enumerate(edges):
+            incoming.setdefault(end, []).append(edge)
+
+        # input values are assigned by id, so input ids map directly onto the first slots
+        slots: dict[int, int] = {node_id: node_id for node_id in activations if node_id < self.n_inputs}
+        order: list[int] = []
+
+        # connections that would close a cycle (e.g. self loops from colliding node ids) can't be fed forward -> skipped
+        recurrent: set[int] = set() # edge indices
+
+        # iterative depth first search from every output (post-order -> topological order)
+        visiting: set[int] = set()
+        for output_id in output_ids:
+            if output_id in slots:
+                continue
+            stack: list[tuple[int, int]] = [(output_id, 0)]
+            visiting.add(output_id)
+            while stack:
+                (node_id, branch) = stack[-1]
+                branches = incoming.get(node_id, [])
+                if branch < len(branches):
+                    stack[-1] = (node_id, branch + 1)
+                    start_id = edges[branches[branch]][0]
+                    if start_id in slots:
+                        continue
+                    if start_id in visiting:
+                        recurrent.add(branches[branch])
+                        continue
+                    visiting.add(start_id)
+                    stack.append((start_id, 0))
+                else:
+                    stack.pop()
+                    visiting.remove(node_id)
+                    slots[node_id] = self.n_inputs + len(order)
+                    order.append(node_id)
+
+        # nodes whose sources are all constant (e.g. hidden nodes without a path from an input) are folded into their value
+        plan: list[PlanStep] = []
+        initial_values = [0.0] * (self.n_inputs + len(order))
+        constants: list[tuple[int, float]] = []
+        constant_slots: set[int] = set()
+        edge_steps: dict[int, tuple[int, int]] = {}
+        constant_edges: set[int] = set()
+        for node_id in order:
+            branch_edges = [edge for edge in incoming.get(node_id, []) if edge not in recurrent]
+            step: PlanStep = (slots[node_id], activations[node_id], [slots[edges[edge][0]] for edge in branch_edges], [edges[edge][2] for edge in branch_edges])
+            (slot, activation, sources, weights) = step
+            if all(source in constant_slots for source in sources):
+                branches_sum = 0.0
+                for (source, weight) in zip(sources, weights):
+                    branches_sum += weight * initial_values[source]
+                initial_values[slot] = activation_table[activation](branches_sum)
+                constants.append((slot, initial_values[slot]))
+                constant_slots.add(slot)
+                constant_edges.update(branch_edges)
+            else:
+                edge_steps.update((edge, (len(plan), position)) for (position, edge) in enumerate(branch_edges))
+                plan.append(step)
+
+        # publish the plan last so concurrent propagations never see a partially compiled network
+        self.output_slots = [slots[id] for id in output_ids]
+        self.n_slots = self.n_inputs + len(order)
+        self.constants = constants
+        self.initial_values = initial_values
+        self.edge_steps = edge_steps
+        self.constant_edges = constant_edges
+        self.layers = None
+        self.plan = plan
+        FeedForwardNetwork.compilations += 1
+        return plan
+
+    # group the compiled plan into layers by depth and build dense per-layer weight matrices
+    def compile_batch(self) -> list[PlanLayer]:
+        plan = self.plan if self.plan is not None else self.compile()
+
+        # depth of a node is one more than its deepest source (inputs have depth 0)
+        depths = [0] * self.n_slots
+        layer_steps: list[list[PlanStep]] = []
+        for step in plan:
+            (slot, _, sources, _) = step
+            depth = 1 + max((depths[source] for source in sources), default=0)
+            depths[slot] = depth
+            while len(layer_steps) < depth:
+                layer_steps.append([])
+            layer_steps[depth - 1].append(step)
+
+        # plan position of every step (edges are mapped onto layer weight cells through it)
+        step_edges: dict[tuple[int, int], int] = {position: edge for (edge, position) in self.edge_steps.items()}
+        step_index = {id(step): index for (index, step) in enumerate(plan)}
+        edge_cells: dict[int, tuple[int, int, int]] = {}
+        cell_edges: dict[tuple[int, int, int], list[int]] = {}
+
+        layers: list[PlanLayer] = []
+        for steps in layer_steps:
+            if len(steps) == 0:
+                continue
+
+            # only gather the value slots this layer reads from
+            layer_sources = sorted({source for (_, _, sources, _) in steps for source in sources})
+            rows = {source: row for (row, source) in enumerate(layer_sources)}
+            weights = np.zeros((len(layer_sources), len(steps)))
+
+            # group layer columns by activation function so each group is activated with one call
+            groups: dict[int, tuple[list[int], list[int]]] = {}
+            for (column, step) in enumerate(steps):
+                (slot, activation, sources, step_weights) = step
+                for (position, (source, weight)) in enumerate(zip(sources, step_weights)):
+                    weights[rows[source], column] += weight
+                    edge = step_edges[(step_index[id(step)], position)]
+                    cell = (len(layers), rows[source], column)
+                    edge_cells[edge] = cell
+                    cell_edges.setdefault(cell, []).append(edge)
+                (columns, slots) = groups.setdefault(activation, ([], []))
+                columns.append(column)
+                slots.append(slot)
+
+            layers.append((np.array(layer_sources, dtype=np.intp), weights, [(activation, np.array(columns, dtype=np.intp), np.array(slots, dtype=np.intp)) for (activation, (columns, slots)) in groups.items()]))
+
+        self.edge_cells = edge_cells
+        self.cell_edges = cell_edges
+        self.layers = layers
+        return layers
+
+    # set new weights of the unpruned edges (same topology) -> patch the compiled plan and layers in place instead of recompiling
+    def update_weights(self, weights: list[float]):
+        (activations, output_ids, edges) = self.graph
+        changed = [edge for (edge, index) in enumerate(self.edge_indices) if edges[edge][2] != weights[index]]
+        if len(changed) == 0:
+            return
+
+        edges = edges.copy()
+        for edge in changed:
+            (start, end, _) = edges[edge]
+            edges[edge] = (start, end, weights[self.edge_indices[edge]])
+        self.graph = (activations, output_ids, edges)
+
+        if self.plan is None:
+            return
+
+        # folded constants depend on the changed weights -> recompile
+        if any(edge in self.constant_edges for edge in changed):
+            self.compile()
             return
-        
-        # list of branches to compute value for activation
-        branches: list[ConnectionGene] = []
-
-        # find all immediate branches of root (children)
-        for connection in self.enabled_connections:
-            if connection.end == node:
-                branches.append(connection)
-
-        # the sum of all branch start nodes and their connection weights
-        branches_sum = 0.0
-
-        # compute branch sum recursively
-        for branch in branches:
-            # compute the value of this branches start node value
-            self.__compute_root(branch.start)
-
-            # ensure branch value isn't None and compute product of weight and previous activation
-            assert branch.start.value is not None, "branch start node value shouldn't be None"
-            branches_sum += branch.weight * branch.start.value
-
-        # get computed activation value for this node
-        node.activate(branches_sum)
-
-    # clear the values for every node
-    def __clear_nodes(self):
-        for node in self.nodes:
-            node.clear()
\ No newline at end of file
+
+        for edge in changed:
+            position = self.edge_steps.get(edge)
+            if position is not None:
+                self.plan[position[0]][3][position[1]] = edges[edge][2]
+
+        # layer cells are re-summed from their edges in compile order
+        if self.layers is not None:
+            for cell in {self.edge_cells[edge] for edge in changed if edge in self.edge_cells}:
+                weight = 0.0
+                for edge in self.cell_edges[cell]:
+                    weight += edges[edge][2]
+                self.layers[cell[0]][1][cell[1], cell[2]] = weight
+
+        FeedForwardNetwork.weight_updates += 1
+
+    # scratch buffers are per process, don't pickle them
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['scratch']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.scratch = threading.local()
@@ -1,15 +1,41 @@
 import unittest
+from typing import Optional
+import os
+import random
+import tempfile
+import json
+import subprocess
+import sys
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from uuid import uuid4
 from config.configuration import Configuration
-from genetics.organism import Organism
-from genetics.genes import NodeGene, ConnectionGene, NodeType
+from genetics.organism import Organism, Mutation
+from genetics.genes import NodeGene, ConnectionGene, NodeType, decode_genome
+from genetics.innovations import InnovationRegistry
+from genetics.population import Population
+from genetics.evaluation import Evaluator, EvaluationBackend, FitnessCache, BatchFitness
+from genetics.metrics import Metrics
+from genetics.store import GenomeStore
+from genetics.shared import SharedGenomes
+from genetics.species import Species
+from genetics.reproduction import crossover_genomes, draw_mutations, draw_tournaments
+from genetics.islands import IslandRunner, MigrationTopology
+from genetics.streams import RandomStreams
+from genetics.novelty import BehaviourIndex, NoveltySearch, NoveltyMode, ArchiveEviction
+from benchmarks.suite import BenchmarkResult, regressions
 from nn.activations import ActivationFunction, ActivationFunctions
+from nn.network import FeedForwardNetwork
+from nn.batch import propagate_networks
+from nn.export import export_function, export_module
 
 # feedforward network test cases
 class TestNetwork(unittest.TestCase):
     def __init__(self, methodName: str = "runTest") -> None:
         pop_config = Configuration("./config/pop1.yaml").get()
+        innovations = InnovationRegistry()
         reLu = ActivationFunction(ActivationFunctions.ReLu)
         sigmoid = ActivationFunction(ActivationFunctions.Sigmoid)
 
@@ -25,18 +51,18 @@ class TestNetwork(unittest.TestCase):
         ]
 
         genome = [
-            ConnectionGene(population_name='test', nodes=self.nodes, weight=2, start=self.nodes[0], end=self.nodes[6]),
-            ConnectionGene(population_name='test', nodes=self.nodes, weight=1, start=self.nodes[1], end=self.nodes[6]),
-            ConnectionGene(population_name='test', nodes=self.nodes, weight=0.4, start=self.nodes[2], end=self.nodes[7]),
-            ConnectionGene(population_name='test', nodes=self.nodes, weight=0.2, start=self.nodes[2], end=self.nodes[5], enabled=False),
-            ConnectionGene(population_name='test', nodes=self.nodes, weight=1.3, start=self.nodes[1], end=self.nodes[3], enabled=False),
-            ConnectionGene(population_name='test', nodes=self.nodes, weight=1, start=self.nodes[7], end=self.nodes[3]),
-            ConnectionGene(population_name='test', nodes=self.nodes, weight=2, start=self.nodes[7], end=self.nodes[4]),
-            ConnectionGene(population_name='test', nodes=self.nodes, weight=0.6, start=self.nodes[6], end=self.nodes[5]),
-            ConnectionGene(population_name='test', nodes=self.nodes, weight=0.1, start=self.nodes[6], end=self.nodes[4])
+            ConnectionGene(innovations=innovations, nodes=self.nodes, weight=2, start=self.nodes[0], end=self.nodes[6]),
+            ConnectionGene(innovations=innovations, nodes=self.nodes, weight=1, start=self.nodes[1], end=self.nodes[6]),
+            ConnectionGene(innovations=innovations, nodes=self.nodes, weight=0.4, start=self.nodes[2], end=self.nodes[7]),
+            ConnectionGene(innovations=innovations, nodes=self.nodes, weight=0.2, start=self.nodes[2], end=self.nodes[5], enabled=False),
+            ConnectionGene(innovations=innovations, nodes=self.nodes, weight=1.3, start=self.nodes[1], end=self.nodes[3], enabled=False),
+            ConnectionGene(innovations=innovations, nodes=self.nodes, weight=1, start=self.nodes[7], end=self.nodes[3]),
+            ConnectionGene(innovations=innovations, nodes=self.nodes, weight=2, start=self.nodes[7], end=self.nodes[4]),
+            ConnectionGene(innovations=innovations, nodes=self.nodes, weight=0.6, start=self.nodes[6], end=self.nodes[5]),
+            ConnectionGene(innovations=innovations, nodes=self.nodes, weight=0.1, start=self.nodes[6], end=self.nodes[4])
         ]
 
-        self.organism = Organism(species_id=uuid4(), config=pop_config, genome=genome,nodes=self.nodes)
+        self.organism = Organism(species_id=uuid4(), config=pop_config, innovations=innovations, genome=genome,nodes=self.nodes)
 
         self.inputs = [0.2, 1.4, 0.7]
         i0, i1, i2 = self.inputs[0], self.inputs[1], self.inputs[2]
@@ -57,6 +83,982 @@ class TestNetwork(unittest.TestCase):
         outputs = self.organism.phenotype().propagate(inputs=self.inputs)
         np.testing.assert_array_equal(self.expected, outputs, "Expected outputs do not match computed outputs")
 
+    # batched propagation matches row by row propagation
+    def test_propagate_batch(self):
+        network = self.organism.phenotype()
+        inputs = np.array([self.inputs, [-3.0, 0.5, 2.0], [0.0, 0.0, 0.0], [800.0, -900.0, 1.0]])
+        expected = [network.propagate(inputs=list(row)) for row in inputs]
+        np.testing.assert_allclose(network.propagate_batch(inputs), expected, rtol=1e-12)
+
+    # scalar and vectorized activation functions agree (sigmoid is stable for large magnitudes)
+    def test_vectorized_activations(self):
+        x = np.array([-1000.0, -3.5, -0.2, 0.0, 0.7, 4.0, 1000.0])
+        for function in ActivationFunctions:
+            activation = ActivationFunction(function)
+            np.testing.assert_allclose(activation.vectorized(x), [activation(v) for v in x], rtol=1e-12)
+
+    # one network (and its shared genes) can be evaluated concurrently without interference
+    def test_propagate_concurrently(self):
+        network = self.organism.phenotype()
+        rows = [[i * 0.1, -i * 0.2, i * 0.05] for i in range(200)]
+        expected = [network.propagate(inputs=row) for row in rows]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            outputs = list(executor.map(lambda row: network.propagate(inputs=row), rows))
+        self.assertEqual(outputs, expected)
+
+    # connections closing a cycle (self loops from colliding node ids) are skipped
+    def test_propagate_skips_cycles(self):
+        innovations = InnovationRegistry()
+        linear = ActivationFunction(ActivationFunctions.Linear)
+        nodes = [NodeGene(id=0, type=NodeType.INPUT), NodeGene(id=1, type=NodeType.OUTPUT, activation=linear), NodeGene(id=2, activation=linear)]
+        connections = [
+            ConnectionGene(innovations=innovations, weight=2, start=nodes[0], end=nodes[2]),
+            ConnectionGene(innovations=innovations, weight=5, start=NodeGene(id=2, activation=linear), end=nodes[2]),
+            ConnectionGene(innovations=innovations, weight=3, start=nodes[2], end=nodes[1])
+        ]
+        network = FeedForwardNetwork(n_inputs=1, nodes=nodes, connections=connections)
+        self.assertEqual(network.propagate([1.0]), [6.0])
+
+    # deep networks are evaluated without recursion and the compiled plan is reused
+    def test_propagate_deep_chain(self):
+        innovations = InnovationRegistry()
+        linear = ActivationFunction(ActivationFunctions.Linear)
+        nodes = [NodeGene(id=0, type=NodeType.INPUT), NodeGene(id=1, type=NodeType.OUTPUT, activation=linear)]
+        nodes += [NodeGene(id=id, type=NodeType.HIDDEN, activation=linear) for id in range(2, 3002)]
+        chain = [nodes[0]] + nodes[2:] + [nodes[1]]
+        connections = [ConnectionGene(innovations=innovations, weight=1, start=start, end=end) for (start, end) in zip(chain[:-1], chain[1:])]
+
+        network = FeedForwardNetwork(n_inputs=1, nodes=nodes, connections=connections)
+        self.assertEqual(network.propagate([0.5]), [0.5])
+        plan = network.plan
+        self.assertEqual(network.propagate([2.0]), [2.0])
+        self.assertIs(network.plan, plan)
+
+    # structure without a path to an output is pruned, input independent nodes are folded into constants
+    def test_pruning(self):
+        innovations = InnovationRegistry()
+        linear = ActivationFunction(ActivationFunctions.Linear)
+        sigmoid = ActivationFunction(ActivationFunctions.Sigmoid)
+        nodes = [NodeGene(id=0, type=NodeType.INPUT), NodeGene(id=1, type=NodeType.OUTPUT, activation=linear), NodeGene(id=2, activation=linear), NodeGene(id=3, activation=sigmoid), NodeGene(id=4, activation=linear)]
+        connections = [
+            ConnectionGene(innovations=innovations, weight=2, start=nodes[0], end=nodes[1]),
+            ConnectionGene(innovations=innovations, weight=3, start=nodes[0], end=nodes[2]), # dead end
+            ConnectionGene(innovations=innovations, weight=4, start=nodes[3], end=nodes[1]), # constant sigmoid(0)
+            ConnectionGene(innovations=innovations, weight=5, start=nodes[4], end=nodes[1], enabled=False)
+        ]
+        network = FeedForwardNetwork(n_inputs=1, nodes=nodes, connections=connections, prune=True)
+
+        self.assertEqual(network.pruning, {"nodes": 5, "connections": 3, "disabled_connections": 1, "pruned_nodes": 2, "pruned_connections": 1})
+        self.assertEqual(network.propagate([1.0]), [2.0 + 4 * 0.5])
+        self.assertEqual(len(network.plan), 1)
+        self.assertEqual([value for (_, value) in network.constants], [0.5])
+        np.testing.assert_allclose(network.propagate_batch(np.array([[1.0], [-1.0]])), [[4.0], [0.0]])
+
+    # pruned phenotypes of evolved genomes give the same outputs as unpruned networks
+    def test_pruning_keeps_outputs(self):
+        random.seed(29)
+        population = Population(Configuration("./config/pop2.yaml").get(), network_fitness, innovations=InnovationRegistry())
+        for _ in range(30):
+            population.evolve()
+
+        for organism in (organism for species in population.species for organism in species.organisms):
+            pruned = organism.phenotype()
+            unpruned = FeedForwardNetwork(n_inputs=3, nodes=organism.nodes, connections=organism.genome)
+            for row in ([0.5, -0.25, 1.0], [-2.0, 0.0, 3.0]):
+                self.assertEqual(pruned.propagate(row), unpruned.propagate(row))
+            self.assertLessEqual(len(pruned.plan), len(unpruned.plan))
+
+# deterministic fitness (module level so process workers can unpickle it)
+def network_fitness(organism: 'Organism') -> float:
+    outputs = organism.phenotype().propagate(inputs=[0.5, -0.25, 1.0])
+    return 1 + sum(outputs) + 0.01 * organism.genome_size()
+
+# network fitness with noise from the global random stream (evaluating an organism again changes the rest of the run)
+def noisy_network_fitness(organism: 'Organism') -> float:
+    return network_fitness(organism) + random.uniform(0, 0.01)
+
+# parallel evaluation test cases
+class TestEvaluation(unittest.TestCase):
+    # run a few generations from a fixed seed and collect every organism's fitness
+    def evolve(self, evaluator: 'Evaluator') -> list[float]:
+        random.seed(7)
+        config = Configuration("./config/pop1.yaml").get()
+        with evaluator:
+            population = Population(config, network_fitness, innovations=InnovationRegistry(), evaluator=evaluator)
+            for _ in range(4):
+                population.evolve()
+            population.compute_population_fitness()
+        return [organism.fitness for species in population.species for organism in species.organisms]
+
+    # thread and process pools reproduce the serial results regardless of worker count
+    def test_backends_match_serial(self):
+        expected = self.evolve(Evaluator())
+        self.assertEqual(self.evolve(Evaluator(EvaluationBackend.THREAD, workers=3)), expected)
+        self.assertEqual(self.evolve(Evaluator(EvaluationBackend.PROCESS, workers=2, chunk_size=3)), expected)
+        self.assertEqual(self.evolve(Evaluator(EvaluationBackend.SHARED_MEMORY, workers=2, chunk_size=3)), expected)
+
+    # best and top evaluate offspring on demand, the next generation doesn't evaluate them again
+    def test_best_evaluates_offspring(self):
+        random.seed(11)
+        evaluated: list['Organism'] = []
+        def fitness(organism: 'Organism') -> float:
+            evaluated.append(organism)
+            return network_fitness(organism)
+
+        population = Population(Configuration("./config/pop1.yaml").get(), fitness, innovations=InnovationRegistry())
+        population.evolve()
+        evaluated.clear()
+        best = population.best()
+        self.assertEqual(best.fitness, max(network_fitness(organism) for organism in evaluated))
+        self.assertEqual(population.top(3)[0], best)
+
+        evaluations = len(evaluated)
+        population.evolve()
+        self.assertEqual(len(evaluated), evaluations)
+
+    # organisms read from a shared buffer have the published genomes, fitness and species
+    def test_shared_genomes(self):
+        config = Configuration("./config/pop1.yaml").get()
+        population = Population(config, network_fitness, innovations=InnovationRegistry())
+        population.compute_population_fitness()
+        organisms = [organism for species in population.species for organism in species.organisms]
+
+        genomes = SharedGenomes.publish(organisms)
+        attached = SharedGenomes.attach(genomes.name, genomes.layout)
+        try:
+            for (index, organism) in enumerate(organisms):
+                shared = attached.organism(index, config)
+                self.assertEqual(shared.records(), organism.records())
+                self.assertEqual((shared.species_id, shared.fitness), (organism.species_id, organism.fitness))
+                self.assertEqual(shared.phenotype().propagate([0.5, -0.25, 1.0]), organism.phenotype().propagate([0.5, -0.25, 1.0]))
+            del shared # views keep the buffer exported
+        finally:
+            attached.close()
+            genomes.close()
+
+# local stand-in for an external simulator: replies to a line of comma separated values with 1 + their sum after a delay
+class Simulator:
+    def __init__(self, delay: float = 0.01) -> None:
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0 # most connections handled at the same time
+
+        self.handlers: set[asyncio.Task] = set() # open connections
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(asyncio.start_server(self.handle, '127.0.0.1', 0), self.loop).result()
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        handler = asyncio.current_task()
+        assert handler is not None
+        self.handlers.add(handler)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            values = [float(value) for value in (await reader.readline()).split(b',')]
+            await asyncio.sleep(self.delay)
+            writer.write(f"{1 + sum(values)!r}\n".encode())
+            await writer.drain()
+        finally:
+            self.active -= 1
+            self.handlers.discard(handler)
+            writer.close()
+            await writer.wait_closed()
+
+    # async fitness function evaluating network outputs on the simulator
+    async def fitness(self, organism: 'Organism') -> float:
+        outputs = organism.phenotype().propagate(inputs=[0.5, -0.25, 1.0])
+        (reader, writer) = await asyncio.open_connection('127.0.0.1', self.port)
+        try:
+            writer.write((",".join(repr(value) for value in outputs + [0.01 * organism.genome_size()]) + "\n").encode())
+            return float(await reader.readline())
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    # stop serving, drop open connections (e.g. of timed out evaluations) and close the event loop
+    async def shutdown(self):
+        self.server.close()
+        for handler in list(self.handlers):
+            handler.cancel()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+# async fitness evaluation test cases
+class TestAsyncEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.config = Configuration("./config/pop1.yaml").get()
+
+    # simulated fitness matches the synchronous fitness, with at most the concurrency limit of evaluations in flight
+    def test_async_fitness(self):
+        simulator = Simulator()
+        try:
+            random.seed(7)
+            population = Population(self.config, simulator.fitness, innovations=InnovationRegistry(), evaluator=Evaluator(concurrency=4))
+            population.evolve()
+            population.compute_population_fitness()
+        finally:
+            simulator.close()
+
+        organisms = [organism for species in population.species for organism in species.organisms]
+        for organism in organisms:
+            self.assertAlmostEqual(organism.fitness, network_fitness(organism))
+        self.assertTrue(1 < simulator.max_active <= 4)
+        self.assertEqual(population.metrics.records[0]['counts']['fitness_failures'], 0)
+
+    # a generation evaluated from a coroutine (inside a running event loop) is awaited on a worker thread's loop
+    def test_async_fitness_in_running_loop(self):
+        simulator = Simulator()
+        async def evaluate(population: 'Population'):
+            population.compute_population_fitness()
+
+        try:
+            population = Population(self.config, simulator.fitness, innovations=InnovationRegistry(), evaluator=Evaluator(concurrency=4))
+            asyncio.run(evaluate(population))
+        finally:
+            simulator.close()
+
+        for organism in (organism for species in population.species for organism in species.organisms):
+            self.assertAlmostEqual(organism.fitness, network_fitness(organism))
+
+    # evaluations that time out or raise get the fallback fitness and aren't cached
+    def test_async_failures(self):
+        simulator = Simulator(delay=1.0)
+        async def failing_fitness(organism: 'Organism') -> float:
+            raise ConnectionError("simulator unavailable")
+
+        try:
+            evaluator = Evaluator(concurrency=8, timeout=0.05, fallback_fitness=-1.0)
+            cache = FitnessCache()
+            population = Population(self.config, simulator.fitness, innovations=InnovationRegistry(), evaluator=evaluator, fitness_cache=cache)
+            population.compute_population_fitness()
+        finally:
+            simulator.close()
+
+        organisms = [organism for species in population.species for organism in species.organisms]
+        self.assertTrue(all(organism.fitness == -1.0 for organism in organisms))
+        self.assertEqual(evaluator.timeouts, cache.misses)
+        self.assertEqual(len(cache), 0)
+
+        self.assertEqual(evaluator.evaluate(organisms[:3], failing_fitness, self.config), [-1.0] * 3)
+        self.assertEqual((evaluator.failures, evaluator.failed), (3, [0, 1, 2]))
+
+# population-wide batched evaluation test cases
+class TestBatchEvaluation(unittest.TestCase):
+    inputs = np.array([[0, 0, 1], [0, 1, 1], [1, 0, 1], [1, 1, 1]], dtype=np.float64) # xor table with a bias input
+    targets = np.array([0, 1, 1, 0], dtype=np.float64)
+
+    # negative squared error of the first output over the xor table
+    @classmethod
+    def xor_fitness(cls, outputs: np.ndarray) -> np.ndarray:
+        return 4 - ((outputs[:, :, 0] - cls.targets) ** 2).sum(axis=1)
+
+    # all networks are propagated together with the same outputs as propagating each network row by row
+    def test_propagate_networks(self):
+        random.seed(3)
+        config = Configuration("./config/pop1.yaml").get()
+        population = Population(config, network_fitness, innovations=InnovationRegistry())
+        for _ in range(5):
+            population.evolve()
+        organisms = [organism for species in population.species for organism in species.organisms]
+        networks = [organism.phenotype() for organism in organisms]
+
+        outputs = propagate_networks(networks, self.inputs)
+        self.assertEqual(outputs.shape, (len(networks), len(self.inputs), 1))
+        for (network, network_outputs) in zip(networks, outputs):
+            for (row, row_outputs) in zip(self.inputs, network_outputs):
+                np.testing.assert_allclose(row_outputs, network.propagate(list(row)), rtol=1e-12, atol=1e-12)
+
+        self.assertEqual(propagate_networks([], self.inputs).shape, (0, len(self.inputs), 0))
+
+    # batch fitness scores a generation at once and matches scoring organisms one by one
+    def test_batch_fitness(self):
+        random.seed(3)
+        config = Configuration("./config/pop1.yaml").get()
+        fitness = BatchFitness(self.inputs, self.xor_fitness)
+        population = Population(config, fitness, innovations=InnovationRegistry())
+        for _ in range(3):
+            population.evolve()
+        population.compute_population_fitness()
+
+        for organism in [organism for species in population.species for organism in species.organisms]:
+            outputs = np.array([organism.phenotype().propagate(list(row)) for row in self.inputs])
+            self.assertAlmostEqual(organism.fitness, self.xor_fitness(outputs[None])[0])
+            self.assertAlmostEqual(fitness(organism), organism.fitness)
+
+# fitness cache test cases
+class TestFitnessCache(unittest.TestCase):
+    # identical genomes and repeated generations are only evaluated once
+    def test_cache_skips_identical_genomes(self):
+        calls = []
+        def fitness(organism: 'Organism') -> float:
+            calls.append(organism)
+            return network_fitness(organism)
+
+        config = Configuration("./config/pop1.yaml").get()
+        cache = FitnessCache()
+        population = Population(config, fitness, innovations=InnovationRegistry(), fitness_cache=cache)
+
+        # initial organisms only differ in their output activation functions
+        population.compute_population_fitness()
+        self.assertEqual(len(calls), cache.misses)
+        self.assertEqual(cache.hits + cache.misses, config.get('carrying_capacity'))
+
+        # unchanged generation -> every organism is a cache hit
+        population.compute_population_fitness()
+        self.assertEqual(len(calls), cache.misses)
+        self.assertEqual(cache.hits + cache.misses, 2 * config.get('carrying_capacity'))
+
+    # genomes only differing in the activation of a connection end point missing from the node list aren't identical
+    def test_hash_orphans(self):
+        config = Configuration("./config/pop1.yaml").get()
+        (nodes, _, _) = Organism(species_id=uuid4(), config=config, innovations=InnovationRegistry()).records()
+        (input, output) = (nodes[0][0], nodes[-1][0])
+        connections = [(1, input, 100, 0.5, True), (2, 100, output, -0.5, True)]
+        hashes = set()
+        for activation_code in (0, 1):
+            (genome_nodes, genome) = decode_genome(nodes, [(100, NodeType.HIDDEN.value, activation_code)], connections)
+            organism = Organism(species_id=uuid4(), config=config, innovations=None, genome=genome, nodes=genome_nodes)
+            self.assertEqual(organism.records()[1], [(100, NodeType.HIDDEN.value, activation_code)])
+            hashes.add(organism.genome_hash())
+        self.assertEqual(len(hashes), 2)
+
+# organism genome test cases
+class TestOrganism(unittest.TestCase):
+    # innovation indexed alignment finds the same shared, disjoint and excess genes as a pairwise search
+    def test_gene_distribution_matches_pairwise_search(self):
+        random.seed(3)
+        config = Configuration("./config/pop2.yaml").get()
+        population = Population(config, network_fitness, innovations=InnovationRegistry())
+        for _ in range(15):
+            population.evolve()
+        organisms = [organism for species in population.species for organism in species.organisms]
+
+        for (o1, o2) in zip(organisms, organisms[1:] + organisms[:1]):
+            larger, smaller = (o1, o2) if len(o1.genome) > len(o2.genome) else (o2, o1)
+            largest_innovation = max([c.innovation for c in smaller.genome], default=0)
+            leftovers = smaller.genome.copy()
+            shared, disjoint, excess = [], [], []
+            for c1 in larger.genome:
+                c2 = next((c for c in leftovers if c1 == c), None)
+                if c2 is not None:
+                    shared.append((c1, c2))
+                    leftovers.remove(c1)
+                elif c1.innovation > largest_innovation:
+                    excess.append(c1)
+                else:
+                    disjoint.append(c1)
+
+            _, shared_connections, disjoint_connections, excess_connections = o1.gene_distribution(o2)
+            self.assertEqual(shared_connections, shared)
+            self.assertEqual(disjoint_connections, disjoint + leftovers)
+            self.assertEqual(excess_connections, excess)
+
+    # genes and organisms carry no per-instance dict, node activations are integer codes
+    def test_slotted_genes(self):
+        config = Configuration("./config/pop1.yaml").get()
+        organism = Organism(species_id=uuid4(), config=config, innovations=InnovationRegistry())
+        organism.structurally_mutate_connection()
+        node = NodeGene(id=7, activation=ActivationFunction(ActivationFunctions.Tanh))
+
+        for gene in (organism, organism.genome[0], node):
+            self.assertFalse(hasattr(gene, '__dict__'))
+        self.assertEqual(node.activation.type, ActivationFunctions.Tanh)
+        self.assertEqual(node(0.5), ActivationFunctions.Tanh.value(0.5))
+        self.assertEqual(organism.nodes[0].activation.type, ActivationFunctions.Linear)
+
+    # phenotypes are cached against the genome version, weight mutations patch the compiled network in place
+    def test_phenotype_cache(self):
+        random.seed(31)
+        population = Population(Configuration("./config/pop2.yaml").get(), network_fitness, innovations=InnovationRegistry())
+        for _ in range(20):
+            population.evolve()
+        inputs = np.array([[0.5, -0.25, 1.0], [-2.0, 0.0, 3.0]])
+
+        for organism in (organism for species in population.species for organism in species.organisms if organism.has_connections()):
+            network = organism.phenotype()
+            network.propagate_batch(inputs)
+            self.assertIs(organism.phenotype(), network)
+
+            (compilations, has_constants) = (FeedForwardNetwork.compilations, len(network.constant_edges) > 0)
+            for _ in range(3):
+                organism.mutate_connection()
+            self.assertIs(organism.phenotype(), network)
+            if not has_constants:
+                self.assertEqual(FeedForwardNetwork.compilations, compilations)
+
+            fresh = FeedForwardNetwork(n_inputs=3, nodes=organism.nodes, connections=organism.genome, prune=True)
+            self.assertEqual(network.propagate(list(inputs[0])), fresh.propagate(list(inputs[0])))
+            np.testing.assert_array_equal(network.propagate_batch(inputs), fresh.propagate_batch(inputs))
+
+            organism.structurally_mutate_node()
+            self.assertIsNot(organism.phenotype(), network)
+
+    # offspring share their parents' genes until they mutate, then copy only the genes they change
+    def test_copy_on_write_crossover(self):
+        random.seed(37)
+        population = Population(Configuration("./config/pop2.yaml").get(), network_fitness, innovations=InnovationRegistry())
+        for _ in range(10):
+            population.evolve()
+        organisms = [organism for species in population.species for organism in species.organisms if organism.genome_size() > 2]
+        species = population.species[0]
+
+        for (parent1, parent2) in zip(organisms, organisms[1:]):
+            parents = (parent1.records(), parent2.records())
+            child = species.crossover(parent1, parent2, mutate=False)
+            parent_genes = {id(gene) for organism in (parent1, parent2) for gene in organism.genome + organism.nodes}
+            self.assertTrue(all(id(gene) in parent_genes for gene in child.nodes))
+            self.assertTrue(all(id(gene) in parent_genes or gene.owner == child.token for gene in child.genome)) # copied only to re-point end points
+            listed = {node.id: node for node in child.nodes}
+            self.assertTrue(all(listed.get(node.id, node) is node for connection in child.genome for node in (connection.start, connection.end)))
+
+            for _ in range(5):
+                child.mutate_connection()
+                child.structurally_mutate_node()
+                if child.has_hidden_nodes():
+                    child.mutate_node()
+            self.assertEqual((parent1.records(), parent2.records()), parents)
+            self.assertTrue(all(id(node) in parent_genes for node in child.nodes if node.type == NodeType.INPUT)) # untouched genes are still shared
+
+            # parents copy shared genes as well
+            parent1.mutate_connection()
+            self.assertEqual(child.records(), species.crossover(child, child, mutate=False).records())
+
+    # clones are separate organisms sharing the genome (views stay views), mutating one leaves the others unchanged
+    def test_clone(self):
+        random.seed(41)
+        config = Configuration("./config/pop1.yaml").get()
+        organism = Organism(species_id=uuid4(), config=config, innovations=InnovationRegistry())
+        for _ in range(10):
+            organism.structurally_mutate_node(add=True)
+            organism.structurally_mutate_connection(add=True)
+        records = organism.records()
+        store = GenomeStore.from_organisms([organism])
+
+        for original in (organism, store.organism(0, organism.species_id, config, organism.innovations)):
+            clones = [original.clone() for _ in range(3)]
+            self.assertEqual(len({id(clone) for clone in clones} | {id(original)}), 4)
+            self.assertEqual([clone.is_view() for clone in clones], [original.is_view()] * 3)
+            for clone in clones[:2]:
+                clone.mutate_connection()
+                clone.mutate_node()
+            self.assertEqual(original.records(), records)
+            self.assertEqual(clones[2].records(), records)
+            self.assertNotEqual(clones[0].records(), records)
+
+# speciation test cases
+class TestSpeciation(unittest.TestCase):
+    def setUp(self) -> None:
+        random.seed(5)
+        self.config = Configuration("./config/pop2.yaml").get()
+        self.population = Population(self.config, network_fitness, innovations=InnovationRegistry())
+        for _ in range(15):
+            self.population.evolve()
+        self.organisms = [organism for species in self.population.species for organism in species.organisms]
+
+    # distance matches the gene distribution formula, early exit only happens at or above the limit
+    def test_compatibility(self):
+        for (o1, o2) in zip(self.organisms, self.organisms[1:] + self.organisms[:1]):
+            if len(o1.genome) == 0 and len(o2.genome) == 0:
+                continue
+            _, shared, disjoint, excess = o1.gene_distribution(o2)
+            size = max(len(o1.genome), len(o2.genome))
+            weights = sum(abs(c1.weight - c2.weight) for (c1, c2) in shared) / len(shared) if shared else 0
+            expected = len(excess) / size + len(disjoint) / size + weights
+
+            self.assertAlmostEqual(self.population.compatibility(o1, o2), expected, places=12)
+            limited = self.population.compatibility(o1, o2, limit=0.5)
+            self.assertTrue(limited >= 0.5 if expected >= 0.5 else abs(limited - expected) < 1e-12)
+
+    # every organism is placed once and compared with at most max_compared_species representatives
+    def test_speciate_bounded(self):
+        self.population.compatibility_threshold = 0.8
+        self.population.speciate()
+
+        placed = [organism for species in self.population.species for organism in species.organisms]
+        self.assertCountEqual([id(o) for o in placed], [id(o) for o in self.organisms])
+        self.assertLessEqual(self.population.distance_evaluations, len(self.organisms) * self.config['speciation']['max_compared_species'])
+        for species in self.population.species:
+            self.assertIn(species.representative, species.organisms)
+
+# vectorized compatibility test cases
+class TestCompatibilityMatrix(unittest.TestCase):
+    # bulk distances match pairwise compatibility, with and without blocks
+    def test_matches_pairwise(self):
+        random.seed(11)
+        population = Population(Configuration("./config/pop1.yaml").get(), network_fitness, innovations=InnovationRegistry())
+        for _ in range(20):
+            population.evolve()
+        organisms = [organism for species in population.species for organism in species.organisms]
+
+        expected = [[population.compatibility(o1, o2) for o2 in organisms] for o1 in organisms]
+        np.testing.assert_allclose(population.compatibility_matrix(), expected, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(population.compatibility_matrix(block_size=7), expected, rtol=1e-9, atol=1e-12)
+
+# generation metrics test cases
+class TestMetrics(unittest.TestCase):
+    # every generation produces a structured record that is streamed as jsonl
+    def test_generation_records(self):
+        config = Configuration("./config/pop1.yaml").get()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.jsonl")
+            population = Population(config, network_fitness, innovations=InnovationRegistry(), metrics=Metrics(path=path))
+            for _ in range(3):
+                population.evolve()
+
+            with open(path) as stream:
+                streamed = [json.loads(line) for line in stream]
+
+        self.assertEqual(population.metrics.records, streamed[-1:]) # streamed records aren't all kept in memory
+        self.assertEqual([record['generation'] for record in streamed], [0, 1, 2])
+        record = streamed[0]
+        self.assertEqual(record['counts']['fitness_evaluations'], config['carrying_capacity'])
+        self.assertEqual(record['organisms'], config['carrying_capacity'])
+        self.assertTrue({'fitness', 'speciation', 'adjusted_fitness'} <= record['phases'].keys())
+        self.assertTrue({'best', 'mean'} <= record['fitness'].keys())
+
+    # a window bounds the records kept in memory
+    def test_window(self):
+        metrics = Metrics(window=2)
+        for generation in range(5):
+            metrics.start()
+            metrics.finish(generation)
+        self.assertEqual([record['generation'] for record in metrics.records], [3, 4])
+        self.assertEqual(Metrics().window, None)
+
+    # disabled metrics record nothing
+    def test_disabled(self):
+        population = Population(Configuration("./config/pop1.yaml").get(), network_fitness, innovations=InnovationRegistry(), metrics=Metrics(enabled=False))
+        population.evolve()
+        self.assertEqual(population.metrics.records, [])
+
+# genome store test cases
+class TestGenomeStore(unittest.TestCase):
+    # store views behave like the organisms they were packed from, and only build genes when needed
+    def test_views_match_organisms(self):
+        random.seed(13)
+        config = Configuration("./config/pop2.yaml").get()
+        population = Population(config, network_fitness, innovations=InnovationRegistry())
+        for _ in range(10):
+            population.evolve()
+        organisms = [organism for species in population.species for organism in species.organisms]
+        organisms = list({id(organism): organism for organism in organisms}.values())
+
+        store = GenomeStore.from_organisms(organisms)
+        views = [store.organism(index, organism.species_id, config, population.innovations) for (index, organism) in enumerate(organisms)]
+        self.assertEqual(len(store), len(organisms))
+
+        for (organism, view) in zip(organisms, views):
+            self.assertEqual(view.genome_hash(), organism.genome_hash())
+            self.assertEqual(view.phenotype().propagate([0.5, -0.25, 1.0]), organism.phenotype().propagate([0.5, -0.25, 1.0]))
+        for (v1, v2) in zip(views, views[1:] + views[:1]):
+            self.assertEqual(population.compatibility(v1, v2), population.compatibility(organisms[views.index(v1)], organisms[views.index(v2)]))
+        np.testing.assert_allclose(population.compatibility_matrix(views), population.compatibility_matrix(organisms), rtol=1e-12)
+        self.assertTrue(all(view.is_view() for view in views))
+
+        # gene access materializes an independent copy
+        view = views[0]
+        self.assertEqual([c.record() for c in view.genome], organisms[0].records()[2])
+        self.assertFalse(view.is_view())
+
+    # compact population keeps organisms packed between generations
+    def test_compact_population(self):
+        random.seed(13)
+        population = Population(Configuration("./config/pop1.yaml").get(), network_fitness, innovations=InnovationRegistry(), compact=True)
+        for _ in range(5):
+            population.evolve()
+
+        self.assertIsNotNone(population.store)
+        self.assertTrue(all(organism.is_view() for species in population.species for organism in species.organisms))
+        self.assertGreater(population.metrics.records[-1]['counts']['store_bytes'], 0)
+
+# exported inference function test cases
+class TestExport(unittest.TestCase):
+    def setUp(self) -> None:
+        random.seed(23)
+        population = Population(Configuration("./config/pop2.yaml").get(), network_fitness, innovations=InnovationRegistry())
+        for _ in range(15):
+            population.evolve()
+        population.compute_population_fitness()
+        self.networks = [organism.phenotype() for species in population.species for organism in species.organisms]
+        self.inputs = np.random.default_rng(0).uniform(-2, 2, size=(16, 3))
+
+    # generated functions reproduce the network (scalar exactly, batched up to summation order)
+    def test_matches_network(self):
+        for network in self.networks:
+            propagate = export_function(network)
+            propagate_batch = export_function(network, batch=True)
+            for row in self.inputs.tolist():
+                self.assertEqual(propagate(row), network.propagate(row))
+            np.testing.assert_allclose(propagate_batch(self.inputs), network.propagate_batch(self.inputs), rtol=1e-12, atol=1e-12)
+
+    # saved module runs without this package
+    def test_standalone_module(self):
+        network = max(self.networks, key=lambda network: len(network.graph[2]))
+        with tempfile.TemporaryDirectory() as directory:
+            export_module(network, os.path.join(directory, "champion.py"))
+            script = f"import sys; sys.path.insert(0, {directory!r}); import champion; print(champion.propagate([0.5, -0.25, 1.0])); print('genetics' in sys.modules or 'nn' in sys.modules)"
+            output = subprocess.run([sys.executable, "-I", "-c", script], capture_output=True, text=True, check=True).stdout.splitlines()
+        self.assertEqual(output, [str(network.propagate([0.5, -0.25, 1.0])), "False"])
+
+# checkpoint test cases
+class TestCheckpoint(unittest.TestCase):
+    # genome records and fitness of every organism by species (new species get random uuids, so ids aren't compared)
+    def snapshot(self, population: 'Population') -> list:
+        return [[(organism.records(), organism.fitness) for organism in species.organisms] for species in population.species]
+
+    # a resumed run follows the same trajectory as an uninterrupted one
+    # evaluate -> the generation is evaluated (by best) before it's saved, and isn't evaluated again after resuming
+    def resume(self, compact: bool, mmap: bool, evaluate: bool = False):
+        config = Configuration("./config/pop1.yaml").get()
+        random.seed(17)
+        population = Population(config, noisy_network_fitness, innovations=InnovationRegistry(), compact=compact)
+        for _ in range(5):
+            population.evolve()
+        if evaluate:
+            population.best()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "population.ckpt")
+            population.save(path)
+            for _ in range(5):
+                population.evolve()
+            expected = self.snapshot(population)
+
+            resumed = Population.load(path, noisy_network_fitness, mmap=mmap)
+            self.assertEqual((resumed.generation, resumed.evaluated), (5, evaluate))
+            for _ in range(5):
+                resumed.evolve()
+            self.assertEqual(self.snapshot(resumed), expected)
+            self.assertEqual(resumed.innovations.innovations, population.innovations.innovations)
+            self.assertEqual(resumed.compatibility_threshold, population.compatibility_threshold)
+
+    def test_resume(self):
+        self.resume(compact=False, mmap=False)
+
+    def test_resume_compact_memory_mapped(self):
+        self.resume(compact=True, mmap=True)
+
+    def test_resume_evaluated(self):
+        self.resume(compact=False, mmap=False, evaluate=True)
+        self.resume(compact=True, mmap=True, evaluate=True)
+
+    # other files and versions are rejected
+    def test_invalid_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "population.ckpt")
+            with open(path, 'wb') as stream:
+                stream.write(b'not a checkpoint')
+            with self.assertRaises(ValueError):
+                Population.load(path, network_fitness)
+
+# island model test cases
+class TestIslands(unittest.TestCase):
+    # migrations happen every interval and innovation numbers agree with the global registry on every island
+    def test_innovations_consistent(self):
+        config = Configuration("./config/pop2.yaml").get()
+        for compact in (False, True):
+            runner = IslandRunner([config] * 3, network_fitness, migration_interval=3, migrants=2, topology=MigrationTopology.FULLY_CONNECTED, seed=3, processes=False, compact=compact)
+            runner.run(7)
+
+            self.assertEqual(runner.migrations, 2)
+            self.assertEqual([len(records) for records in runner.metrics], [7, 7, 7])
+            for island in runner.islands:
+                self.assertEqual(island.innovations.innovations, runner.innovations.innovations)
+                for organism in (organism for species in island.population.species for organism in species.organisms):
+                    for (innovation, start, end, _, _) in organism.records()[2]:
+                        self.assertEqual(runner.innovations.innovations[(start, end)], innovation)
+
+    # islands in worker processes
+    def test_processes(self):
+        config = Configuration("./config/pop1.yaml").get()
+        with IslandRunner([config] * 2, network_fitness, migration_interval=2, migrants=1, seed=5) as runner:
+            runner.run(4)
+            best = runner.best()
+        self.assertEqual(runner.migrations, 2)
+        self.assertEqual([len(records) for records in runner.metrics], [4, 4])
+        self.assertGreater(best.fitness, 0)
+
+    # migrants must fit every island
+    def test_mismatched_configs(self):
+        with self.assertRaises(ValueError):
+            IslandRunner([Configuration("./config/pop1.yaml").get(), Configuration("./config/pop2.yaml").get()], network_fitness, processes=False)
+
+# innovation registry test cases
+class TestInnovationRegistry(unittest.TestCase):
+    # same connection -> same innovation, new connection -> next innovation
+    def test_assignment(self):
+        registry = InnovationRegistry()
+        self.assertEqual(registry.get(0, 4), 0)
+        self.assertEqual(registry.get(1, 4), 1)
+        self.assertEqual(registry.get(0, 4), 0)
+        self.assertEqual(len(registry), 2)
+
+    # persisted registry can be reloaded to resume
+    def test_persist_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test-db.json")
+            registry = InnovationRegistry(path=path, persist_interval=2)
+            registry.get(0, 4)
+            registry.get(1, 4) # interval reached -> persisted
+            registry.get(2, 5)
+            registry.persist()
+
+            loaded = InnovationRegistry.load(path)
+            self.assertEqual(loaded.innovations, registry.innovations)
+            self.assertEqual(loaded.get(3, 5), 3)
+
+# benchmark comparison test cases
+class TestBenchmarks(unittest.TestCase):
+    # slower rates and longer durations beyond the tolerance are regressions, new benchmarks are ignored
+    def test_regressions(self):
+        baseline = {
+            'propagate': BenchmarkResult(value=100.0, unit="propagations/s", higher_is_better=True),
+            'compatibility': BenchmarkResult(value=100.0, unit="pairs/s", higher_is_better=True),
+            'evolve': BenchmarkResult(value=1.0, unit="s/generation", higher_is_better=False),
+            'speciate': BenchmarkResult(value=1.0, unit="s", higher_is_better=False),
+        }
+        results = {
+            'propagate': BenchmarkResult(value=80.0, unit="propagations/s", higher_is_better=True), # 25% more time
+            'compatibility': BenchmarkResult(value=90.0, unit="pairs/s", higher_is_better=True),
+            'evolve': BenchmarkResult(value=1.5, unit="s/generation", higher_is_better=False),
+            'speciate': BenchmarkResult(value=0.5, unit="s", higher_is_better=False),
+            'new': BenchmarkResult(value=1.0, unit="s", higher_is_better=False),
+        }
+        self.assertEqual(regressions(results, baseline, tolerance=0.2), ['propagate', 'evolve'])
+        self.assertEqual(regressions(results, baseline, tolerance=0.6), [])
+
+# batch reproduction test cases
+class TestReproduction(unittest.TestCase):
+    def setUp(self):
+        random.seed(1)
+        self.config = Configuration("./config/pop1.yaml").get()
+        self.population = Population(self.config, network_fitness, innovations=InnovationRegistry())
+        for _ in range(10):
+            self.population.evolve()
+        self.organisms = [organism for species in self.population.species for organism in species.organisms]
+
+    # children crossed over from store records have the genes of per-pair crossover (shared genes from either parent)
+    def test_crossover_matches_species(self):
+        store = GenomeStore.from_organisms(self.organisms)
+        rng = np.random.default_rng(0)
+        (parents1, parents2) = (rng.integers(0, len(self.organisms), 100), rng.integers(0, len(self.organisms), 100))
+        children = crossover_genomes(store, parents1, parents2, rng)
+        species = Species(self.config, self.population.innovations)
+
+        for (index, (parent1, parent2)) in enumerate(zip(parents1, parents2)):
+            expected = species.crossover(self.organisms[parent1], self.organisms[parent2], mutate=False)
+            (expected_nodes, expected_orphans, expected_connections) = expected.records()
+            (nodes, orphans, connections) = children.records(index)
+            self.assertEqual(nodes, expected_nodes)
+            self.assertEqual(orphans, expected_orphans)
+            self.assertEqual([connection[0] for connection in connections], [connection[0] for connection in expected_connections])
+
+            parent_weights = {(connection.innovation, connection.weight) for parent in (parent1, parent2) for connection in self.organisms[parent].genome}
+            self.assertTrue(all((connection[0], connection[3]) in parent_weights for connection in connections))
+
+    # tournaments pick two distinct members of the same species and the fitter one wins
+    def test_tournaments(self):
+        rng = np.random.default_rng(0)
+        fitnesses = np.array([1.0, 2.0, 3.0, 5.0, 4.0])
+        (parents1, parents2) = draw_tournaments(rng, fitnesses, np.array([0, 2]), np.array([2, 3]), np.array([50, 20]))
+        self.assertEqual((len(parents1), len(parents2)), (70, 70))
+        self.assertTrue(np.all(np.concatenate([parents1[:50], parents2[:50]]) == 1)) # best of two
+        self.assertTrue(np.all(np.isin(np.concatenate([parents1[50:], parents2[50:]]), [3, 4]))) # the worst member never wins
+
+    # pre-drawn mutations follow the configured probabilities
+    def test_mutation_probabilities(self):
+        config = self.config.get('organism')
+        mutations = draw_mutations(np.random.default_rng(0), 200000, 0.5, config)
+        frequencies = np.bincount(mutations, minlength=len(Mutation)) / len(mutations)
+        structural = 0.5 * config.get('structural_mutation_chance')
+        self.assertAlmostEqual(frequencies[Mutation.NONE], 0.5, delta=0.01)
+        self.assertAlmostEqual(frequencies[Mutation.ADD_CONNECTION] + frequencies[Mutation.REMOVE_CONNECTION], structural * config.get('structural_connection_mutation_chance'), delta=0.01)
+        self.assertAlmostEqual(frequencies[Mutation.ACTIVATION], (0.5 - structural) * config.get('activation_function_mutation_chance'), delta=0.01)
+
+    # batch reproduction keeps the population size and is reproducible from the global seed (with and without a compact store)
+    def test_batch_evolution(self):
+        for compact in (False, True):
+            runs = []
+            for _ in range(2):
+                random.seed(5)
+                population = Population(self.config, network_fitness, innovations=InnovationRegistry(), compact=compact, batch_reproduction=True)
+                for _ in range(6):
+                    population.evolve()
+                population.compute_population_fitness()
+                organisms = [organism for species in population.species for organism in species.organisms]
+                self.assertAlmostEqual(len(organisms), self.config.get('carrying_capacity'), delta=len(population.species))
+                runs.append([(organism.fitness, organism.records()) for organism in organisms])
+            self.assertEqual(runs[0], runs[1])
+
+# random stream test cases
+class TestRandomStreams(unittest.TestCase):
+    def __init__(self, methodName: str = "runTest") -> None:
+        self.config = Configuration("./config/pop1.yaml").get()
+        super().__init__(methodName)
+
+    # species ids and every organism's id, fitness and genome records after some seeded generations
+    def evolve(self, seed: int, evaluator: Optional[Evaluator] = None, batch_reproduction: bool = False, generations: int = 4) -> list:
+        with evaluator if evaluator is not None else Evaluator():
+            population = Population(self.config, network_fitness, innovations=InnovationRegistry(), evaluator=evaluator, batch_reproduction=batch_reproduction, seed=seed)
+            for _ in range(generations):
+                population.evolve()
+            population.compute_population_fitness()
+        return [(species.id, [(organism.id, organism.fitness, organism.records()) for organism in species.organisms]) for species in population.species]
+
+    # streams of the same key are equal, streams of different keys and seeds aren't
+    def test_streams(self):
+        streams = RandomStreams(3)
+        self.assertEqual(streams.stream(1, 2).random(), RandomStreams(3).stream(1, 2).random())
+        self.assertNotEqual(streams.stream(1, 2).random(), streams.stream(1, 3).random())
+        self.assertNotEqual(streams.stream(1, 2).random(), RandomStreams(4).stream(1, 2).random())
+        self.assertEqual(streams.generator(0).random(), RandomStreams(3).generator(0).random())
+
+    # seeded runs don't depend on the global random state or the evaluation backend
+    def test_seeded_evolution(self):
+        random.seed(1)
+        expected = self.evolve(seed=11)
+        random.seed(2)
+        self.assertEqual(self.evolve(seed=11), expected)
+        self.assertEqual(self.evolve(seed=11, evaluator=Evaluator(EvaluationBackend.THREAD, workers=3)), expected)
+        self.assertEqual(self.evolve(seed=11, evaluator=Evaluator(EvaluationBackend.PROCESS, workers=2, chunk_size=3)), expected)
+        self.assertNotEqual(self.evolve(seed=12), expected)
+
+    # batch reproduction is reproducible from the seed as well
+    def test_seeded_batch_evolution(self):
+        random.seed(1)
+        expected = self.evolve(seed=5, batch_reproduction=True)
+        random.seed(2)
+        self.assertEqual(self.evolve(seed=5, batch_reproduction=True), expected)
+
+    # a resumed seeded run continues with the same streams, ids and reproduction mode
+    def test_seeded_resume(self):
+        for batch_reproduction in (False, True):
+            population = Population(self.config, network_fitness, innovations=InnovationRegistry(), batch_reproduction=batch_reproduction, seed=19)
+            for _ in range(3):
+                population.evolve()
+
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "population.ckpt")
+                population.save(path)
+                for _ in range(3):
+                    population.evolve()
+
+                random.seed(4)
+                resumed = Population.load(path, network_fitness)
+                self.assertEqual(resumed.batch_reproduction, batch_reproduction)
+                for _ in range(3):
+                    resumed.evolve()
+                self.assertEqual([[organism.id for organism in species.organisms] for species in resumed.species], [[organism.id for organism in species.organisms] for species in population.species])
+                self.assertEqual([[organism.records() for organism in species.organisms] for species in resumed.species], [[organism.records() for organism in species.organisms] for species in population.species])
+
+# behaviour of an organism's network (outputs for a fixed input)
+def network_behaviour(organism: 'Organism') -> list[float]:
+    return organism.phenotype().propagate(inputs=[0.5, -0.25, 1.0])
+
+# novelty search test cases
+class TestNovelty(unittest.TestCase):
+    # mean distance to the k nearest other behaviours (brute force)
+    def novelty(self, behaviours: np.ndarray, archive: np.ndarray, k: int) -> np.ndarray:
+        points = np.concatenate([behaviours, archive])
+        distances = np.sort(np.linalg.norm(behaviours[:, None] - points[None], axis=2), axis=1)
+        return distances[:, 1:k + 1].mean(axis=1)
+
+    # k nearest neighbours match a brute force search (duplicates, few points, leaves smaller than k and many dimensions)
+    def test_index_matches_brute_force(self):
+        rng = np.random.default_rng(3)
+        for (n, dimensions, k, leaf_size) in [(1, 2, 3, 4), (5, 2, 10, 2), (300, 2, 5, 8), (1000, 3, 16, 32), (400, 12, 10, 16)]:
+            points = rng.random((n, dimensions))
+            points[:n // 10] = points[0]
+            queries = np.concatenate([points[:50], rng.random((20, dimensions))])
+            (distances, indices) = BehaviourIndex(points, leaf_size).query(queries, k)
+
+            expected = np.linalg.norm(queries[:, None] - points[None], axis=2)
+            np.testing.assert_allclose(distances, np.sort(expected, axis=1)[:, :min(k, n)])
+            np.testing.assert_allclose(np.take_along_axis(expected, indices, axis=1), distances)
+
+    # novelty is measured against the population and the archive, the archive keeps the most novel behaviours up to its size
+    def test_archive(self):
+        rng = np.random.default_rng(5)
+        for eviction in (ArchiveEviction.OLDEST, ArchiveEviction.LEAST_NOVEL):
+            search = NoveltySearch(k=4, archive_size=12, archive_additions=5, eviction=eviction, leaf_size=4)
+            archived: list[tuple[list[float], float]] = []
+            for _ in range(5):
+                behaviours = rng.random((30, 2))
+                archive = search.archive if search.archive is not None else np.zeros((0, 2))
+                expected = self.novelty(behaviours, archive, 4)
+                np.testing.assert_allclose(search.score(behaviours.tolist()), expected)
+
+                search.update_archive()
+                archived += [(behaviours[index].tolist(), expected[index]) for index in np.argsort(-expected, kind='stable')[:5]]
+                if eviction == ArchiveEviction.OLDEST:
+                    archived = archived[-12:]
+                else:
+                    archived = [archived[index] for index in sorted(np.argsort([novelty for (_, novelty) in archived], kind='stable')[max(0, len(archived) - 12):])]
+                self.assertEqual(search.archive.tolist(), [behaviour for (behaviour, _) in archived])
+            self.assertEqual(len(search), 12)
+
+    # hybrid fitness mixes objective fitness and novelty, identical behaviours are equally novel
+    def test_hybrid(self):
+        search = NoveltySearch(mode=NoveltyMode.HYBRID, k=2, novelty_weight=0.25)
+        behaviours = [[0.0, 0.0], [3.0, 4.0], [0.0, 0.0]]
+        self.assertEqual(search.score([(1.0, behaviour) for behaviour in behaviours]), [0.75 + 0.25 * 2.5, 0.75 + 0.25 * 5.0, 0.75 + 0.25 * 2.5])
+        self.assertEqual(NoveltySearch(k=2).score([[1.0], [1.0], [1.0]]), [1.0, 1.0, 1.0])
+
+    # a population's fitness is the novelty of its organisms' behaviours (with and without the fitness cache)
+    def test_population(self):
+        config = Configuration("./config/pop1.yaml").get()
+        for fitness_cache in (None, FitnessCache()):
+            search = NoveltySearch(k=5, archive_size=20)
+            population = Population(config, network_behaviour, innovations=InnovationRegistry(), fitness_cache=fitness_cache, novelty=search, seed=7)
+            for _ in range(6):
+                population.evolve()
+            self.assertEqual(len(search), 20)
+            self.assertEqual(population.metrics.records[-1]['counts']['novelty_archive_size'], 20)
+
+            archive = search.archive.copy()
+            population.compute_population_fitness()
+            organisms = [organism for species in population.species for organism in species.organisms]
+            behaviours = np.array([network_behaviour(organism) for organism in organisms])
+            np.testing.assert_allclose([organism.fitness for organism in organisms], self.novelty(behaviours, archive, 5))
+
+            # a single organism's fitness is its novelty against the archive (the generation isn't archived again)
+            self.assertAlmostEqual(population.fitness(organisms[0]), self.novelty(behaviours[:1], archive, 5)[0])
+            population.evolve()
+            self.assertEqual(len(search), 20)
+
+    # a resumed novelty search continues with the saved archive (and the evaluated generation's behaviours it hasn't archived yet)
+    def test_checkpoint(self):
+        config = Configuration("./config/pop1.yaml").get()
+        population = Population(config, network_behaviour, innovations=InnovationRegistry(), novelty=NoveltySearch(k=5, archive_size=20), seed=7)
+        for _ in range(3):
+            population.evolve()
+        population.best()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "population.ckpt")
+            population.save(path)
+            for _ in range(3):
+                population.evolve()
+
+            resumed = Population.load(path, network_behaviour, novelty=NoveltySearch(k=5, archive_size=20))
+            for _ in range(3):
+                resumed.evolve()
+            np.testing.assert_array_equal(resumed.novelty.archive, population.novelty.archive)
+            self.assertEqual([organism.records() for organism in resumed.top(10)], [organism.records() for organism in population.top(10)])
+
+            with self.assertRaises(ValueError):
+                Population.load(path, network_behaviour)
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -1,11 +1,22 @@
 import random
 
+# generator drawing from the random module's functions (every other method is derived from these two), so random.seed still applies
+class ModuleRandom(random.Random):
+    def random(self) -> float:
+        return random.random()
+
+    def getrandbits(self, k: int) -> int:
+        return random.getrandbits(k)
+
+# generator used when no random stream is given
+default_random: random.Random = ModuleRandom()
+
 # probabilistically return true
-def chance(probability: float):
-   return random.random() < probability 
+def chance(probability: float, rng: random.Random = default_random):
+   return rng.random() < probability 
 
 # randomly choose an integer in the range whilst excluding given integers 
-def random_exclude(lower: int = 0 , upper: int = 0, *exclude):
+def random_exclude(lower: int = 0 , upper: int = 0, *exclude, rng: random.Random = default_random):
   exclude = set(exclude)
-  ri = random.randint(lower, upper)
-  return random_exclude(lower, upper, *exclude) if ri in exclude else ri 
\ No newline at end of file
+  ri = rng.randint(lower, upper)
+  return random_exclude(lower, upper, *exclude, rng=rng) if ri in exclude else ri 
\ No newline at end of file